@@ -4,6 +4,38 @@ from pathlib import Path
 class Config:
     DB_NAME = "meter_reader.db"
     DB_PATH = os.path.join(os.getcwd(), DB_NAME)
+    DB_PROFILE = "performance"
+    DB_PRAGMA_PROFILES = {
+        'default': {
+            'busy_timeout': 5000,
+        },
+        'performance': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'cache_size': -65536,
+            'mmap_size': 268435456,
+            'temp_store': 'MEMORY',
+            'foreign_keys': 'ON',
+            'busy_timeout': 5000,
+        },
+    }
+    IMPORT_CHUNK_SIZE = 50000
+    IMPORT_MAX_ERROR_MESSAGES = 1000
+    AUDIT_QUEUE_SIZE = 10000
+    AUDIT_BATCH_SIZE = 200
+    AUDIT_FLUSH_INTERVAL_MS = 500
+    AUDIT_PUT_TIMEOUT_MS = 50
+    AUDIT_RETENTION_DAYS = 365
+    AUDIT_ARCHIVE_DIR = "audit_archive"
+    CACHE_DEFAULT_TTL_SECONDS = 300
+    CACHE_MAX_ENTRIES = 1000
+    CACHE_MAX_BYTES = 64 * 1024 * 1024
+    CACHE_SWEEP_INTERVAL_SECONDS = 60
+    RECEIPT_BATCH_CHUNK_SIZE = 50
+    RECEIPT_BATCH_WORKERS = None
+    CHART_MAX_POINTS = 300
+    SEARCH_MAX_RESULTS = 1000
+    EXPORT_BATCH_SIZE = 5000
     MAP_IMAGE_PATH = "city_map.png"
     BACKUP_DIR = "backups"
     
@@ -18,6 +50,13 @@ class Config:
     
     SETTINGS_FILE = "settings.json"
     
+    @classmethod
+    def get_db_pragmas(cls, profile: str = None) -> dict:
+        profile = profile or cls.DB_PROFILE
+        if profile not in cls.DB_PRAGMA_PROFILES:
+            raise ValueError(f"Неизвестный профиль БД: {profile}")
+        return dict(cls.DB_PRAGMA_PROFILES[profile])
+    
     @classmethod
     def ensure_backup_dir(cls):
         backup_path = Path(cls.BACKUP_DIR)
@@ -1,179 +1,283 @@
 import sqlite3
 import os
+import threading
+import weakref
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Dict, Any
 from app.config import Config
+from app.database.migrations import MIGRATIONS, LATEST_SCHEMA_VERSION
+
+PRAGMA_VALUE_ALIASES = {
+    'synchronous': {'OFF': 0, 'NORMAL': 1, 'FULL': 2, 'EXTRA': 3},
+    'temp_store': {'DEFAULT': 0, 'FILE': 1, 'MEMORY': 2},
+    'foreign_keys': {'OFF': 0, 'ON': 1},
+}
+
+def normalize_pragma_value(name: str, value: Any) -> Any:
+    if isinstance(value, str):
+        aliases = PRAGMA_VALUE_ALIASES.get(name)
+        if aliases and value.upper() in aliases:
+            return aliases[value.upper()]
+        if value.lstrip('-').isdigit():
+            return int(value)
+        return value.lower()
+    return value
+
+def unicode_lower(value: Any) -> Any:
+    return value.lower() if isinstance(value, str) else value
+
+class PooledConnection(sqlite3.Connection):
+    pool = None
+    owner = None
+    
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+    
+    def force_close(self):
+        self.pool = None
+        super().close()
+
+class ConnectionPool:
+    _registry: Dict[str, 'ConnectionPool'] = {}
+    _registry_lock = threading.Lock()
+    
+    def __init__(self, db_path: str, pragmas: Optional[Dict[str, Any]] = None, timeout: float = 5.0):
+        self.db_path = db_path
+        self.pragmas = dict(pragmas or {})
+        self.timeout = timeout
+        self.opened = 0
+        self.reused = 0
+        self.generation = 0
+        self.pragmas_checked = False
+        self.schema_version = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = weakref.WeakSet()
+    
+    @classmethod
+    def for_path(cls, db_path: str, pragmas: Optional[Dict[str, Any]] = None) -> 'ConnectionPool':
+        key = db_path if db_path == ':memory:' else os.path.abspath(db_path)
+        with cls._registry_lock:
+            pool = cls._registry.get(key)
+            if pool is None:
+                pool = cls(db_path, pragmas)
+                cls._registry[key] = pool
+            elif pragmas is not None and dict(pragmas) != pool.pragmas:
+                raise ValueError(f"База {key} уже открыта с другими параметрами PRAGMA: "
+                                 f"{pool.pragmas}")
+            return pool
+    
+    def _create_connection(self) -> PooledConnection:
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout,
+                               factory=PooledConnection, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        conn.create_function("unicode_lower", 1, unicode_lower, deterministic=True)
+        conn.pool = self
+        conn.owner = threading.current_thread()
+        return conn
+    
+    def acquire(self) -> PooledConnection:
+        conn = getattr(self._local, 'connection', None)
+        if conn is not None and self._local.generation != self.generation:
+            # Пул был закрыт, пока поток работал: старое соединение закрывает его владелец
+            with self._lock:
+                self._connections.discard(conn)
+            conn.force_close()
+            conn = None
+        
+        if conn is None:
+            conn = self._create_connection()
+            self._local.connection = conn
+            self._local.generation = self.generation
+            self._local.depth = 0
+            with self._lock:
+                self.opened += 1
+                self._connections.add(conn)
+        else:
+            with self._lock:
+                self.reused += 1
+        
+        self._local.depth += 1
+        return conn
+    
+    def release(self, conn: PooledConnection):
+        if getattr(self._local, 'connection', None) is not conn:
+            return
+        
+        self._local.depth = max(0, self._local.depth - 1)
+        # Неявная транзакция не должна переживать checkout, который ее начал: иначе после
+        # ошибки незафиксированные изменения уйдут со следующим чужим commit(). Работа из
+        # нескольких шагов выполняется внутри transaction(), ее откатывает сам transaction()
+        if getattr(self._local, 'tx_depth', 0) == 0 and conn.in_transaction:
+            conn.rollback()
+    
+    @contextmanager
+    def checkout(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+    
+    @contextmanager
+    def transaction(self, immediate: bool = False):
+        conn = self.acquire()
+        depth = getattr(self._local, 'tx_depth', 0)
+        nested = depth > 0 or conn.in_transaction
+        savepoint = f"tx_{depth}"
+        try:
+            if nested:
+                conn.execute(f"SAVEPOINT {savepoint}")
+            else:
+                conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            self._local.tx_depth = depth + 1
+            try:
+                yield conn
+            except BaseException:
+                if nested:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                    conn.execute(f"RELEASE {savepoint}")
+                else:
+                    conn.rollback()
+                raise
+            else:
+                if nested:
+                    conn.execute(f"RELEASE {savepoint}")
+                else:
+                    conn.commit()
+            finally:
+                self._local.tx_depth = depth
+        finally:
+            self.release(conn)
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'opened': self.opened,
+                'reused': self.reused,
+                'active': len(self._connections)
+            }
+    
+    def close_all(self):
+        # Закрываются только соединения текущего и завершившихся потоков. Соединения живых
+        # потоков (резервное копирование, запись аудита) устаревают по generation
+        # и закрываются самими потоками при следующем обращении к пулу
+        current = threading.current_thread()
+        with self._lock:
+            connections = list(self._connections)
+            self.generation += 1
+            closable = [conn for conn in connections
+                        if conn.owner is current or not conn.owner.is_alive()]
+            for conn in closable:
+                self._connections.discard(conn)
+        for conn in closable:
+            try:
+                conn.force_close()
+            except Exception as e:
+                print(f"Ошибка закрытия соединения с БД: {e}")
+        self._local.connection = None
 
 class Database:
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, profile: str = None):
         self.db_path = db_path or Config.DB_PATH
+        self.pool = ConnectionPool.for_path(self.db_path, Config.get_db_pragmas(profile))
+        if not self.pool.pragmas_checked:
+            self.pool.pragmas_checked = True
+            self.report_pragmas()
         self.init_database()
     
     def get_connection(self):
-        return sqlite3.connect(self.db_path)
+        return self.pool.acquire()
+    
+    def connection(self):
+        return self.pool.checkout()
+    
+    def transaction(self, immediate: bool = False):
+        return self.pool.transaction(immediate)
+    
+    def get_pool_stats(self) -> Dict[str, int]:
+        return self.pool.stats()
+    
+    def close(self):
+        self.pool.close_all()
+    
+    def check_pragmas(self) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        with self.connection() as conn:
+            for name, expected in self.pool.pragmas.items():
+                row = conn.execute(f"PRAGMA {name}").fetchone()
+                actual = row[0] if row else None
+                report[name] = {
+                    'expected': expected,
+                    'actual': actual,
+                    'ok': normalize_pragma_value(name, expected) == normalize_pragma_value(name, actual)
+                }
+        return report
+    
+    def report_pragmas(self) -> Dict[str, Dict[str, Any]]:
+        report = self.check_pragmas()
+        in_effect = ", ".join(f"{name}={item['actual']}" for name, item in report.items())
+        print(f"Параметры SQLite ({self.db_path}): {in_effect}")
+        for name, item in report.items():
+            if not item['ok']:
+                print(f"Предупреждение: PRAGMA {name} = {item['actual']}, ожидалось {item['expected']}")
+        return report
+    
+    def get_schema_version(self) -> int:
+        with self.connection() as conn:
+            try:
+                row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+            except sqlite3.OperationalError:
+                return 0
+            return row[0] or 0
     
     def init_database(self):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT NOT NULL DEFAULT 'user',
-                full_name TEXT,
-                email TEXT,
-                phone TEXT
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Objects (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                address TEXT NOT NULL,
-                area REAL,
-                residents INTEGER,
-                building_number TEXT,
-                apartment_number TEXT,
-                building_x INTEGER,
-                building_y INTEGER,
-                building_width INTEGER,
-                building_height INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Meters (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                object_id INTEGER REFERENCES Objects(id) ON DELETE CASCADE,
-                type TEXT NOT NULL,
-                serial_number TEXT,
-                installation_date DATE,
-                verification_date DATE,
-                next_verification_date DATE,
-                tariff REAL NOT NULL,
-                unit TEXT DEFAULT 'м³',
-                location TEXT,
-                is_active INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Readings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                meter_id INTEGER REFERENCES Meters(id) ON DELETE CASCADE,
-                value REAL NOT NULL,
-                reading_date DATE NOT NULL,
-                previous_reading_id INTEGER REFERENCES Readings(id),
-                photo_path TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(meter_id, reading_date)
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Calculations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                reading_id INTEGER REFERENCES Readings(id) ON DELETE CASCADE,
-                consumption REAL NOT NULL,
-                amount REAL NOT NULL,
-                tariff REAL NOT NULL,
-                calculated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Notifications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER REFERENCES Users(id),
-                object_id INTEGER REFERENCES Objects(id),
-                type TEXT NOT NULL,
-                message TEXT NOT NULL,
-                is_read INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS Settings (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL
-            )
-        """)
+        if self.pool.schema_version >= LATEST_SCHEMA_VERSION:
+            return
         
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS UserObjects (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER REFERENCES Users(id) ON DELETE CASCADE,
-                object_id INTEGER REFERENCES Objects(id) ON DELETE CASCADE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(user_id, object_id)
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_meters_object_id ON Meters(object_id)
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_user_objects_user_id ON UserObjects(user_id)
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_user_objects_object_id ON UserObjects(object_id)
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_readings_meter_id ON Readings(meter_id)
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_readings_date ON Readings(reading_date)
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_calculations_reading_id ON Calculations(reading_id)
-        """)
-        
-        admin_exists = cursor.execute(
-            "SELECT COUNT(*) FROM Users WHERE username = 'admin'"
-        ).fetchone()[0]
-        
-        if admin_exists == 0:
-            from app.services.auth_service import AuthService
-            hashed_password = AuthService.hash_password(Config.DEFAULT_ADMIN_PASSWORD)
-            cursor.execute("""
-                INSERT INTO Users (username, password, role, full_name)
-                VALUES (?, ?, 'admin', 'Администратор')
-            """, (Config.DEFAULT_ADMIN_USERNAME, hashed_password))
-        else:
-            from app.services.auth_service import AuthService
-            cursor.execute("SELECT password FROM Users WHERE username = ?", (Config.DEFAULT_ADMIN_USERNAME,))
-            admin_password = cursor.fetchone()
-            if admin_password and not admin_password[0].startswith('$2b$'):
-                hashed_password = AuthService.hash_password(Config.DEFAULT_ADMIN_PASSWORD)
-                cursor.execute("UPDATE Users SET password = ? WHERE username = ?", 
-                             (hashed_password, Config.DEFAULT_ADMIN_USERNAME))
-        
-        conn.commit()
-        conn.close()
+        self.pool.schema_version = self.get_schema_version()
+        if self.pool.schema_version < LATEST_SCHEMA_VERSION:
+            self.migrate()
+    
+    def migrate(self):
+        with self.transaction(immediate=True) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
         
-        from app.services.auth_service import AuthService
-        AuthService.migrate_passwords(self)
+        for version, description, step in MIGRATIONS:
+            with self.transaction(immediate=True) as conn:
+                current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+                if version <= current:
+                    continue
+                try:
+                    step(conn)
+                except Exception as e:
+                    raise Exception(f"Ошибка миграции схемы до версии {version} ({description}): {e}")
+                conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                             (version, description))
+            self.pool.schema_version = version
     
     def backup_database(self, backup_path: Optional[str] = None):
         if backup_path is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_path = f"backup_{timestamp}.db"
         
-        source = self.get_connection()
         backup = sqlite3.connect(backup_path)
-        source.backup(backup)
-        source.close()
-        backup.close()
+        try:
+            with self.connection() as source:
+                source.backup(backup)
+        finally:
+            backup.close()
         
         return backup_path
 
@@ -0,0 +1,279 @@
+import sqlite3
+from typing import Callable, List, Tuple
+from app.config import Config
+
+BASE_SCHEMA = [
+    """
+        CREATE TABLE IF NOT EXISTS Users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL DEFAULT 'user',
+            full_name TEXT,
+            email TEXT,
+            phone TEXT
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS Objects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            address TEXT NOT NULL,
+            area REAL,
+            residents INTEGER,
+            building_number TEXT,
+            apartment_number TEXT,
+            building_x INTEGER,
+            building_y INTEGER,
+            building_width INTEGER,
+            building_height INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS Meters (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            object_id INTEGER REFERENCES Objects(id) ON DELETE CASCADE,
+            type TEXT NOT NULL,
+            serial_number TEXT,
+            installation_date DATE,
+            verification_date DATE,
+            next_verification_date DATE,
+            tariff REAL NOT NULL,
+            unit TEXT DEFAULT 'м³',
+            location TEXT,
+            is_active INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS Readings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            meter_id INTEGER REFERENCES Meters(id) ON DELETE CASCADE,
+            value REAL NOT NULL,
+            reading_date DATE NOT NULL,
+            previous_reading_id INTEGER REFERENCES Readings(id),
+            photo_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(meter_id, reading_date)
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS Calculations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            reading_id INTEGER REFERENCES Readings(id) ON DELETE CASCADE,
+            consumption REAL NOT NULL,
+            amount REAL NOT NULL,
+            tariff REAL NOT NULL,
+            calculated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS Notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER REFERENCES Users(id),
+            object_id INTEGER REFERENCES Objects(id),
+            type TEXT NOT NULL,
+            message TEXT NOT NULL,
+            is_read INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS Settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS UserObjects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER REFERENCES Users(id) ON DELETE CASCADE,
+            object_id INTEGER REFERENCES Objects(id) ON DELETE CASCADE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, object_id)
+        )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_meters_object_id ON Meters(object_id)",
+    "CREATE INDEX IF NOT EXISTS idx_user_objects_user_id ON UserObjects(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_user_objects_object_id ON UserObjects(object_id)",
+    "CREATE INDEX IF NOT EXISTS idx_readings_meter_id ON Readings(meter_id)",
+    "CREATE INDEX IF NOT EXISTS idx_readings_date ON Readings(reading_date)",
+    "CREATE INDEX IF NOT EXISTS idx_calculations_reading_id ON Calculations(reading_id)",
+    """
+        CREATE TABLE IF NOT EXISTS AuditLog (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            username TEXT,
+            action_type TEXT NOT NULL,
+            entity_type TEXT NOT NULL,
+            entity_id INTEGER,
+            old_value TEXT,
+            new_value TEXT,
+            description TEXT,
+            ip_address TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_audit_user_id ON AuditLog(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_entity ON AuditLog(entity_type, entity_id)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_created_at ON AuditLog(created_at)",
+]
+
+def create_base_schema(conn):
+    for statement in BASE_SCHEMA:
+        conn.execute(statement)
+
+def seed_default_admin(conn):
+    admin_exists = conn.execute(
+        "SELECT COUNT(*) FROM Users WHERE username = ?", (Config.DEFAULT_ADMIN_USERNAME,)
+    ).fetchone()[0]
+    
+    if admin_exists == 0:
+        from app.services.auth_service import AuthService
+        hashed_password = AuthService.hash_password(Config.DEFAULT_ADMIN_PASSWORD)
+        conn.execute("""
+            INSERT INTO Users (username, password, role, full_name)
+            VALUES (?, ?, 'admin', 'Администратор')
+        """, (Config.DEFAULT_ADMIN_USERNAME, hashed_password))
+
+def hash_legacy_passwords(conn):
+    from app.services.auth_service import AuthService
+    AuthService.hash_legacy_passwords(conn.cursor())
+
+def unique_calculation_per_reading(conn):
+    conn.execute("""
+        DELETE FROM Calculations
+        WHERE id NOT IN (SELECT MAX(id) FROM Calculations GROUP BY reading_id)
+    """)
+    conn.execute("DROP INDEX IF EXISTS idx_calculations_reading_id")
+    conn.execute("CREATE UNIQUE INDEX idx_calculations_reading_id ON Calculations(reading_id)")
+
+def index_objects_address(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_objects_address ON Objects(address)")
+
+FTS_TOKENIZE = "tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3'"
+
+FTS_INDEXES = [
+    ('ObjectsFts', 'Objects', ['address']),
+    ('MetersFts', 'Meters', ['type', 'serial_number']),
+    ('AuditLogFts', 'AuditLog', ['username', 'description', 'old_value', 'new_value']),
+]
+
+def create_fts_index(conn, fts_table: str, table: str, columns: List[str]):
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+            {column_list}, content = '{table}', content_rowid = 'id', {FTS_TOKENIZE}
+        )
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column_list} ON {table} BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+    """)
+    conn.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+
+def create_fts_indexes(conn):
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(value)")
+        conn.execute("DROP TABLE temp.fts5_probe")
+    except sqlite3.OperationalError as e:
+        print(f"Полнотекстовый поиск недоступен, используется поиск по подстроке: {e}")
+        return
+    
+    for fts_table, table, columns in FTS_INDEXES:
+        create_fts_index(conn, fts_table, table, columns)
+
+def index_audit_filters(conn):
+    conn.execute("DROP INDEX IF EXISTS idx_audit_user_id")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_user_created ON AuditLog(user_id, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_action_created ON AuditLog(action_type, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_entity_created ON AuditLog(entity_type, created_at)")
+
+def index_meters_object_type(conn):
+    conn.execute("DROP INDEX IF EXISTS idx_meters_object_id")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_meters_object_type ON Meters(object_id, type)")
+
+def cascade_notifications(conn):
+    # Профиль performance включает foreign_keys, а у Notifications внешние ключи были без
+    # ON DELETE, и удаление объекта или пользователя с уведомлениями падало с IntegrityError.
+    # SQLite не меняет ограничения через ALTER TABLE, поэтому таблица пересоздается.
+    # Уведомления, оставшиеся от удаленных без foreign_keys записей, не переносятся
+    conn.execute("""
+        CREATE TABLE Notifications_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER REFERENCES Users(id) ON DELETE CASCADE,
+            object_id INTEGER REFERENCES Objects(id) ON DELETE CASCADE,
+            type TEXT NOT NULL,
+            message TEXT NOT NULL,
+            is_read INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        INSERT INTO Notifications_new (id, user_id, object_id, type, message, is_read, created_at)
+        SELECT id, user_id, object_id, type, message, is_read, created_at FROM Notifications
+        WHERE (user_id IS NULL OR user_id IN (SELECT id FROM Users))
+          AND (object_id IS NULL OR object_id IN (SELECT id FROM Objects))
+    """)
+    conn.execute("DROP TABLE Notifications")
+    conn.execute("ALTER TABLE Notifications_new RENAME TO Notifications")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON Notifications(user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notifications_object_id ON Notifications(object_id)")
+
+def backfill_calculations(conn):
+    # Показания читаются с LEFT JOIN Calculations, поэтому показания, для которых расчет
+    # не был сохранен, остались бы с пустым расходом. Расход считается так же, как в recalculate:
+    # разница с предыдущим показанием счетчика, не меньше нуля
+    cursor = conn.execute("""
+        SELECT id, value, previous_value, tariff FROM (
+            SELECT r.id, r.value, m.tariff,
+                   LAG(r.value) OVER (
+                       PARTITION BY r.meter_id ORDER BY r.reading_date, r.id
+                   ) AS previous_value
+            FROM Readings r
+            JOIN Meters m ON r.meter_id = m.id
+        ) readings
+        WHERE NOT EXISTS (SELECT 1 FROM Calculations c WHERE c.reading_id = readings.id)
+    """)
+    while True:
+        rows = cursor.fetchmany(5000)
+        if not rows:
+            break
+        batch = []
+        for reading_id, value, previous_value, tariff in rows:
+            consumption = 0.0 if previous_value is None else max(0.0, value - previous_value)
+            batch.append((reading_id, consumption, round(consumption * tariff, 2), tariff))
+        conn.executemany("""
+            INSERT INTO Calculations (reading_id, consumption, amount, tariff)
+            VALUES (?, ?, ?, ?)
+        """, batch)
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "Базовая схема", create_base_schema),
+    (2, "Администратор по умолчанию", seed_default_admin),
+    (3, "Хеширование паролей в открытом виде", hash_legacy_passwords),
+    (4, "Один расчет на показание", unique_calculation_per_reading),
+    (5, "Индекс адресов объектов", index_objects_address),
+    (6, "Полнотекстовый поиск", create_fts_indexes),
+    (7, "Составные индексы журнала аудита", index_audit_filters),
+    (8, "Индекс счетчиков по объекту и типу", index_meters_object_type),
+    (9, "Каскадное удаление уведомлений", cascade_notifications),
+    (10, "Расчеты для показаний без расчета", backfill_calculations),
+]
+
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
@@ -1,8 +1,53 @@
+import copy
+import functools
+import inspect
 from dataclasses import dataclass
 from datetime import date, datetime
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple, Any, Callable, Iterable
 from app.database import Database
 
+def like_pattern(text: str) -> str:
+    escaped = text.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+def _copy_model(item):
+    if not hasattr(item, '__dict__'):
+        return copy.copy(item)
+    clone = object.__new__(item.__class__)
+    clone.__dict__.update(item.__dict__)
+    return clone
+
+def copy_result(value):
+    # Модели - плоские dataclass, поэтому достаточно поверхностной копии каждого элемента
+    if isinstance(value, list):
+        return [_copy_model(item) for item in value]
+    return _copy_model(value)
+
+def cached(key_prefix: str, tags: Callable[..., Iterable[str]]):
+    # Кэширует результат метода репозитория, если у репозитория задан cache_service.
+    # tags получает аргументы метода и результат; вызывающему отдается копия, чтобы правки не портили кэш
+    def decorator(method):
+        signature = inspect.signature(method)
+        
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not self.cache_service:
+                return method(self, *args, **kwargs)
+            # Ключ строится по связанным аргументам, поэтому f(1) и f(obj_id=1) попадают в одну запись
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            values = list(bound.arguments.values())[1:]
+            key = ":".join([key_prefix, *map(str, values)])
+            value = self.cache_service.get(key)
+            if value is None:
+                value = method(self, *args, **kwargs)
+                if value is None:
+                    return None
+                self.cache_service.set(key, value, tags=tags(*values, value))
+            return copy_result(value)
+        return wrapper
+    return decorator
+
 @dataclass
 class User:
     id: Optional[int]
@@ -69,9 +114,15 @@ class Reading:
         return cls(*row)
 
 class ObjectRepository:
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, cache_service=None):
         self.db = db
+        self.cache_service = cache_service
+    
+    def _invalidate(self, *tags: str):
+        if self.cache_service:
+            self.cache_service.invalidate_tags(*tags)
     
+    @cached("objects", lambda result: ["table:Objects"])
     def get_all(self) -> List[Object]:
         conn = None
         try:
@@ -87,6 +138,70 @@ class ObjectRepository:
             if conn:
                 conn.close()
     
+    def get_page(self, cursor: Optional[Tuple[str, int]] = None, 
+                 limit: int = 200) -> Tuple[List[Object], Optional[Tuple[str, int]]]:
+        conn = None
+        try:
+            conn = self.db.get_connection()
+            db_cursor = conn.cursor()
+            if cursor:
+                db_cursor.execute("""
+                    SELECT * FROM Objects WHERE (address, id) > (?, ?)
+                    ORDER BY address, id LIMIT ?
+                """, (cursor[0], cursor[1], limit))
+            else:
+                db_cursor.execute("SELECT * FROM Objects ORDER BY address, id LIMIT ?", (limit,))
+            objects = [Object.from_row(row) for row in db_cursor.fetchall()]
+        except Exception as e:
+            print(f"Ошибка получения страницы объектов: {e}")
+            return [], None
+        finally:
+            if conn:
+                conn.close()
+        
+        next_cursor = (objects[-1].address, objects[-1].id) if len(objects) == limit else None
+        return objects, next_cursor
+    
+    def search_ids(self, text: str, limit: Optional[int] = None) -> List[int]:
+        conn = None
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id FROM Objects
+                WHERE unicode_lower(address) LIKE ? ESCAPE '\\'
+                ORDER BY address, id
+                LIMIT ?
+            """, (like_pattern(text), -1 if limit is None else limit))
+            return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"Ошибка поиска объектов: {e}")
+            return []
+        finally:
+            if conn:
+                conn.close()
+    
+    def get_by_ids(self, obj_ids: List[int]) -> List[Object]:
+        if not obj_ids:
+            return []
+        conn = None
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT * FROM Objects WHERE id IN ({', '.join('?' * len(obj_ids))})
+            """, obj_ids)
+            # Порядок как в obj_ids: результаты поиска идут по релевантности
+            objects = {row[0]: Object.from_row(row) for row in cursor.fetchall()}
+            return [objects[obj_id] for obj_id in obj_ids if obj_id in objects]
+        except Exception as e:
+            print(f"Ошибка получения объектов по ID: {e}")
+            return []
+        finally:
+            if conn:
+                conn.close()
+    
+    @cached("object", lambda obj_id, result: [f"object:{obj_id}"])
     def get_by_id(self, obj_id: int) -> Optional[Object]:
         conn = None
         try:
@@ -132,6 +247,7 @@ class ObjectRepository:
                   obj.building_width, obj.building_height))
             obj_id = cursor.lastrowid
             conn.commit()
+            self._invalidate("table:Objects")
             return obj_id
         except Exception as e:
             if conn:
@@ -156,6 +272,7 @@ class ObjectRepository:
                   obj.apartment_number, obj.building_x, obj.building_y,
                   obj.building_width, obj.building_height, obj.id))
             conn.commit()
+            self._invalidate(f"object:{obj.id}", "table:Objects")
         except Exception as e:
             if conn:
                 conn.rollback()
@@ -171,6 +288,9 @@ class ObjectRepository:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM Objects WHERE id = ?", (obj_id,))
             conn.commit()
+            # Вместе с объектом каскадно удаляются его счетчики, показания и привязки
+            self._invalidate(f"object:{obj_id}", "table:Objects", "table:Meters",
+                             "table:Readings", "table:UserObjects")
         except Exception as e:
             if conn:
                 conn.rollback()
@@ -180,9 +300,15 @@ class ObjectRepository:
                 conn.close()
 
 class MeterRepository:
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, cache_service=None):
         self.db = db
+        self.cache_service = cache_service
     
+    def _invalidate(self, *tags: str):
+        if self.cache_service:
+            self.cache_service.invalidate_tags(*tags)
+    
+    @cached("object_meters", lambda object_id, result: [f"object:{object_id}"] + [f"meter:{meter.id}" for meter in result])
     def get_by_object_id(self, object_id: int) -> List[Meter]:
         conn = None
         try:
@@ -198,6 +324,74 @@ class MeterRepository:
             if conn:
                 conn.close()
     
+    def get_page(self, cursor: Optional[int] = None, 
+                 limit: int = 200) -> Tuple[List[Tuple[Meter, str]], Optional[int]]:
+        conn = None
+        try:
+            conn = self.db.get_connection()
+            db_cursor = conn.cursor()
+            db_cursor.execute("""
+                SELECT m.*, o.address FROM Meters m
+                JOIN Objects o ON m.object_id = o.id
+                WHERE m.id > ?
+                ORDER BY m.id LIMIT ?
+            """, (cursor or 0, limit))
+            meters = [(Meter.from_row(row[:-1]), row[-1]) for row in db_cursor.fetchall()]
+        except Exception as e:
+            print(f"Ошибка получения страницы счетчиков: {e}")
+            return [], None
+        finally:
+            if conn:
+                conn.close()
+        
+        next_cursor = meters[-1][0].id if len(meters) == limit else None
+        return meters, next_cursor
+    
+    def search_ids(self, text: str, limit: Optional[int] = None) -> List[int]:
+        pattern = like_pattern(text)
+        conn = None
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT m.id FROM Meters m
+                JOIN Objects o ON m.object_id = o.id
+                WHERE unicode_lower(m.type) LIKE ?1 ESCAPE '\\'
+                   OR unicode_lower(m.serial_number) LIKE ?1 ESCAPE '\\'
+                   OR unicode_lower(o.address) LIKE ?1 ESCAPE '\\'
+                ORDER BY m.id
+                LIMIT ?2
+            """, (pattern, -1 if limit is None else limit))
+            return [row[0] for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"Ошибка поиска счетчиков: {e}")
+            return []
+        finally:
+            if conn:
+                conn.close()
+    
+    def get_by_ids_with_addresses(self, meter_ids: List[int]) -> List[Tuple[Meter, str]]:
+        if not meter_ids:
+            return []
+        conn = None
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT m.*, o.address FROM Meters m
+                JOIN Objects o ON m.object_id = o.id
+                WHERE m.id IN ({', '.join('?' * len(meter_ids))})
+            """, meter_ids)
+            meters = {row[0]: (Meter.from_row(row[:-1]), row[-1]) for row in cursor.fetchall()}
+            return [meters[meter_id] for meter_id in meter_ids if meter_id in meters]
+        except Exception as e:
+            print(f"Ошибка получения счетчиков по ID: {e}")
+            return []
+        finally:
+            if conn:
+                conn.close()
+    
+    @cached("meter", lambda meter_id, result: [f"meter:{meter_id}", f"object:{result.object_id}"])
     def get_by_id(self, meter_id: int) -> Optional[Meter]:
         conn = None
         try:
@@ -245,6 +439,7 @@ class MeterRepository:
                   meter.location, meter.is_active))
             meter_id = cursor.lastrowid
             conn.commit()
+            self._invalidate(f"object:{meter.object_id}", "table:Meters")
             return meter_id
         except Exception as e:
             if conn:
@@ -270,6 +465,7 @@ class MeterRepository:
                   meter.next_verification_date, meter.tariff, meter.unit,
                   meter.location, meter.is_active, meter.id))
             conn.commit()
+            self._invalidate(f"meter:{meter.id}", f"object:{meter.object_id}", "table:Meters")
         except Exception as e:
             if conn:
                 conn.rollback()
@@ -277,10 +473,35 @@ class MeterRepository:
         finally:
             if conn:
                 conn.close()
+    
+    def delete(self, meter_id: int):
+        conn = None
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            row = cursor.execute("SELECT object_id FROM Meters WHERE id = ?", (meter_id,)).fetchone()
+            cursor.execute("DELETE FROM Meters WHERE id = ?", (meter_id,))
+            conn.commit()
+            tags = [f"meter:{meter_id}", "table:Meters", "table:Readings"]
+            if row:
+                tags.append(f"object:{row[0]}")
+            self._invalidate(*tags)
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            raise Exception(f"Ошибка удаления счетчика: {e}")
+        finally:
+            if conn:
+                conn.close()
 
 class ReadingRepository:
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, cache_service=None):
         self.db = db
+        self.cache_service = cache_service
+    
+    def _invalidate(self, *tags: str):
+        if self.cache_service:
+            self.cache_service.invalidate_tags(*tags)
     
     def get_last_reading(self, meter_id: int) -> Optional[Reading]:
         conn = None
@@ -302,6 +523,26 @@ class ReadingRepository:
             if conn:
                 conn.close()
     
+    def get_previous_reading(self, reading: Reading) -> Optional[Reading]:
+        conn = None
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT * FROM Readings 
+                WHERE meter_id = ? AND (reading_date, id) < (?, ?)
+                ORDER BY reading_date DESC, id DESC 
+                LIMIT 1
+            """, (reading.meter_id, reading.reading_date, reading.id))
+            row = cursor.fetchone()
+            return Reading.from_row(row) if row else None
+        except Exception as e:
+            print(f"Ошибка получения предыдущего показания для показания {reading.id}: {e}")
+            return None
+        finally:
+            if conn:
+                conn.close()
+    
     def get_by_meter_id(self, meter_id: int) -> List[Reading]:
         conn = None
         try:
@@ -321,6 +562,122 @@ class ReadingRepository:
             if conn:
                 conn.close()
     
+    def _build_query_filters(self, alias_reading: str, alias_meter: str,
+                             object_id: Optional[int], meter_id: Optional[int],
+                             date_from: Optional[date], date_to: Optional[date]) -> Tuple[str, List[Any]]:
+        conditions = []
+        params = []
+        if object_id:
+            conditions.append(f"{alias_meter}.object_id = ?")
+            params.append(object_id)
+        if meter_id:
+            conditions.append(f"{alias_reading}.meter_id = ?")
+            params.append(meter_id)
+        if date_from:
+            conditions.append(f"{alias_reading}.reading_date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append(f"{alias_reading}.reading_date <= ?")
+            params.append(date_to)
+        where = " AND ".join(conditions) if conditions else "1=1"
+        return where, params
+    
+    def count(self, object_id: Optional[int] = None, meter_id: Optional[int] = None,
+              date_from: Optional[date] = None, date_to: Optional[date] = None) -> int:
+        where, params = self._build_query_filters('r', 'm', object_id, meter_id, date_from, date_to)
+        conn = None
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT COUNT(*) FROM Readings r
+                JOIN Meters m ON r.meter_id = m.id
+                JOIN Objects o ON m.object_id = o.id
+                WHERE {where}
+            """, params)
+            return cursor.fetchone()[0]
+        except Exception as e:
+            print(f"Ошибка подсчета показаний: {e}")
+            return 0
+        finally:
+            if conn:
+                conn.close()
+    
+    def query(self, object_id: Optional[int] = None, meter_id: Optional[int] = None,
+              date_from: Optional[date] = None, date_to: Optional[date] = None,
+              cursor: Optional[Tuple[str, int]] = None, limit: int = 50,
+              with_total: bool = True) -> Dict[str, Any]:
+        where, params = self._build_query_filters('r', 'm', object_id, meter_id, date_from, date_to)
+        page_where = where
+        page_params = list(params)
+        if cursor:
+            page_where += " AND (r.reading_date, r.id) < (?, ?)"
+            page_params.extend(cursor)
+        
+        total_sql = "NULL"
+        total_params = []
+        if with_total:
+            total_where, total_params = self._build_query_filters('r2', 'm2', object_id, meter_id,
+                                                                  date_from, date_to)
+            total_sql = f"""(
+                SELECT COUNT(*) FROM Readings r2
+                JOIN Meters m2 ON r2.meter_id = m2.id
+                JOIN Objects o2 ON m2.object_id = o2.id
+                WHERE {total_where}
+            )"""
+        
+        conn = None
+        try:
+            conn = self.db.get_connection()
+            db_cursor = conn.cursor()
+            db_cursor.execute(f"""
+                SELECT r.*, m.*, o.*, c.consumption, c.amount, c.tariff, {total_sql}
+                FROM Readings r
+                JOIN Meters m ON r.meter_id = m.id
+                JOIN Objects o ON m.object_id = o.id
+                LEFT JOIN Calculations c ON c.reading_id = r.id
+                WHERE {page_where}
+                ORDER BY r.reading_date DESC, r.id DESC
+                LIMIT ?
+            """, total_params + page_params + [limit])
+            rows = db_cursor.fetchall()
+        except Exception as e:
+            print(f"Ошибка получения страницы показаний: {e}")
+            rows = []
+        finally:
+            if conn:
+                conn.close()
+        
+        items = []
+        for row in rows:
+            reading = Reading.from_row(row[0:7])
+            meter = Meter.from_row(row[7:19])
+            obj = Object.from_row(row[19:30])
+            consumption, amount, tariff = row[30:33]
+            calc = {}
+            if consumption is not None:
+                calc = {'consumption': consumption, 'amount': amount,
+                        'tariff': tariff, 'unit': meter.unit}
+            items.append((reading, meter, obj, calc))
+        
+        if not with_total:
+            total = None
+        elif rows:
+            total = rows[0][33]
+        else:
+            total = self.count(object_id, meter_id, date_from, date_to) if cursor else 0
+        
+        next_cursor = None
+        if len(items) == limit:
+            last_reading = items[-1][0]
+            next_cursor = (last_reading.reading_date, last_reading.id)
+        
+        return {
+            'items': items,
+            'total': total,
+            'next_cursor': next_cursor
+        }
+    
     def create(self, reading: Reading) -> int:
         conn = None
         try:
@@ -337,6 +694,7 @@ class ReadingRepository:
                   previous_id, reading.photo_path))
             reading_id = cursor.lastrowid
             conn.commit()
+            self._invalidate(f"meter_readings:{reading.meter_id}", "table:Readings")
             return reading_id
         except Exception as e:
             if conn:
@@ -347,39 +705,38 @@ class ReadingRepository:
                 conn.close()
 
 class UserRepository:
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, cache_service=None):
         self.db = db
+        self.cache_service = cache_service
+    
+    def _invalidate(self, *tags: str):
+        if self.cache_service:
+            self.cache_service.invalidate_tags(*tags)
     
+    @cached("users", lambda result: ["table:Users"])
     def get_all(self) -> List[User]:
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Users ORDER BY username")
-        rows = cursor.fetchall()
-        conn.close()
+        with self.db.connection() as conn:
+            rows = conn.execute("SELECT * FROM Users ORDER BY username").fetchall()
         return [User.from_row(row) for row in rows]
     
+    @cached("user", lambda user_id, result: [f"user:{user_id}"])
     def get_by_id(self, user_id: int) -> Optional[User]:
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Users WHERE id = ?", (user_id,))
-        row = cursor.fetchone()
-        conn.close()
+        with self.db.connection() as conn:
+            row = conn.execute("SELECT * FROM Users WHERE id = ?", (user_id,)).fetchone()
         return User.from_row(row) if row else None
     
     def get_by_username(self, username: str) -> Optional[User]:
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Users WHERE username = ?", (username,))
-        row = cursor.fetchone()
-        conn.close()
+        with self.db.connection() as conn:
+            row = conn.execute("SELECT * FROM Users WHERE username = ?", (username,)).fetchone()
         return User.from_row(row) if row else None
     
     def get_objects_by_user(self, user_id: int, cache_service=None) -> List[Object]:
+        cache_service = cache_service or self.cache_service
         cache_key = f"user_objects_{user_id}"
         if cache_service:
-            cached = cache_service.get(cache_key)
-            if cached is not None:
-                return cached
+            cached_result = cache_service.get(cache_key)
+            if cached_result is not None:
+                return copy_result(cached_result)
         
         conn = None
         try:
@@ -400,20 +757,20 @@ class UserRepository:
                 conn.close()
         
         if cache_service:
-            cache_service.set(cache_key, result, ttl_seconds=300)
+            tags = [f"user:{user_id}", "table:UserObjects"] + [f"object:{obj.id}" for obj in result]
+            cache_service.set(cache_key, result, ttl_seconds=300, tags=tags)
+            return copy_result(result)
         
         return result
     
+    @cached("object_users", lambda object_id, result: [f"object:{object_id}", f"object_users:{object_id}"])
     def get_users_by_object(self, object_id: int) -> List[User]:
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT u.* FROM Users u
-            JOIN UserObjects uo ON u.id = uo.user_id
-            WHERE uo.object_id = ?
-        """, (object_id,))
-        rows = cursor.fetchall()
-        conn.close()
+        with self.db.connection() as conn:
+            rows = conn.execute("""
+                SELECT u.* FROM Users u
+                JOIN UserObjects uo ON u.id = uo.user_id
+                WHERE uo.object_id = ?
+            """, (object_id,)).fetchall()
         return [User.from_row(row) for row in rows]
     
     def assign_object_to_user(self, user_id: int, object_id: int):
@@ -426,6 +783,7 @@ class UserRepository:
                 VALUES (?, ?)
             """, (user_id, object_id))
             conn.commit()
+            self._invalidate(f"user:{user_id}", f"object_users:{object_id}")
         except Exception as e:
             if conn:
                 conn.rollback()
@@ -443,6 +801,7 @@ class UserRepository:
                 DELETE FROM UserObjects WHERE user_id = ? AND object_id = ?
             """, (user_id, object_id))
             conn.commit()
+            self._invalidate(f"user:{user_id}", f"object_users:{object_id}")
         except Exception as e:
             if conn:
                 conn.rollback()
@@ -3,9 +3,12 @@ from .reports import ReportGenerator, ChartWidget
 from .notifications import NotificationService
 from .receipt import ReceiptGenerator
 from .import_service import ImportService
+from .search_service import SearchService
 from .audit_service import AuditService
 from .auth_service import AuthService
 from .cache_service import CacheService
+from .dashboard_service import DashboardService
+from .chart_service import ChartService
 
-__all__ = ['CalculationService', 'ReportGenerator', 'ChartWidget', 'NotificationService', 'ReceiptGenerator', 'ImportService', 'AuditService', 'AuthService', 'CacheService']
+__all__ = ['CalculationService', 'ReportGenerator', 'ChartWidget', 'NotificationService', 'ReceiptGenerator', 'ImportService', 'SearchService', 'AuditService', 'AuthService', 'CacheService', 'DashboardService', 'ChartService']
 
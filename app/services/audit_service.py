@@ -1,98 +1,335 @@
-from datetime import datetime
-from typing import Optional, List, Dict
+import queue
+import threading
+import time
+import csv
+import os
+import re
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, List, Dict, Tuple, Iterator, Any
+from openpyxl import Workbook
+from app.config import Config
 from app.database import Database
+from app.models.models import like_pattern
+from app.services.search_service import SearchService
+
+ARCHIVE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS audit_archive.AuditLog (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        username TEXT,
+        action_type TEXT NOT NULL,
+        entity_type TEXT NOT NULL,
+        entity_id INTEGER,
+        old_value TEXT,
+        new_value TEXT,
+        description TEXT,
+        ip_address TEXT,
+        created_at TIMESTAMP
+    )
+"""
+ARCHIVE_INDEX_SQL = "CREATE INDEX IF NOT EXISTS audit_archive.idx_audit_created_at ON AuditLog(created_at)"
 
 class AuditService:
-    def __init__(self, db: Database):
+    COLUMNS = ['id', 'user_id', 'username', 'action_type', 'entity_type',
+               'entity_id', 'old_value', 'new_value', 'description', 'ip_address', 'created_at']
+    INSERT_SQL = """
+        INSERT INTO AuditLog (user_id, username, action_type, entity_type, 
+                            entity_id, old_value, new_value, description, ip_address, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    _STOP = object()
+    
+    def __init__(self, db: Database, batch_size: Optional[int] = None,
+                 flush_interval_ms: Optional[int] = None, queue_size: Optional[int] = None):
         self.db = db
-        self.init_audit_table()
+        self.search_service = SearchService(db)
+        self.batch_size = batch_size or Config.AUDIT_BATCH_SIZE
+        self.flush_interval = (flush_interval_ms or Config.AUDIT_FLUSH_INTERVAL_MS) / 1000
+        self.put_timeout = Config.AUDIT_PUT_TIMEOUT_MS / 1000
+        self.queue = queue.Queue(maxsize=queue_size or Config.AUDIT_QUEUE_SIZE)
+        self.writer_thread = None
+        self.running = False
+        self.closed = False
+        self.lock = threading.Lock()
     
-    def init_audit_table(self):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS AuditLog (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                username TEXT,
-                action_type TEXT NOT NULL,
-                entity_type TEXT NOT NULL,
-                entity_id INTEGER,
-                old_value TEXT,
-                new_value TEXT,
-                description TEXT,
-                ip_address TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_audit_user_id ON AuditLog(user_id)
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_audit_entity ON AuditLog(entity_type, entity_id)
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_audit_created_at ON AuditLog(created_at)
-        """)
-        
-        conn.commit()
-        conn.close()
+    def start(self):
+        with self.lock:
+            if self.running or self.closed:
+                return
+            self.running = True
+            self.writer_thread = threading.Thread(target=self._writer_loop, name="audit-writer", daemon=True)
+            self.writer_thread.start()
     
     def log_action(self, user_id: Optional[int], username: Optional[str],
                    action_type: str, entity_type: str, entity_id: Optional[int] = None,
                    old_value: Optional[str] = None, new_value: Optional[str] = None,
                    description: Optional[str] = None, ip_address: Optional[str] = None):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO AuditLog (user_id, username, action_type, entity_type, 
-                                entity_id, old_value, new_value, description, ip_address)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (user_id, username, action_type, entity_type, entity_id,
-              old_value, new_value, description, ip_address))
-        
-        conn.commit()
-        conn.close()
+        created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        record = (user_id, username, action_type, entity_type, entity_id,
+                  old_value, new_value, description, ip_address, created_at)
+        
+        if not self.running:
+            self.start()
+        if self.running:
+            # Очередь ограничена: при переполнении вызывающий поток недолго ждет writer,
+            # а если место не освободилось - пишет запись сам, чтобы она не потерялась
+            try:
+                self.queue.put(record, timeout=self.put_timeout)
+                return
+            except queue.Full:
+                pass
+        self._write_batch([record])
+    
+    def _writer_loop(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is self._STOP:
+                self.queue.task_done()
+                break
+            
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    self.queue.task_done()
+                    break
+                batch.append(item)
+            
+            self._write_batch(batch)
+            for _ in batch:
+                self.queue.task_done()
+    
+    def _write_batch(self, records: List[tuple]):
+        try:
+            with self.db.transaction() as conn:
+                conn.executemany(self.INSERT_SQL, records)
+        except Exception as e:
+            print(f"Ошибка записи журнала аудита ({len(records)} записей): {e}")
+    
+    def flush(self):
+        if self.running:
+            self.queue.join()
+    
+    def shutdown(self):
+        with self.lock:
+            self.closed = True
+            if not self.running:
+                return
+            self.running = False
+        self.queue.put(self._STOP)
+        self.writer_thread.join()
+        self.writer_thread = None
+        
+        remaining = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._STOP:
+                remaining.append(item)
+            self.queue.task_done()
+        if remaining:
+            self._write_batch(remaining)
     
     def get_logs(self, user_id: Optional[int] = None, entity_type: Optional[str] = None,
                  start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
-                 limit: int = 100) -> List[Dict]:
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
+                 limit: int = 100, action_type: Optional[str] = None,
+                 cursor: Optional[Tuple[str, int]] = None, search: Optional[str] = None,
+                 include_archived: bool = False) -> List[Dict]:
+        # Без flush: ожидание writer блокировало бы GUI-поток. Записи из очереди
+        # появляются в выборке не позже чем через flush_interval
+        filters = {
+            'user_id': user_id, 'entity_type': entity_type, 'action_type': action_type,
+            'start_date': start_date, 'end_date': end_date, 'search': search
+        }
+        
+        with self.db.connection() as conn:
+            rows = self._query_logs(conn, 'main', filters, cursor, limit)
+            
+            # Архивные разделы старше живой таблицы, поэтому их читаем только после нее, от новых к старым
+            if include_archived and len(rows) < limit:
+                for archive_path in self.get_archive_paths(start_date, end_date):
+                    conn.execute("ATTACH DATABASE ? AS audit_archive", (archive_path,))
+                    try:
+                        rows += self._query_logs(conn, 'audit_archive', filters, cursor, limit - len(rows))
+                    finally:
+                        conn.execute("DETACH DATABASE audit_archive")
+                    if len(rows) >= limit:
+                        break
         
-        query = "SELECT * FROM AuditLog WHERE 1=1"
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+    
+    def _query_logs(self, conn, schema: str, filters: Dict[str, Any],
+                    cursor: Optional[Tuple[str, int]], limit: int) -> List[tuple]:
+        query = f"SELECT {', '.join(self.COLUMNS)} FROM {schema}.AuditLog WHERE 1=1"
         params = []
         
-        if user_id:
+        if filters['user_id']:
             query += " AND user_id = ?"
-            params.append(user_id)
+            params.append(filters['user_id'])
         
-        if entity_type:
+        if filters['entity_type']:
             query += " AND entity_type = ?"
-            params.append(entity_type)
+            params.append(filters['entity_type'])
+        
+        if filters['action_type']:
+            query += " AND action_type = ?"
+            params.append(filters['action_type'])
         
-        if start_date:
+        if filters['start_date']:
             query += " AND created_at >= ?"
-            params.append(start_date)
+            params.append(self._format_timestamp(filters['start_date']))
         
+        end_date = filters['end_date']
         if end_date:
-            query += " AND created_at <= ?"
-            params.append(end_date)
+            if isinstance(end_date, datetime):
+                query += " AND created_at <= ?"
+                params.append(self._format_timestamp(end_date))
+            else:
+                query += " AND created_at < ?"
+                params.append(self._format_timestamp(end_date + timedelta(days=1)))
         
-        query += " ORDER BY created_at DESC LIMIT ?"
+        # В архиве нет FTS-индекса, поэтому там и при промахе FTS ищется подстрока
+        # по тем же полям, что индексирует AuditLogFts
+        search = filters['search']
+        match_query = None
+        if search and schema == 'main' and self.search_service.is_available():
+            match_query = self.search_service.resolve_match_query(search, 'AuditLogFts')
+        if match_query:
+            query += " AND id IN (SELECT rowid FROM AuditLogFts WHERE AuditLogFts MATCH ?)"
+            params.append(match_query)
+        elif search:
+            query += f" AND {SearchService.like_condition(SearchService.AUDIT_COLUMNS)}"
+            params.extend([like_pattern(search)] * len(SearchService.AUDIT_COLUMNS))
+        
+        if cursor:
+            query += " AND (created_at, id) < (?, ?)"
+            params.extend(cursor)
+        
+        query += " ORDER BY created_at DESC, id DESC LIMIT ?"
         params.append(limit)
         
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
+        return conn.execute(query, params).fetchall()
+    
+    def get_archive_dir(self) -> str:
+        db_dir = os.path.dirname(os.path.abspath(self.db.db_path))
+        return os.path.join(db_dir, Config.AUDIT_ARCHIVE_DIR)
+    
+    def get_archive_paths(self, start_date: Optional[date] = None, 
+                          end_date: Optional[date] = None) -> List[str]:
+        archive_dir = self.get_archive_dir()
+        if not os.path.isdir(archive_dir):
+            return []
+        
+        start_month = self._format_timestamp(start_date)[:7] if start_date else None
+        end_month = self._format_timestamp(end_date)[:7] if end_date else None
         
-        columns = ['id', 'user_id', 'username', 'action_type', 'entity_type',
-                  'entity_id', 'old_value', 'new_value', 'description', 'ip_address', 'created_at']
+        paths = []
+        for filename in os.listdir(archive_dir):
+            match = re.fullmatch(r"audit_(\d{4})_(\d{2})\.db", filename)
+            if not match:
+                continue
+            month = f"{match.group(1)}-{match.group(2)}"
+            if (start_month and month < start_month) or (end_month and month > end_month):
+                continue
+            paths.append((month, os.path.join(archive_dir, filename)))
         
-        return [dict(zip(columns, row)) for row in rows]
+        return [path for _, path in sorted(paths, reverse=True)]
+    
+    def archive_old_logs(self, retention_days: Optional[int] = None, compact: bool = True) -> int:
+        self.flush()
+        retention_days = retention_days if retention_days is not None else Config.AUDIT_RETENTION_DAYS
+        cutoff = self._format_timestamp(datetime.now(timezone.utc) - timedelta(days=retention_days))
+        
+        moved = 0
+        with self.db.connection() as conn:
+            months = [row[0] for row in conn.execute(
+                "SELECT DISTINCT substr(created_at, 1, 7) FROM AuditLog WHERE created_at < ?", (cutoff,))]
+            if not months:
+                return 0
+            
+            archive_dir = self.get_archive_dir()
+            os.makedirs(archive_dir, exist_ok=True)
+            
+            for month in months:
+                year, month_number = month.split('-')
+                month_start = f"{month}-01"
+                next_month = (date(int(year), int(month_number), 1) + timedelta(days=32)).replace(day=1)
+                archive_path = os.path.join(archive_dir, f"audit_{year}_{month_number}.db")
+                params = (month_start, next_month.isoformat(), cutoff)
+                
+                conn.execute("ATTACH DATABASE ? AS audit_archive", (archive_path,))
+                try:
+                    with self.db.transaction() as tx:
+                        tx.execute(ARCHIVE_TABLE_SQL)
+                        tx.execute(ARCHIVE_INDEX_SQL)
+                        tx.execute(f"""
+                            INSERT OR IGNORE INTO audit_archive.AuditLog ({', '.join(self.COLUMNS)})
+                            SELECT {', '.join(self.COLUMNS)} FROM main.AuditLog
+                            WHERE created_at >= ? AND created_at < ? AND created_at < ?
+                        """, params)
+                        moved += tx.execute("""
+                            DELETE FROM main.AuditLog
+                            WHERE created_at >= ? AND created_at < ? AND created_at < ?
+                        """, params).rowcount
+                finally:
+                    conn.execute("DETACH DATABASE audit_archive")
+            
+            if compact and moved:
+                try:
+                    if self.search_service.is_available():
+                        conn.execute("INSERT INTO AuditLogFts (AuditLogFts) VALUES ('optimize')")
+                        conn.commit()
+                    conn.execute("VACUUM")
+                except sqlite3.OperationalError as e:
+                    print(f"Не удалось сжать базу данных после архивации журнала аудита: {e}")
+        
+        return moved
+    
+    @staticmethod
+    def _format_timestamp(value) -> str:
+        if isinstance(value, datetime):
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(value, date):
+            return value.isoformat()
+        return value
+    
+    def iter_logs(self, page_size: int = 1000, **filters: Any) -> Iterator[Dict]:
+        cursor = None
+        while True:
+            logs = self.get_logs(limit=page_size, cursor=cursor, **filters)
+            yield from logs
+            if len(logs) < page_size:
+                break
+            cursor = (logs[-1]['created_at'], logs[-1]['id'])
+    
+    def export_logs(self, file_path: str, page_size: int = 1000, **filters: Any) -> int:
+        count = 0
+        if file_path.lower().endswith('.xlsx'):
+            workbook = Workbook(write_only=True)
+            sheet = workbook.create_sheet("AuditLog")
+            sheet.append(self.COLUMNS)
+            for log in self.iter_logs(page_size, **filters):
+                sheet.append([log[column] for column in self.COLUMNS])
+                count += 1
+            workbook.save(file_path)
+        else:
+            with open(file_path, 'w', newline='', encoding='utf-8-sig') as f:
+                writer = csv.writer(f)
+                writer.writerow(self.COLUMNS)
+                for log in self.iter_logs(page_size, **filters):
+                    writer.writerow([log[column] for column in self.COLUMNS])
+                    count += 1
+        return count
 
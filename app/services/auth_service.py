@@ -17,18 +17,16 @@ class AuthService:
             return False
     
     @staticmethod
-    def migrate_passwords(db: Database):
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id, password FROM Users")
+    def hash_legacy_passwords(cursor):
+        cursor.execute("SELECT id, password FROM Users WHERE substr(password, 1, 4) != '$2b$'")
         users = cursor.fetchall()
         
         for user_id, password in users:
-            if not password.startswith('$2b$'):
-                hashed = AuthService.hash_password(password)
-                cursor.execute("UPDATE Users SET password = ? WHERE id = ?", (hashed, user_id))
-        
-        conn.commit()
-        conn.close()
+            hashed = AuthService.hash_password(password)
+            cursor.execute("UPDATE Users SET password = ? WHERE id = ?", (hashed, user_id))
+    
+    @staticmethod
+    def migrate_passwords(db: Database):
+        with db.transaction() as conn:
+            AuthService.hash_legacy_passwords(conn.cursor())
 
@@ -1,37 +1,51 @@
 import os
 import threading
-import time
 from datetime import datetime, timedelta
 from typing import Optional
 from app.database import Database
 from app.config import Config
 
 class BackupService:
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, audit_service=None):
         self.db = db
+        self.audit_service = audit_service
         self.backup_thread = None
         self.running = False
+        self.stop_event = threading.Event()
         self.backup_interval_hours = 24
     
     def start_auto_backup(self, interval_hours: int = 24):
         self.backup_interval_hours = interval_hours
         self.running = True
+        self.stop_event.clear()
         self.backup_thread = threading.Thread(target=self._backup_loop, daemon=True)
         self.backup_thread.start()
     
     def stop_auto_backup(self):
         self.running = False
+        self.stop_event.set()
         if self.backup_thread:
             self.backup_thread.join(timeout=5)
+            self.backup_thread = None
     
     def _backup_loop(self):
         while self.running:
             try:
+                self.archive_audit_log()
                 self.create_backup()
-                time.sleep(self.backup_interval_hours * 3600)
+                self.stop_event.wait(self.backup_interval_hours * 3600)
             except Exception as e:
                 print(f"Ошибка при создании резервной копии: {e}")
-                time.sleep(3600)
+                self.stop_event.wait(3600)
+    
+    def archive_audit_log(self) -> int:
+        if self.audit_service is None:
+            return 0
+        try:
+            return self.audit_service.archive_old_logs()
+        except Exception as e:
+            print(f"Ошибка архивации журнала аудита: {e}")
+            return 0
     
     def create_backup(self, backup_path: Optional[str] = None) -> str:
         if backup_path is None:
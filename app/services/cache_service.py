@@ -1,46 +1,168 @@
-from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Iterable, Set
+from collections import OrderedDict
+import sys
 import threading
+import time
+from app.config import Config
+
+def estimate_size(value: Any, _seen: Optional[set] = None) -> int:
+    # Приблизительный размер объекта вместе с вложенными контейнерами и атрибутами
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+
+    size = sys.getsizeof(value)
+    if isinstance(value, (str, bytes, bytearray, int, float, bool)) or value is None:
+        return size
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _seen) for item in value)
+    elif hasattr(value, '__dict__'):
+        size += estimate_size(vars(value), _seen)
+    return size
 
 class CacheService:
-    def __init__(self, default_ttl_seconds: int = 300):
-        self.cache: Dict[str, Dict[str, Any]] = {}
-        self.default_ttl = default_ttl_seconds
+    def __init__(self, default_ttl_seconds: Optional[int] = None, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None, sweep_interval_seconds: Optional[float] = None):
+        self.cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.tag_index: Dict[str, Set[str]] = {}
+        self.default_ttl = default_ttl_seconds or Config.CACHE_DEFAULT_TTL_SECONDS
+        self.max_entries = max_entries or Config.CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or Config.CACHE_MAX_BYTES
+        self.sweep_interval = sweep_interval_seconds or Config.CACHE_SWEEP_INTERVAL_SECONDS
         self.lock = threading.Lock()
-    
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.sweeper_thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        with self.lock:
+            if self.sweeper_thread is not None:
+                return
+            self.stop_event.clear()
+            self.sweeper_thread = threading.Thread(target=self._sweep_loop, name="cache-sweeper", daemon=True)
+            self.sweeper_thread.start()
+
+    def shutdown(self):
+        with self.lock:
+            thread = self.sweeper_thread
+            self.sweeper_thread = None
+        if thread is not None:
+            self.stop_event.set()
+            thread.join()
+
+    def _sweep_loop(self):
+        while not self.stop_event.wait(self.sweep_interval):
+            self.cleanup_expired()
+
     def get(self, key: str) -> Optional[Any]:
         with self.lock:
-            if key in self.cache:
-                entry = self.cache[key]
-                if datetime.now() < entry['expires_at']:
-                    return entry['value']
-                else:
-                    del self.cache[key]
-            return None
-    
-    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None):
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.monotonic() >= entry['expires_at']:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return entry['value']
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None,
+            tags: Optional[Iterable[str]] = None):
+        if self.sweeper_thread is None:
+            self.start()
+        size = estimate_size(value)
         with self.lock:
+            if key in self.cache:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
             ttl = ttl_seconds or self.default_ttl
-            expires_at = datetime.now() + timedelta(seconds=ttl)
             self.cache[key] = {
                 'value': value,
-                'expires_at': expires_at
+                'expires_at': time.monotonic() + ttl,
+                'size': size,
+                'tags': frozenset(tags or ())
             }
-    
+            self.total_bytes += size
+            for tag in self.cache[key]['tags']:
+                self.tag_index.setdefault(tag, set()).add(key)
+            self._evict()
+
+    def _remove(self, key: str):
+        entry = self.cache.pop(key)
+        self.total_bytes -= entry['size']
+        for tag in entry['tags']:
+            keys = self.tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tag_index[tag]
+
+    def _evict(self):
+        while self.cache and (len(self.cache) > self.max_entries or self.total_bytes > self.max_bytes):
+            key = next(iter(self.cache))
+            self._remove(key)
+            self.evictions += 1
+
     def delete(self, key: str):
         with self.lock:
             if key in self.cache:
-                del self.cache[key]
-    
+                self._remove(key)
+
+    def invalidate_tags(self, *tags: str) -> int:
+        with self.lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self.tag_index.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
     def clear(self):
         with self.lock:
             self.cache.clear()
-    
-    def cleanup_expired(self):
+            self.tag_index.clear()
+            self.total_bytes = 0
+
+    def cleanup_expired(self) -> int:
         with self.lock:
-            now = datetime.now()
-            expired_keys = [key for key, entry in self.cache.items() 
+            now = time.monotonic()
+            expired_keys = [key for key, entry in self.cache.items()
                           if now >= entry['expires_at']]
             for key in expired_keys:
-                del self.cache[key]
+                self._remove(key)
+            self.expirations += len(expired_keys)
+            return len(expired_keys)
 
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                'entries': len(self.cache),
+                'bytes': self.total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / requests if requests else 0.0
+            }
+
+    def reset_stats(self):
+        with self.lock:
+            self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
@@ -1,13 +1,36 @@
 from datetime import date, timedelta
 from typing import Optional, Dict, List
+import pandas as pd
 from app.models import Reading, Meter, ReadingRepository, MeterRepository
 from app.database import Database
+from app.config import Config
+from app.utils.downsampling import lttb_indices
+
+def to_date(value) -> date:
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
 
 class CalculationService:
-    def __init__(self, db: Database):
+    BUCKETS = {
+        'day': "r.reading_date",
+        'week': "date(r.reading_date, 'weekday 0', '-6 days')",
+        'month': "strftime('%Y-%m-01', r.reading_date)",
+        'quarter': ("printf('%s-%02d-01', strftime('%Y', r.reading_date), "
+                    "(CAST(strftime('%m', r.reading_date) AS INTEGER) - 1) / 3 * 3 + 1)"),
+    }
+    BUCKET_DAYS = {'day': 1, 'week': 7, 'month': 30, 'quarter': 91}
+    AGGREGATES = {'sum': 'SUM', 'avg': 'AVG', 'min': 'MIN', 'max': 'MAX'}
+    
+    def __init__(self, db: Database, cache_service=None):
         self.db = db
-        self.reading_repo = ReadingRepository(db)
-        self.meter_repo = MeterRepository(db)
+        self.cache_service = cache_service
+        self.reading_repo = ReadingRepository(db, cache_service)
+        self.meter_repo = MeterRepository(db, cache_service)
+    
+    def _invalidate(self, *tags: str):
+        if self.cache_service:
+            self.cache_service.invalidate_tags(*tags)
     
     def calculate_consumption(self, current_reading: Reading, 
                              previous_reading: Optional[Reading]) -> float:
@@ -34,16 +57,7 @@ class CalculationService:
             if not meter:
                 return {}
             
-            previous_reading = self.reading_repo.get_last_reading(reading.meter_id)
-            if previous_reading and previous_reading.id == reading.id:
-                cursor.execute("""
-                    SELECT * FROM Readings 
-                    WHERE meter_id = ? AND id != ? 
-                    ORDER BY reading_date DESC, id DESC 
-                    LIMIT 1
-                """, (reading.meter_id, reading.id))
-                prev_row = cursor.fetchone()
-                previous_reading = Reading.from_row(prev_row) if prev_row else None
+            previous_reading = self.reading_repo.get_previous_reading(reading)
             
             consumption = self.calculate_consumption(reading, previous_reading)
             amount = self.calculate_amount(consumption, meter.tariff)
@@ -55,6 +69,7 @@ class CalculationService:
             """, (reading_id, consumption, amount, meter.tariff))
             
             conn.commit()
+            self._invalidate(f"meter_readings:{reading.meter_id}", "table:Readings")
             return {
                 'consumption': consumption,
                 'amount': amount,
@@ -70,56 +85,312 @@ class CalculationService:
             if conn:
                 conn.close()
     
-    def get_statistics(self, object_id: int, start_date: date, 
-                      end_date: date) -> Dict:
+    def recalculate(self, meter_ids: Optional[List[int]] = None, 
+                    since: Optional[date] = None) -> int:
+        if meter_ids is not None and not meter_ids:
+            return 0
+        
+        if meter_ids is None:
+            meter_chunks = [None]
+        else:
+            ids = list(dict.fromkeys(meter_ids))
+            meter_chunks = [ids[i:i + 500] for i in range(0, len(ids), 500)]
+        
+        processed = 0
+        try:
+            with self.db.transaction() as conn:
+                for chunk in meter_chunks:
+                    params = []
+                    meter_filter = "1=1"
+                    if chunk is not None:
+                        meter_filter = f"m.id IN ({', '.join('?' * len(chunk))})"
+                        params.extend(chunk)
+                    
+                    if since:
+                        # Окно LAG начинается с последнего показания до since, а не с начала истории
+                        cursor = conn.execute(f"""
+                            SELECT id, value, previous_value, tariff FROM (
+                                SELECT r.id, r.value, r.reading_date, b.tariff,
+                                       LAG(r.value) OVER (
+                                           PARTITION BY r.meter_id ORDER BY r.reading_date, r.id
+                                       ) AS previous_value
+                                FROM (
+                                    SELECT m.id, m.tariff,
+                                           (SELECT MAX(p.reading_date) FROM Readings p
+                                            WHERE p.meter_id = m.id AND p.reading_date < ?) AS start_date
+                                    FROM Meters m
+                                    WHERE {meter_filter}
+                                ) b
+                                JOIN Readings r ON r.meter_id = b.id
+                                    AND r.reading_date >= COALESCE(b.start_date, ?)
+                            )
+                            WHERE reading_date >= ?
+                        """, [since] + params + [since, since])
+                    else:
+                        cursor = conn.execute(f"""
+                            SELECT r.id, r.value,
+                                   LAG(r.value) OVER (
+                                       PARTITION BY r.meter_id ORDER BY r.reading_date, r.id
+                                   ) AS previous_value,
+                                   m.tariff
+                            FROM Readings r
+                            JOIN Meters m ON r.meter_id = m.id
+                            WHERE {meter_filter}
+                        """, params)
+                    
+                    while True:
+                        rows = cursor.fetchmany(5000)
+                        if not rows:
+                            break
+                        
+                        batch = []
+                        for reading_id, value, previous_value, tariff in rows:
+                            consumption = 0.0 if previous_value is None else max(0.0, value - previous_value)
+                            batch.append((reading_id, consumption,
+                                          self.calculate_amount(consumption, tariff), tariff))
+                        
+                        conn.executemany("""
+                            INSERT INTO Calculations (reading_id, consumption, amount, tariff)
+                            VALUES (?, ?, ?, ?)
+                            ON CONFLICT(reading_id) DO UPDATE SET
+                                consumption = excluded.consumption,
+                                amount = excluded.amount,
+                                tariff = excluded.tariff,
+                                calculated_at = CURRENT_TIMESTAMP
+                        """, batch)
+                        processed += len(batch)
+            
+            if meter_ids is None:
+                self._invalidate("table:Readings", "table:Calculations")
+            else:
+                self._invalidate("table:Readings", *[f"meter_readings:{meter_id}" for meter_id in ids])
+            return processed
+        except Exception as e:
+            raise Exception(f"Ошибка пересчета показаний: {e}")
+    
+    def get_calculations(self, reading_ids: List[int]) -> Dict[int, Dict]:
+        results = {}
+        if not reading_ids:
+            return results
+        
         conn = None
         try:
             conn = self.db.get_connection()
             cursor = conn.cursor()
             
-            cursor.execute("""
-                SELECT m.type, SUM(c.consumption) as total_consumption,
-                       SUM(c.amount) as total_amount, COUNT(*) as readings_count
-                FROM Calculations c
-                JOIN Readings r ON c.reading_id = r.id
-                JOIN Meters m ON r.meter_id = m.id
-                WHERE m.object_id = ? 
-                AND r.reading_date BETWEEN ? AND ?
-                GROUP BY m.type
-            """, (object_id, start_date, end_date))
-            
-            stats = {}
-            for row in cursor.fetchall():
-                stats[row[0]] = {
-                    'consumption': row[1] or 0.0,
-                    'amount': row[2] or 0.0,
-                    'readings_count': row[3]
-                }
+            ids = list(dict.fromkeys(reading_ids))
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                cursor.execute(f"""
+                    SELECT c.reading_id, c.consumption, c.amount, c.tariff, m.unit
+                    FROM Calculations c
+                    JOIN Readings r ON c.reading_id = r.id
+                    JOIN Meters m ON r.meter_id = m.id
+                    WHERE c.reading_id IN ({placeholders})
+                """, chunk)
+                for row in cursor.fetchall():
+                    results[row[0]] = {
+                        'consumption': row[1],
+                        'amount': row[2],
+                        'tariff': row[3],
+                        'unit': row[4]
+                    }
             
-            return stats
+            return results
         except Exception as e:
-            print(f"Ошибка получения статистики для объекта {object_id}: {e}")
-            return {}
+            print(f"Ошибка получения расчетов: {e}")
+            return results
         finally:
             if conn:
                 conn.close()
     
+    def get_calculation(self, reading_id: int) -> Dict:
+        return self.get_calculations([reading_id]).get(reading_id, {})
+    
+    def get_statistics(self, object_id: int, start_date: date, 
+                      end_date: date) -> Dict:
+        return self.get_statistics_bulk([object_id], start_date, end_date).get(object_id, {})
+    
+    def get_statistics_bulk(self, object_ids: Optional[List[int]], start_date: date,
+                            end_date: date) -> Dict[int, Dict]:
+        # Один сгруппированный запрос на все объекты; object_ids=None - по всему городу.
+        # CROSS JOIN фиксирует порядок: счетчики идут по индексу (object_id, type), поэтому
+        # группировка не требует сортировки. Тариф - у первого счетчика этого типа на объекте
+        if object_ids is None:
+            chunks = [None]
+        else:
+            chunks = [object_ids[i:i + 500] for i in range(0, len(object_ids), 500)]
+        
+        stats = {}
+        try:
+            with self.db.connection() as conn:
+                for chunk in chunks:
+                    object_filter = ""
+                    params = [start_date, end_date]
+                    if chunk is not None:
+                        if not chunk:
+                            continue
+                        object_filter = f"AND m.object_id IN ({', '.join('?' * len(chunk))})"
+                        params.extend(chunk)
+                    
+                    for row in conn.execute(f"""
+                        SELECT m.object_id, m.type, SUM(c.consumption) as total_consumption,
+                               SUM(c.amount) as total_amount, COUNT(*) as readings_count,
+                               (SELECT t.tariff FROM Meters t
+                                WHERE t.object_id = m.object_id AND t.type = m.type
+                                ORDER BY t.id LIMIT 1) as tariff
+                        FROM Meters m
+                        CROSS JOIN Readings r ON r.meter_id = m.id
+                        CROSS JOIN Calculations c ON c.reading_id = r.id
+                        WHERE r.reading_date BETWEEN ? AND ? {object_filter}
+                        GROUP BY m.object_id, m.type
+                        ORDER BY m.object_id, m.type
+                    """, params):
+                        stats.setdefault(row[0], {})[row[1]] = {
+                            'consumption': row[2] or 0.0,
+                            'amount': row[3] or 0.0,
+                            'readings_count': row[4],
+                            'tariff': row[5] or 0.0
+                        }
+            return stats
+        except Exception as e:
+            print(f"Ошибка получения статистики по объектам: {e}")
+            return {}
+    
     def get_monthly_consumption(self, meter_id: int, months: int = 12) -> List[Dict]:
+        end_date = date.today()
+        start_date = end_date - timedelta(days=months * 30)
+        return self.get_consumption_series(meter_id, start_date)
+    
+    @classmethod
+    def choose_bucket(cls, start_date: date, end_date: date, max_points: int) -> str:
+        days = (end_date - start_date).days + 1
+        for bucket, bucket_days in cls.BUCKET_DAYS.items():
+            if days / bucket_days <= max_points:
+                return bucket
+        return 'quarter'
+    
+    def get_consumption_buckets(self, meter_id: int, start_date: date, end_date: date,
+                                bucket: str = 'month', aggregate: str = 'sum') -> List[Dict]:
+        if bucket not in self.BUCKETS:
+            raise ValueError(f"Неизвестный период группировки: {bucket}")
+        if aggregate not in self.AGGREGATES:
+            raise ValueError(f"Неизвестная агрегатная функция: {aggregate}")
+        
+        bucket_expr = self.BUCKETS[bucket]
+        function = self.AGGREGATES[aggregate]
+        try:
+            with self.db.connection() as conn:
+                rows = conn.execute(f"""
+                    SELECT {bucket_expr} AS bucket, {function}(c.consumption), {function}(c.amount),
+                           COUNT(*)
+                    FROM Readings r
+                    JOIN Calculations c ON r.id = c.reading_id
+                    WHERE r.meter_id = ? AND r.reading_date BETWEEN ? AND ?
+                    GROUP BY bucket
+                    ORDER BY bucket
+                """, (meter_id, start_date, end_date)).fetchall()
+        except Exception as e:
+            print(f"Ошибка группировки потребления для счетчика {meter_id}: {e}")
+            return []
+        
+        return [{
+            'date': row[0],
+            'consumption': row[1] or 0.0,
+            'amount': row[2] or 0.0,
+            'readings_count': row[3]
+        } for row in rows]
+    
+    def get_consumption_points(self, meter_id: int, start_date: date, end_date: date,
+                               bucket: str = 'auto', aggregate: str = 'sum',
+                               max_points: Optional[int] = None) -> List[Dict]:
+        max_points = max_points or Config.CHART_MAX_POINTS
+        if bucket == 'auto':
+            bucket = self.choose_bucket(start_date, end_date, max_points)
+        data = self.get_consumption_buckets(meter_id, start_date, end_date, bucket, aggregate)
+        if len(data) <= max_points:
+            return data
+        
+        # Если даже крупных корзин больше лимита, ряд прореживается с сохранением формы
+        x = [to_date(row['date']).toordinal() for row in data]
+        y = [row['consumption'] for row in data]
+        return [data[i] for i in lttb_indices(x, y, max_points)]
+    
+    def get_consumption_pivot(self, object_id: Optional[int], start_date: date, end_date: date,
+                              group_by: str = 'meter', bucket: str = 'auto',
+                              aggregate: str = 'sum',
+                              max_points: Optional[int] = None) -> pd.DataFrame:
+        # Один сгруппированный запрос по всем счетчикам объекта (или города при object_id=None),
+        # развернутый в таблицу: строки - периоды, столбцы - счетчики или типы услуг
+        if group_by not in ('meter', 'type'):
+            raise ValueError(f"Неизвестный способ группировки: {group_by}")
+        if aggregate not in self.AGGREGATES:
+            raise ValueError(f"Неизвестная агрегатная функция: {aggregate}")
+        max_points = max_points or Config.CHART_MAX_POINTS
+        if bucket == 'auto':
+            bucket = self.choose_bucket(start_date, end_date, max_points)
+        if bucket not in self.BUCKETS:
+            raise ValueError(f"Неизвестный период группировки: {bucket}")
+        
+        series_expr = "m.id" if group_by == 'meter' else "m.type"
+        object_filter = ""
+        params = [start_date, end_date]
+        if object_id is not None:
+            object_filter = "AND m.object_id = ?"
+            params.append(object_id)
+        
+        try:
+            with self.db.connection() as conn:
+                df = pd.read_sql_query(f"""
+                    SELECT {self.BUCKETS[bucket]} AS bucket, {series_expr} AS series,
+                           MIN(m.type) AS type, MIN(m.serial_number) AS serial_number,
+                           {self.AGGREGATES[aggregate]}(c.consumption) AS consumption
+                    FROM Meters m
+                    CROSS JOIN Readings r ON r.meter_id = m.id
+                    CROSS JOIN Calculations c ON c.reading_id = r.id
+                    WHERE r.reading_date BETWEEN ? AND ? {object_filter}
+                    GROUP BY bucket, series
+                """, conn, params=params)
+        except Exception as e:
+            print(f"Ошибка получения потребления по счетчикам: {e}")
+            return pd.DataFrame()
+        
+        if df.empty:
+            return pd.DataFrame()
+        
+        if group_by == 'meter':
+            labels = {row.series: f"{row.type} ({row.serial_number or row.series})"
+                      for row in df.drop_duplicates('series').itertuples()}
+        pivot = df.pivot(index='bucket', columns='series', values='consumption').sort_index()
+        pivot.index = pd.to_datetime(pivot.index)
+        pivot.columns.name = None
+        if group_by == 'meter':
+            pivot = pivot.rename(columns=labels)
+        
+        if len(pivot) > max_points:
+            x = [timestamp.toordinal() for timestamp in pivot.index]
+            pivot = pivot.iloc[lttb_indices(x, pivot.sum(axis=1).to_numpy(), max_points)]
+        return pivot
+    
+    def get_consumption_series(self, meter_id: int, start_date: date,
+                               end_date: Optional[date] = None) -> List[Dict]:
         conn = None
         try:
             conn = self.db.get_connection()
             cursor = conn.cursor()
             
-            end_date = date.today()
-            start_date = end_date - timedelta(days=months * 30)
-            
-            cursor.execute("""
+            query = """
                 SELECT r.reading_date, c.consumption, c.amount
                 FROM Readings r
                 JOIN Calculations c ON r.id = c.reading_id
                 WHERE r.meter_id = ? AND r.reading_date >= ?
-                ORDER BY r.reading_date
-            """, (meter_id, start_date))
+            """
+            params = [meter_id, start_date]
+            if end_date is not None:
+                query += " AND r.reading_date <= ?"
+                params.append(end_date)
+            cursor.execute(query + " ORDER BY r.reading_date", params)
             
             results = []
             for row in cursor.fetchall():
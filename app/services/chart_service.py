@@ -0,0 +1,203 @@
+import threading
+from datetime import date
+from io import BytesIO
+from typing import Dict, List, Optional
+from matplotlib import dates as mdates
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from app.config import Config
+from app.database import Database
+from app.services.calculations import CalculationService, to_date
+
+# Графики строятся через объектный API matplotlib без pyplot: у фигуры нет глобального
+# состояния, поэтому ее можно рисовать в рабочем потоке и гарантированно освобождать
+
+# Маркеры точек рисуются только на коротких рядах, на длинных они сливаются в сплошную линию
+MARKER_MAX_POINTS = 60
+
+def draw_consumption_chart(fig: Figure, data: List[Dict], chart_type: str = 'line',
+                           bar_width_days: Optional[float] = None):
+    dates = [to_date(row['date']) for row in data]
+    consumption = [row['consumption'] for row in data]
+    marker = 'o' if len(dates) <= MARKER_MAX_POINTS else None
+    ax = fig.add_subplot()
+
+    if chart_type == 'bar':
+        if bar_width_days is None:
+            steps = [(b - a).days for a, b in zip(dates, dates[1:]) if b > a]
+            bar_width_days = min(steps) if steps else 1
+        ax.bar(dates, consumption, width=bar_width_days * 0.8, color='steelblue', alpha=0.7)
+    elif chart_type == 'area':
+        ax.fill_between(dates, consumption, alpha=0.5, color='steelblue')
+        ax.plot(dates, consumption, marker=marker, linewidth=2, markersize=6)
+    else:
+        ax.plot(dates, consumption, marker=marker, linewidth=2, markersize=6, label='Расход')
+
+    # Подписи дат подбираются по масштабу оси, а не для каждой точки
+    locator = mdates.AutoDateLocator()
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+    ax.set_xlabel('Дата')
+    ax.set_ylabel('Расход')
+    ax.set_title('График потребления')
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+
+def draw_multi_consumption_chart(fig: Figure, pivot, chart_type: str = 'line',
+                                 bar_width_days: Optional[float] = None,
+                                 title: str = 'График потребления'):
+    # Линейный график накладывает ряды друг на друга, столбчатый и областной - складывают
+    dates = [timestamp.date() for timestamp in pivot.index]
+    marker = 'o' if len(dates) <= MARKER_MAX_POINTS else None
+    ax = fig.add_subplot()
+
+    if chart_type == 'bar':
+        if bar_width_days is None:
+            steps = [(b - a).days for a, b in zip(dates, dates[1:]) if b > a]
+            bar_width_days = min(steps) if steps else 1
+        bottom = [0.0] * len(dates)
+        for column in pivot.columns:
+            values = pivot[column].fillna(0).tolist()
+            ax.bar(dates, values, width=bar_width_days * 0.8, bottom=bottom, alpha=0.8,
+                   label=str(column))
+            bottom = [b + v for b, v in zip(bottom, values)]
+    elif chart_type == 'area':
+        ax.stackplot(dates, *[pivot[column].fillna(0).tolist() for column in pivot.columns],
+                     labels=[str(column) for column in pivot.columns], alpha=0.7)
+    else:
+        for column in pivot.columns:
+            ax.plot(dates, pivot[column].tolist(), marker=marker, linewidth=2, markersize=5,
+                    label=str(column))
+
+    locator = mdates.AutoDateLocator()
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+    ax.set_xlabel('Дата')
+    ax.set_ylabel('Расход')
+    ax.set_title(title)
+    ax.grid(True, alpha=0.3)
+    ax.legend(loc='upper left', fontsize='small')
+    fig.tight_layout()
+
+def draw_comparison_chart(fig: Figure, stats: Dict):
+    meter_types = list(stats.keys())
+    consumptions = [stats[mt]['consumption'] for mt in meter_types]
+    amounts = [stats[mt]['amount'] for mt in meter_types]
+    ax1, ax2 = fig.subplots(1, 2)
+
+    ax1.bar(meter_types, consumptions, color='steelblue', alpha=0.7)
+    ax1.set_xlabel('Тип счетчика')
+    ax1.set_ylabel('Расход')
+    ax1.set_title('Расход по типам счетчиков')
+    ax1.tick_params(axis='x', rotation=45)
+    ax1.grid(True, alpha=0.3, axis='y')
+
+    ax2.bar(meter_types, amounts, color='coral', alpha=0.7)
+    ax2.set_xlabel('Тип счетчика')
+    ax2.set_ylabel('Сумма (руб.)')
+    ax2.set_title('Сумма к оплате по типам счетчиков')
+    ax2.tick_params(axis='x', rotation=45)
+    ax2.grid(True, alpha=0.3, axis='y')
+
+    fig.tight_layout()
+
+def figure_to_png(fig: Figure, dpi: Optional[int] = None) -> bytes:
+    try:
+        FigureCanvasAgg(fig)
+        buffer = BytesIO()
+        fig.savefig(buffer, format='png', dpi=dpi)
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+class ChartService:
+    CHART_TYPES = ('line', 'bar', 'area')
+
+    def __init__(self, db: Database, cache_service=None, dpi: int = 100):
+        self.db = db
+        self.cache_service = cache_service
+        self.calc_service = CalculationService(db, cache_service)
+        self.dpi = dpi
+        # matplotlib не гарантирует потокобезопасность (кэш шрифтов, текст), поэтому рендер последовательный
+        self.render_lock = threading.Lock()
+
+    def _get_cached(self, key: str) -> Optional[bytes]:
+        return self.cache_service.get(key) if self.cache_service else None
+
+    def _render(self, key: str, tags: List[str], draw, *args,
+                width: float = 10, height: float = 6) -> bytes:
+        with self.render_lock:
+            fig = Figure(figsize=(width, height), dpi=self.dpi)
+            draw(fig, *args)
+            png = figure_to_png(fig)
+
+        if self.cache_service:
+            self.cache_service.set(key, png, tags=tags)
+        return png
+
+    def render_consumption_chart(self, meter_id: int, start_date: date, end_date: date,
+                                 chart_type: str = 'line', bucket: str = 'auto',
+                                 aggregate: str = 'sum') -> Optional[bytes]:
+        if chart_type not in self.CHART_TYPES:
+            chart_type = 'line'
+        max_points = Config.CHART_MAX_POINTS
+        if bucket == 'auto':
+            bucket = CalculationService.choose_bucket(start_date, end_date, max_points)
+        # Ключ без версии данных: устаревшие графики удаляются по тегам при записи
+        key = (f"chart:consumption:{meter_id}:{start_date}:{end_date}:{chart_type}:"
+               f"{bucket}:{aggregate}:{max_points}")
+        cached = self._get_cached(key)
+        if cached is not None:
+            return cached
+
+        data = self.calc_service.get_consumption_points(meter_id, start_date, end_date, bucket,
+                                                        aggregate, max_points)
+        if not data:
+            return None
+        return self._render(key, [f"meter:{meter_id}", f"meter_readings:{meter_id}",
+                                  "table:Calculations"],
+                            draw_consumption_chart, data, chart_type,
+                            CalculationService.BUCKET_DAYS[bucket])
+
+    def render_multi_consumption_chart(self, object_id: Optional[int], start_date: date,
+                                       end_date: date, chart_type: str = 'line',
+                                       bucket: str = 'auto',
+                                       aggregate: str = 'sum') -> Optional[bytes]:
+        # object_id задан - по счетчикам объекта, иначе - по типам услуг для всего города
+        if chart_type not in self.CHART_TYPES:
+            chart_type = 'line'
+        max_points = Config.CHART_MAX_POINTS
+        if bucket == 'auto':
+            bucket = CalculationService.choose_bucket(start_date, end_date, max_points)
+        if object_id is not None:
+            tags = [f"object:{object_id}", "table:Readings"]
+            title = 'Потребление по счетчикам объекта'
+        else:
+            tags = ["table:Meters", "table:Readings"]
+            title = 'Потребление по городу'
+        key = (f"chart:multi:{object_id}:{start_date}:{end_date}:{chart_type}:"
+               f"{bucket}:{aggregate}:{max_points}")
+        cached = self._get_cached(key)
+        if cached is not None:
+            return cached
+
+        pivot = self.calc_service.get_consumption_pivot(
+            object_id, start_date, end_date, 'meter' if object_id is not None else 'type',
+            bucket, aggregate, max_points)
+        if pivot.empty:
+            return None
+        return self._render(key, tags, draw_multi_consumption_chart, pivot, chart_type,
+                            CalculationService.BUCKET_DAYS[bucket], title)
+
+    def render_comparison_chart(self, object_id: int, start_date: date,
+                                end_date: date) -> Optional[bytes]:
+        key = f"chart:comparison:{object_id}:{start_date}:{end_date}"
+        cached = self._get_cached(key)
+        if cached is not None:
+            return cached
+
+        stats = self.calc_service.get_statistics(object_id, start_date, end_date)
+        if not stats:
+            return None
+        return self._render(key, [f"object:{object_id}", "table:Readings"],
+                            draw_comparison_chart, stats, width=14, height=6)
@@ -0,0 +1,52 @@
+from datetime import date
+from typing import List, Dict, Optional
+from app.database import Database
+
+class DashboardService:
+    def __init__(self, db: Database):
+        self.db = db
+
+    def get_summary(self, month_start: Optional[date] = None) -> Dict:
+        if month_start is None:
+            today = date.today()
+            month_start = date(today.year, today.month, 1)
+
+        with self.db.connection() as conn:
+            row = conn.execute("""
+                SELECT (SELECT COUNT(*) FROM Objects),
+                       (SELECT COUNT(*) FROM Meters),
+                       COUNT(r.id),
+                       COALESCE(SUM(c.amount), 0)
+                FROM Readings r
+                LEFT JOIN Calculations c ON c.reading_id = r.id
+                WHERE r.reading_date >= ?
+            """, (month_start,)).fetchone()
+
+        return {
+            'objects': row[0],
+            'meters': row[1],
+            'month_readings': row[2],
+            'month_amount': row[3]
+        }
+
+    def get_recent_readings(self, limit: int = 10) -> List[Dict]:
+        with self.db.connection() as conn:
+            rows = conn.execute("""
+                SELECT r.id, r.reading_date, r.value, o.address, m.type,
+                       COALESCE(c.consumption, 0)
+                FROM Readings r
+                JOIN Meters m ON r.meter_id = m.id
+                JOIN Objects o ON m.object_id = o.id
+                LEFT JOIN Calculations c ON c.reading_id = r.id
+                ORDER BY r.reading_date DESC, r.id DESC
+                LIMIT ?
+            """, (limit,)).fetchall()
+
+        return [{
+            'reading_id': row[0],
+            'reading_date': row[1],
+            'value': row[2],
+            'address': row[3],
+            'meter_type': row[4],
+            'consumption': row[5]
+        } for row in rows]
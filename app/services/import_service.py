@@ -1,85 +1,265 @@
-from datetime import datetime
-from typing import List, Dict, Optional
+import codecs
+import threading
+from typing import List, Dict, Optional, Any, Tuple, Callable, Iterable, Iterator
 import pandas as pd
+from openpyxl import load_workbook
+from app.config import Config
 from app.database import Database
-from app.models import MeterRepository, ReadingRepository, Reading
+from app.models import MeterRepository, ReadingRepository
 from app.services import CalculationService
 
+class ImportCancelled(Exception):
+    pass
+
 class ImportService:
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, cache_service=None):
         self.db = db
-        self.meter_repo = MeterRepository(db)
-        self.reading_repo = ReadingRepository(db)
-        self.calc_service = CalculationService(db)
+        self.cache_service = cache_service
+        self.meter_repo = MeterRepository(db, cache_service)
+        self.reading_repo = ReadingRepository(db, cache_service)
+        self.calc_service = CalculationService(db, cache_service)
     
-    def import_from_excel(self, file_path: str) -> Dict[str, int]:
+    def import_from_excel(self, file_path: str, progress_callback: Optional[Callable[[int, int, int], None]] = None,
+                          chunk_size: Optional[int] = None, 
+                          cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        chunk_size = chunk_size or Config.IMPORT_CHUNK_SIZE
         try:
-            df = pd.read_excel(file_path)
-            return self._process_dataframe(df)
+            if file_path.lower().endswith('.xls'):
+                df = pd.read_excel(file_path)
+                chunks = (df.iloc[start:start + chunk_size] for start in range(0, len(df), chunk_size))
+                return self._process_chunks(chunks, progress_callback, cancel_event)
+            return self._process_chunks(self._iter_excel_chunks(file_path, chunk_size), 
+                                        progress_callback, cancel_event)
         except Exception as e:
             raise Exception(f"Ошибка при чтении Excel файла: {str(e)}")
     
-    def import_from_csv(self, file_path: str, delimiter: str = ',') -> Dict[str, int]:
+    def import_from_csv(self, file_path: str, delimiter: str = ',', 
+                        progress_callback: Optional[Callable[[int, int, int], None]] = None,
+                        chunk_size: Optional[int] = None, 
+                        cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        chunk_size = chunk_size or Config.IMPORT_CHUNK_SIZE
         try:
-            df = pd.read_csv(file_path, delimiter=delimiter, encoding='utf-8')
-            return self._process_dataframe(df)
+            encoding = self._detect_encoding(file_path)
+            with pd.read_csv(file_path, delimiter=delimiter, encoding=encoding, 
+                             chunksize=chunk_size) as reader:
+                return self._process_chunks(reader, progress_callback, cancel_event)
         except Exception as e:
+            raise Exception(f"Ошибка при чтении CSV файла: {str(e)}")
+    
+    def _detect_encoding(self, file_path: str, sample_size: int = 1024 * 1024) -> str:
+        with open(file_path, 'rb') as f:
+            sample = f.read(sample_size)
+        if sample.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            return 'cp1251'
+    
+    def _iter_excel_chunks(self, file_path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [str(name).strip() if name is not None else '' for name in header]
+            
+            start = 0
+            batch = []
+            for row in rows:
+                if all(value is None for value in row):
+                    continue
+                batch.append(row[:len(columns)])
+                if len(batch) >= chunk_size:
+                    yield pd.DataFrame(batch, columns=columns, index=range(start, start + len(batch)))
+                    start += len(batch)
+                    batch = []
+            if batch or start == 0:
+                yield pd.DataFrame(batch, columns=columns, index=range(start, start + len(batch)))
+        finally:
+            workbook.close()
+    
+    def _process_chunks(self, chunks: Iterable[pd.DataFrame],
+                        progress_callback: Optional[Callable[[int, int, int], None]] = None,
+                        cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        result = {'success': 0, 'errors': 0, 'error_messages': [], 'cancelled': False}
+        processed = 0
+        
+        for chunk in chunks:
             try:
-                df = pd.read_csv(file_path, delimiter=delimiter, encoding='cp1251')
-                return self._process_dataframe(df)
-            except:
-                raise Exception(f"Ошибка при чтении CSV файла: {str(e)}")
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ImportCancelled()
+                chunk_result = self._process_dataframe(chunk, cancel_event)
+            except ImportCancelled:
+                result['cancelled'] = True
+                break
+            except Exception as e:
+                if result['success']:
+                    raise Exception(f"{e} (уже загружено показаний: {result['success']})")
+                raise
+            
+            processed += len(chunk)
+            result['success'] += chunk_result['success']
+            result['errors'] += chunk_result['errors']
+            free_slots = Config.IMPORT_MAX_ERROR_MESSAGES - len(result['error_messages'])
+            if free_slots > 0:
+                result['error_messages'].extend(chunk_result['error_messages'][:free_slots])
+            
+            if progress_callback:
+                progress_callback(processed, result['success'], result['errors'])
+        
+        return result
+    
+    def _parse_dates(self, values: pd.Series) -> pd.Series:
+        try:
+            return pd.to_datetime(values, errors='coerce', format='mixed')
+        except (TypeError, ValueError):
+            return pd.to_datetime(values, errors='coerce')
+    
+    def _load_meter_state(self, conn, meter_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        state = {}
+        for start in range(0, len(meter_ids), 500):
+            chunk = meter_ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            cursor = conn.execute(f"""
+                SELECT m.id, r.value
+                FROM Meters m
+                LEFT JOIN Readings r ON r.id = (
+                    SELECT id FROM Readings
+                    WHERE meter_id = m.id
+                    ORDER BY reading_date DESC, id DESC
+                    LIMIT 1
+                )
+                WHERE m.id IN ({placeholders})
+            """, chunk)
+            for meter_id, last_value in cursor.fetchall():
+                state[meter_id] = {'last_value': last_value}
+        return state
+    
+    def _load_existing_dates(self, conn, meter_ids: List[int], 
+                             date_from: str, date_to: str) -> set:
+        existing = set()
+        for start in range(0, len(meter_ids), 500):
+            chunk = meter_ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            cursor = conn.execute(f"""
+                SELECT meter_id, reading_date FROM Readings
+                WHERE meter_id IN ({placeholders}) AND reading_date BETWEEN ? AND ?
+            """, chunk + [date_from, date_to])
+            existing.update((meter_id, str(reading_date)) for meter_id, reading_date in cursor.fetchall())
+        return existing
     
-    def _process_dataframe(self, df: pd.DataFrame) -> Dict[str, int]:
+    def _process_dataframe(self, df: pd.DataFrame, 
+                           cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
         required_columns = ['meter_id', 'value', 'reading_date']
         missing_columns = [col for col in required_columns if col not in df.columns]
         if missing_columns:
             raise Exception(f"Отсутствуют обязательные колонки: {', '.join(missing_columns)}")
         
-        success_count = 0
-        error_count = 0
-        errors = []
+        errors: List[Tuple[int, str]] = []
         
-        for index, row in df.iterrows():
-            try:
-                meter_id = int(row['meter_id'])
-                value = float(row['value'])
-                reading_date = pd.to_datetime(row['reading_date']).date()
-                
-                meter = self.meter_repo.get_by_id(meter_id)
-                if not meter:
-                    error_count += 1
-                    errors.append(f"Строка {index + 2}: счетчик с ID {meter_id} не найден")
-                    continue
+        data = pd.DataFrame({
+            'row': df.index + 2,
+            'meter_id': pd.to_numeric(df['meter_id'], errors='coerce'),
+            'value': pd.to_numeric(df['value'], errors='coerce'),
+            'reading_date': self._parse_dates(df['reading_date'])
+        })
+        
+        def reject(mask: pd.Series, message) -> pd.DataFrame:
+            nonlocal data
+            for row in data[mask].itertuples(index=False):
+                errors.append((row.row, message(row)))
+            data = data[~mask]
+            return data
+        
+        reject(data['meter_id'].isna() | (data['meter_id'] % 1 != 0),
+               lambda row: "неверный ID счетчика")
+        reject(data['value'].isna(), lambda row: "неверное значение показания")
+        reject(data['reading_date'].isna(), lambda row: "неверная дата показания")
+        
+        data = data.assign(
+            meter_id=data['meter_id'].astype('int64'),
+            value=data['value'].astype('float64'),
+            reading_date=data['reading_date'].dt.strftime('%Y-%m-%d')
+        )
+        
+        success_count = 0
+        try:
+            with self.db.transaction(immediate=True) as conn:
+                if not data.empty:
+                    meter_ids = [int(meter_id) for meter_id in data['meter_id'].unique()]
+                    meter_state = self._load_meter_state(conn, meter_ids)
+                    
+                    reject(~data['meter_id'].isin(list(meter_state.keys())),
+                           lambda row: f"счетчик с ID {row.meter_id} не найден")
+                    
+                    reject(data.duplicated(['meter_id', 'reading_date'], keep='first'),
+                           lambda row: f"показание счетчика {row.meter_id} за {row.reading_date} повторяется в файле")
                 
-                last_reading = self.reading_repo.get_last_reading(meter_id)
-                if last_reading and value < last_reading.value:
-                    error_count += 1
-                    errors.append(f"Строка {index + 2}: показание ({value}) меньше предыдущего ({last_reading.value})")
-                    continue
+                if not data.empty:
+                    existing = self._load_existing_dates(
+                        conn, [int(meter_id) for meter_id in data['meter_id'].unique()],
+                        data['reading_date'].min(), data['reading_date'].max())
+                    keys = pd.Series(list(zip(data['meter_id'], data['reading_date'])), index=data.index)
+                    reject(keys.isin(existing),
+                           lambda row: f"показание счетчика {row.meter_id} за {row.reading_date} уже существует")
                 
-                reading = Reading(
-                    id=None,
-                    meter_id=meter_id,
-                    value=value,
-                    reading_date=reading_date,
-                    previous_reading_id=None,
-                    photo_path=None,
-                    created_at=None
-                )
+                if not data.empty:
+                    data = data.sort_values(['meter_id', 'reading_date', 'row'], kind='mergesort')
+                    last_values = data['meter_id'].map(
+                        {meter_id: state['last_value'] for meter_id, state in meter_state.items()}
+                    ).astype('float64')
+                    running_max = data.groupby('meter_id')['value'].cummax()
+                    previous_max = running_max.groupby(data['meter_id']).shift()
+                    data = data.assign(
+                        previous_value=pd.concat([previous_max, last_values], axis=1).max(axis=1))
+                    reject(data['value'] < data['previous_value'],
+                           lambda row: f"показание ({row.value}) меньше предыдущего ({row.previous_value})")
                 
-                reading_id = self.reading_repo.create(reading)
-                self.calc_service.process_reading(reading_id)
-                success_count += 1
+                if not data.empty:
+                    max_id_before = conn.execute("SELECT COALESCE(MAX(id), 0) FROM Readings").fetchone()[0]
+                    conn.executemany("""
+                        INSERT INTO Readings (meter_id, value, reading_date, 
+                                            previous_reading_id, photo_path)
+                        VALUES (?, ?, ?, NULL, NULL)
+                    """, list(zip(data['meter_id'].tolist(), data['value'].tolist(),
+                                  data['reading_date'].tolist())))
+                    conn.execute("""
+                        UPDATE Readings SET previous_reading_id = (
+                            SELECT p.id FROM Readings p
+                            WHERE p.meter_id = Readings.meter_id
+                            AND (p.reading_date, p.id) < (Readings.reading_date, Readings.id)
+                            ORDER BY p.reading_date DESC, p.id DESC
+                            LIMIT 1
+                        )
+                        WHERE id > ?
+                    """, (max_id_before,))
+                    
+                    self.calc_service.recalculate(
+                        meter_ids=[int(meter_id) for meter_id in data['meter_id'].unique()],
+                        since=data['reading_date'].min())
+                    success_count = len(data)
                 
-            except Exception as e:
-                error_count += 1
-                errors.append(f"Строка {index + 2}: {str(e)}")
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ImportCancelled()
+        except ImportCancelled:
+            raise
+        except Exception as e:
+            raise Exception(f"Ошибка сохранения импортированных показаний: {e}")
+        
+        # Повторная инвалидация уже после фиксации: пересчет внутри транзакции мог
+        # сбросить кэш раньше, чем новые показания стали видны другим соединениям
+        if success_count and self.cache_service:
+            self.cache_service.invalidate_tags(
+                "table:Readings", *[f"meter_readings:{meter_id}" for meter_id in data['meter_id'].unique()])
         
+        errors.sort(key=lambda error: error[0])
         return {
             'success': success_count,
-            'errors': error_count,
-            'error_messages': errors
+            'errors': len(errors),
+            'error_messages': [f"Строка {row}: {message}" for row, message in errors]
         }
     
     def get_template_dataframe(self) -> pd.DataFrame:
@@ -4,29 +4,27 @@ from app.database import Database
 from app.models import ObjectRepository, MeterRepository, ReadingRepository
 
 class NotificationService:
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, cache_service=None):
         self.db = db
-        self.object_repo = ObjectRepository(db)
-        self.meter_repo = MeterRepository(db)
-        self.reading_repo = ReadingRepository(db)
+        self.object_repo = ObjectRepository(db, cache_service)
+        self.meter_repo = MeterRepository(db, cache_service)
+        self.reading_repo = ReadingRepository(db, cache_service)
     
     def check_verification_due(self, days_ahead: int = 30) -> List[Dict]:
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
         check_date = date.today() + timedelta(days=days_ahead)
         
-        cursor.execute("""
-            SELECT m.id, m.type, m.serial_number, m.next_verification_date,
-                   o.address
-            FROM Meters m
-            JOIN Objects o ON m.object_id = o.id
-            WHERE m.next_verification_date <= ? AND m.is_active = 1
-            ORDER BY m.next_verification_date
-        """, (check_date,))
+        with self.db.connection() as conn:
+            rows = conn.execute("""
+                SELECT m.id, m.type, m.serial_number, m.next_verification_date,
+                       o.address
+                FROM Meters m
+                JOIN Objects o ON m.object_id = o.id
+                WHERE m.next_verification_date <= ? AND m.is_active = 1
+                ORDER BY m.next_verification_date
+            """, (check_date,)).fetchall()
         
         notifications = []
-        for row in cursor.fetchall():
+        for row in rows:
             notifications.append({
                 'type': 'verification',
                 'meter_id': row[0],
@@ -37,7 +35,6 @@ class NotificationService:
                 'message': f"Счетчик {row[1]} ({row[2]}) требует поверки до {row[3]}"
             })
         
-        conn.close()
         return notifications
     
     def check_readings_due(self, days_before: int = 3) -> List[Dict]:
@@ -48,23 +45,21 @@ class NotificationService:
         
         deadline = today + timedelta(days=days_before)
         
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT DISTINCT m.id, m.type, m.serial_number, o.address,
-                   MAX(r.reading_date) as last_reading_date
-            FROM Meters m
-            JOIN Objects o ON m.object_id = o.id
-            LEFT JOIN Readings r ON m.id = r.meter_id
-            WHERE m.is_active = 1
-            GROUP BY m.id, m.type, m.serial_number, o.address
-            HAVING last_reading_date IS NULL 
-                OR last_reading_date < ?
-        """, (last_month_start,))
+        with self.db.connection() as conn:
+            rows = conn.execute("""
+                SELECT DISTINCT m.id, m.type, m.serial_number, o.address,
+                       MAX(r.reading_date) as last_reading_date
+                FROM Meters m
+                JOIN Objects o ON m.object_id = o.id
+                LEFT JOIN Readings r ON m.id = r.meter_id
+                WHERE m.is_active = 1
+                GROUP BY m.id, m.type, m.serial_number, o.address
+                HAVING last_reading_date IS NULL 
+                    OR last_reading_date < ?
+            """, (last_month_start,)).fetchall()
         
         notifications = []
-        for row in cursor.fetchall():
+        for row in rows:
             last_date = row[4] if row[4] else "никогда"
             notifications.append({
                 'type': 'reading_due',
@@ -76,7 +71,6 @@ class NotificationService:
                 'message': f"Требуется передать показания счетчика {row[1]} ({row[2]}) до {deadline}"
             })
         
-        conn.close()
         return notifications
     
     def get_all_notifications(self) -> List[Dict]:
@@ -87,21 +81,15 @@ class NotificationService:
     
     def create_notification(self, user_id: int, object_id: int, 
                           notification_type: str, message: str):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO Notifications (user_id, object_id, type, message)
-            VALUES (?, ?, ?, ?)
-        """, (user_id, object_id, notification_type, message))
-        conn.commit()
-        conn.close()
+        with self.db.transaction() as conn:
+            conn.execute("""
+                INSERT INTO Notifications (user_id, object_id, type, message)
+                VALUES (?, ?, ?, ?)
+            """, (user_id, object_id, notification_type, message))
     
     def mark_as_read(self, notification_id: int):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE Notifications SET is_read = 1 WHERE id = ?
-        """, (notification_id,))
-        conn.commit()
-        conn.close()
+        with self.db.transaction() as conn:
+            conn.execute("""
+                UPDATE Notifications SET is_read = 1 WHERE id = ?
+            """, (notification_id,))
 
@@ -1,107 +1,181 @@
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
-from typing import Dict, List, Optional
+from io import BytesIO
+from typing import Callable, Dict, List, Optional
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
-from reportlab.pdfgen import canvas
 from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.lib.enums import TA_CENTER
+from app.config import Config
 from app.database import Database
 from app.models import ObjectRepository, MeterRepository, ReadingRepository
 from app.services.calculations import CalculationService
+from app.utils.receipt_pdf import (render_receipts, render_receipt_files,
+                                   render_receipt_bytes, render_merged_bytes)
+
+try:
+    from pypdf import PdfWriter
+except ImportError:
+    PdfWriter = None
 
 class ReceiptGenerator:
-    def __init__(self, db: Database):
+    BATCH_FORMATS = ('files', 'pdf', 'zip')
+    
+    def __init__(self, db: Database, cache_service=None):
         self.db = db
-        self.object_repo = ObjectRepository(db)
-        self.meter_repo = MeterRepository(db)
-        self.reading_repo = ReadingRepository(db)
-        self.calc_service = CalculationService(db)
+        self.object_repo = ObjectRepository(db, cache_service)
+        self.meter_repo = MeterRepository(db, cache_service)
+        self.reading_repo = ReadingRepository(db, cache_service)
+        self.calc_service = CalculationService(db, cache_service)
     
-    def generate_receipt(self, object_id: int, period_start: date, period_end: date, filename: str):
-        obj = self.object_repo.get_by_id(object_id)
-        if not obj:
-            raise ValueError("Объект не найден")
+    def load_receipts(self, object_ids: Optional[List[int]], period_start: date,
+                      period_end: date) -> List[Dict]:
+        receipts = {}
+        with self.db.connection() as conn:
+            if object_ids is None:
+                chunks = [None]
+            else:
+                chunks = [object_ids[i:i + 500] for i in range(0, len(object_ids), 500)]
+            
+            for chunk in chunks:
+                object_filter = ""
+                params = []
+                if chunk is not None:
+                    object_filter = f"WHERE id IN ({', '.join('?' * len(chunk))})"
+                    params = list(chunk)
+                for row in conn.execute(f"""
+                    SELECT id, address, area, residents FROM Objects {object_filter}
+                    ORDER BY address, id
+                """, params):
+                    receipts[row[0]] = {
+                        'object_id': row[0], 'address': row[1], 'area': row[2],
+                        'residents': row[3], 'items': []
+                    }
         
-        doc = SimpleDocTemplate(filename, pagesize=A4)
-        story = []
-        styles = getSampleStyleSheet()
+        stats = self.calc_service.get_statistics_bulk(object_ids, period_start, period_end)
+        for obj_id, receipt in receipts.items():
+            for meter_type, stat_data in stats.get(obj_id, {}).items():
+                receipt['items'].append({
+                    'type': meter_type,
+                    'consumption': stat_data['consumption'],
+                    'amount': stat_data['amount'],
+                    'tariff': stat_data['tariff']
+                })
         
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            textColor=colors.HexColor('#1a1a1a'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
-        
-        story.append(Paragraph("КВИТАНЦИЯ НА ОПЛАТУ", title_style))
-        story.append(Spacer(1, 12))
+        if object_ids is None:
+            return list(receipts.values())
+        return [receipts[obj_id] for obj_id in object_ids if obj_id in receipts]
+    
+    def generate_receipt(self, object_id: int, period_start: date, period_end: date, filename: str):
+        receipts = self.load_receipts([object_id], period_start, period_end)
+        if not receipts:
+            raise ValueError("Объект не найден")
         
-        info_style = ParagraphStyle(
-            'Info',
-            parent=styles['Normal'],
-            fontSize=10,
-            leftIndent=0
-        )
+        render_receipts(receipts, period_start, period_end, filename)
+        return filename
+    
+    @staticmethod
+    def _get_mp_context():
+        # fork небезопасен: главный процесс многопоточный (Qt, журнал аудита, пул соединений).
+        # forkserver импортирует модули один раз, spawn - запасной вариант для Windows
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            return multiprocessing.get_context('forkserver')
+        return multiprocessing.get_context('spawn')
+    
+    def generate_batch(self, period_start: date, period_end: date, output_path: str,
+                       object_ids: Optional[List[int]] = None, output_format: str = 'files',
+                       workers: Optional[int] = None, chunk_size: Optional[int] = None,
+                       progress_callback: Optional[Callable[[int, int], None]] = None,
+                       cancel_event: Optional[threading.Event] = None) -> Dict:
+        if output_format not in self.BATCH_FORMATS:
+            raise ValueError(f"Неизвестный формат пакетной печати: {output_format}")
         
-        story.append(Paragraph(f"<b>Объект:</b> {obj.address}", info_style))
-        if obj.area:
-            story.append(Paragraph(f"<b>Площадь:</b> {obj.area} м²", info_style))
-        if obj.residents:
-            story.append(Paragraph(f"<b>Жильцов:</b> {obj.residents}", info_style))
-        story.append(Paragraph(f"<b>Период:</b> {period_start} - {period_end}", info_style))
-        story.append(Spacer(1, 20))
+        started_at = time.monotonic()
+        output_path = os.path.abspath(output_path)
+        receipts = self.load_receipts(object_ids, period_start, period_end)
+        total = len(receipts)
+        chunk_size = chunk_size or Config.RECEIPT_BATCH_CHUNK_SIZE
+        workers = workers or Config.RECEIPT_BATCH_WORKERS or os.cpu_count() or 1
         
-        meters = self.meter_repo.get_by_object_id(object_id)
-        stats = self.calc_service.get_statistics(object_id, period_start, period_end)
+        if output_format == 'pdf' and PdfWriter is None:
+            # Без pypdf готовые PDF не склеить, поэтому общий документ собирается одним процессом
+            chunk_size = max(total, 1)
+        chunks = [receipts[i:i + chunk_size] for i in range(0, total, chunk_size)]
         
-        if not stats:
-            story.append(Paragraph("Нет данных за указанный период", info_style))
+        if output_format == 'files':
+            os.makedirs(output_path, exist_ok=True)
+            render, extra_args = render_receipt_files, (output_path,)
+        elif output_format == 'zip':
+            render, extra_args = render_receipt_bytes, ()
         else:
-            data = [['Услуга', 'Расход', 'Тариф', 'Сумма к оплате']]
-            total = 0.0
-            
-            for meter_type, stat_data in stats.items():
-                tariff = 0.0
-                for meter in meters:
-                    if meter.type == meter_type:
-                        tariff = meter.tariff
-                        break
-                
-                amount = stat_data['amount']
-                total += amount
-                data.append([
-                    meter_type,
-                    f"{stat_data['consumption']:.2f}",
-                    f"{tariff:.4f}",
-                    f"{amount:.2f} руб."
-                ])
-            
-            data.append(['<b>ИТОГО</b>', '', '', f"<b>{total:.2f} руб.</b>"])
-            
-            table = Table(data, colWidths=[80*mm, 30*mm, 30*mm, 40*mm])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, -1), (-1, -1), 12),
-            ]))
+            render, extra_args = render_merged_bytes, ()
+        
+        done = 0
+        cancelled = False
+        completed = False
+        zip_file = zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) if output_format == 'zip' else None
+        pdf_parts = []
+        executor = None
+        try:
+            if workers > 1 and len(chunks) > 1:
+                executor = ProcessPoolExecutor(max_workers=min(workers, len(chunks)),
+                                               mp_context=self._get_mp_context())
+                futures = [executor.submit(render, chunk, period_start, period_end, *extra_args)
+                           for chunk in chunks]
+                results = (future.result() for future in futures)
+            else:
+                results = (render(chunk, period_start, period_end, *extra_args) for chunk in chunks)
             
-            story.append(table)
-            story.append(Spacer(1, 30))
-            story.append(Paragraph(f"<b>К оплате: {total:.2f} руб.</b>", title_style))
+            for chunk in chunks:
+                if cancel_event is not None and cancel_event.is_set():
+                    cancelled = True
+                    break
+                result = next(results)
+                if output_format == 'zip':
+                    for name, content in result:
+                        zip_file.writestr(name, content)
+                elif output_format == 'pdf':
+                    pdf_parts.append(result)
+                done += len(chunk)
+                if progress_callback:
+                    progress_callback(done, total)
+            completed = not cancelled
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+            if zip_file is not None:
+                zip_file.close()
+                # Недописанный архив не оставляем: при отмене или ошибке он неполный
+                if not completed and os.path.exists(output_path):
+                    os.remove(output_path)
         
-        doc.build(story)
-        return filename
+        if output_format == 'pdf' and not cancelled and pdf_parts:
+            if len(pdf_parts) == 1:
+                with open(output_path, 'wb') as f:
+                    f.write(pdf_parts[0])
+            else:
+                writer = PdfWriter()
+                for part in pdf_parts:
+                    writer.append(BytesIO(part))
+                with open(output_path, 'wb') as f:
+                    writer.write(f)
+        
+        elapsed = time.monotonic() - started_at
+        return {
+            'count': done,
+            'total': total,
+            'elapsed': elapsed,
+            'receipts_per_second': done / elapsed if elapsed > 0 else 0.0,
+            'output': output_path if completed or output_format == 'files' else None,
+            'cancelled': cancelled
+        }
     
     def export_report_to_pdf(self, object_id: Optional[int], period_start: date, 
                             period_end: date, filename: str):
@@ -130,11 +204,14 @@ class ReceiptGenerator:
         story.append(Paragraph(f"Период: {period_start} - {period_end}", title_style))
         story.append(Spacer(1, 20))
         
+        all_stats = self.calc_service.get_statistics_bulk(
+            [obj.id for obj in objects_to_export] if object_id else None, period_start, period_end)
+        
         for obj in objects_to_export:
             story.append(Paragraph(f"<b>Объект: {obj.address}</b>", styles['Heading2']))
             story.append(Spacer(1, 10))
             
-            stats = self.calc_service.get_statistics(obj.id, period_start, period_end)
+            stats = all_stats.get(obj.id, {})
             
             if not stats:
                 story.append(Paragraph("Нет данных за указанный период", styles['Normal']))
@@ -1,84 +1,179 @@
 import os
-from datetime import date, datetime
+import time
+from datetime import date, datetime, timedelta
+from itertools import groupby
 from typing import List, Dict, Optional
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-from PyQt6.QtWidgets import QWidget, QVBoxLayout
+from matplotlib.figure import Figure
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QPixmap
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QSizePolicy
+from app.config import Config
 from app.database import Database
 from app.models import ObjectRepository, MeterRepository, ReadingRepository
 from app.services.calculations import CalculationService
+from app.services.chart_service import (draw_consumption_chart, draw_multi_consumption_chart,
+                                        draw_comparison_chart, figure_to_png)
+from app.utils.report_export import ExcelReportWriter, CsvReportWriter, ParquetReportWriter
 
 class ReportGenerator:
-    def __init__(self, db: Database):
+    EXPORT_FORMATS = ('xlsx', 'csv', 'parquet')
+    EXPORT_SPLITS = ('object', 'type')
+    EXPORT_COLUMNS = ['Объект', 'Тип счетчика', 'Серийный номер', 'Дата', 'Показание',
+                      'Расход', 'Сумма', 'Ед. изм.']
+    EXPORT_TYPES = ['string', 'string', 'string', 'string', 'float64', 'float64', 'float64',
+                    'string']
+    
+    def __init__(self, db: Database, cache_service=None):
         self.db = db
-        self.object_repo = ObjectRepository(db)
-        self.meter_repo = MeterRepository(db)
-        self.reading_repo = ReadingRepository(db)
-        self.calc_service = CalculationService(db)
+        self.object_repo = ObjectRepository(db, cache_service)
+        self.meter_repo = MeterRepository(db, cache_service)
+        self.reading_repo = ReadingRepository(db, cache_service)
+        self.calc_service = CalculationService(db, cache_service)
     
-    def generate_consumption_report(self, object_id: int, 
-                                   start_date: date, end_date: date) -> pd.DataFrame:
-        conn = self.db.get_connection()
-        
-        query = """
-            SELECT 
-                m.type as 'Тип счетчика',
-                m.serial_number as 'Серийный номер',
-                r.reading_date as 'Дата',
-                r.value as 'Показание',
-                c.consumption as 'Расход',
-                c.amount as 'Сумма',
-                m.unit as 'Ед. изм.'
-            FROM Readings r
-            JOIN Meters m ON r.meter_id = m.id
-            LEFT JOIN Calculations c ON r.id = c.reading_id
-            WHERE m.object_id = ? 
-            AND r.reading_date BETWEEN ? AND ?
-            ORDER BY m.type, r.reading_date DESC
+    @classmethod
+    def get_export_formats(cls) -> List[str]:
+        # Parquet предлагается, только если установлен pyarrow
+        return [output_format for output_format in cls.EXPORT_FORMATS
+                if output_format != 'parquet' or ParquetReportWriter.is_available()]
+    
+    def _create_export_writer(self, filename: str, output_format: str, split: bool):
+        if output_format == 'xlsx':
+            return ExcelReportWriter(filename, self.EXPORT_COLUMNS)
+        if output_format == 'csv':
+            return CsvReportWriter(filename, self.EXPORT_COLUMNS, split)
+        return ParquetReportWriter(filename, self.EXPORT_COLUMNS, self.EXPORT_TYPES, split,
+                                   Config.EXPORT_BATCH_SIZE)
+    
+    def export_report(self, filename: str, start_date: date, end_date: date,
+                      object_id: Optional[int] = None, output_format: str = 'xlsx',
+                      split_by: Optional[str] = None, progress_callback=None,
+                      cancel_event=None, with_total: bool = False) -> Dict:
+        if output_format not in self.EXPORT_FORMATS:
+            raise ValueError(f"Неизвестный формат экспорта: {output_format}")
+        if split_by is not None and split_by not in self.EXPORT_SPLITS:
+            raise ValueError(f"Неизвестная разбивка отчета: {split_by}")
+        if not filename.endswith('.' + output_format):
+            filename += '.' + output_format
+        
+        object_filter = ""
+        params = [start_date, end_date]
+        if object_id is not None:
+            object_filter = "AND o.id = ?"
+            params.append(object_id)
+        
+        # Порядок совпадает с индексами (object_id, type) и (meter_id, reading_date),
+        # поэтому SQLite отдает строки без сортировки, а память не растет с объемом отчета
+        query = f"""
+            SELECT o.id, o.address, m.type, m.serial_number, r.reading_date, r.value,
+                   c.consumption, c.amount, m.unit
+            FROM Objects o
+            CROSS JOIN Meters m ON m.object_id = o.id
+            CROSS JOIN Readings r ON r.meter_id = m.id
+            LEFT JOIN Calculations c ON c.reading_id = r.id
+            WHERE r.reading_date BETWEEN ? AND ? {object_filter}
+            ORDER BY o.id, m.type, m.id, r.reading_date DESC
         """
         
-        df = pd.read_sql_query(query, conn, params=(object_id, start_date, end_date))
-        conn.close()
-        return df
-    
-    def export_to_excel(self, df: pd.DataFrame, filename: str):
-        if not filename.endswith('.xlsx'):
-            filename += '.xlsx'
-        df.to_excel(filename, index=False, engine='openpyxl')
-        return filename
+        started = time.perf_counter()
+        done = 0
+        cancelled = False
+        total = None
+        with self.db.connection() as conn:
+            # Подсчет строк - это второй проход по тем же данным, поэтому только по запросу;
+            # без него в progress_callback передается total=None
+            if with_total:
+                total = conn.execute(f"""
+                    SELECT COUNT(*)
+                    FROM Objects o
+                    CROSS JOIN Meters m ON m.object_id = o.id
+                    CROSS JOIN Readings r ON r.meter_id = m.id
+                    WHERE r.reading_date BETWEEN ? AND ? {object_filter}
+                """, params).fetchone()[0]
+            
+            writer = self._create_export_writer(filename, output_format, split_by is not None)
+            cursor = conn.execute(query, params)
+            current_object = None
+            try:
+                while True:
+                    if cancel_event is not None and cancel_event.is_set():
+                        cancelled = True
+                        break
+                    rows = cursor.fetchmany(Config.EXPORT_BATCH_SIZE)
+                    if not rows:
+                        break
+                    
+                    if split_by is None:
+                        writer.write(None, 'Отчет', [row[1:] for row in rows])
+                    else:
+                        key_index = 0 if split_by == 'object' else 2
+                        for group, group_rows in groupby(rows, key=lambda row: row[key_index]):
+                            group_rows = [row[1:] for row in group_rows]
+                            # Объекты идут подряд, поэтому лист или файл объекта закрывается сразу
+                            if split_by == 'object' and current_object not in (None, group):
+                                writer.close_group(current_object)
+                            current_object = group
+                            name = group_rows[0][0] if split_by == 'object' else group
+                            writer.write(group, name, group_rows)
+                    
+                    done += len(rows)
+                    if progress_callback:
+                        progress_callback(done, total)
+            finally:
+                cursor.close()
+                files = writer.close()
+        
+        if cancelled:
+            for path in files:
+                if os.path.exists(path):
+                    os.remove(path)
+            files = []
+        
+        elapsed = time.perf_counter() - started
+        return {
+            'rows': done,
+            'total': total,
+            'files': files,
+            'elapsed': elapsed,
+            'rows_per_second': done / elapsed if elapsed else 0.0,
+            'cancelled': cancelled
+        }
     
     def create_consumption_chart(self, meter_id: int, months: int = 12, chart_type: str = 'line'):
-        data = self.calc_service.get_monthly_consumption(meter_id, months)
+        end_date = date.today()
+        start_date = end_date - timedelta(days=months * 30)
+        data = self.calc_service.get_consumption_points(meter_id, start_date, end_date)
         
         if not data:
             return None
         
-        dates = [row['date'] for row in data]
-        consumption = [row['consumption'] for row in data]
-        amounts = [row['amount'] for row in data]
+        fig = Figure(figsize=(10, 6))
+        draw_consumption_chart(fig, data, chart_type)
+        return fig
+    
+    def create_object_consumption_chart(self, object_id: int, start_date: date, end_date: date,
+                                        chart_type: str = 'line', bucket: str = 'auto',
+                                        aggregate: str = 'sum'):
+        pivot = self.calc_service.get_consumption_pivot(object_id, start_date, end_date, 'meter',
+                                                        bucket, aggregate)
         
-        fig, ax = plt.subplots(figsize=(10, 6))
+        if pivot.empty:
+            return None
         
-        if chart_type == 'bar':
-            ax.bar(range(len(dates)), consumption, color='steelblue', alpha=0.7)
-            ax.set_xticks(range(len(dates)))
-            ax.set_xticklabels([str(d) for d in dates], rotation=45, ha='right')
-        elif chart_type == 'area':
-            ax.fill_between(range(len(dates)), consumption, alpha=0.5, color='steelblue')
-            ax.plot(range(len(dates)), consumption, marker='o', linewidth=2, markersize=6)
-            ax.set_xticks(range(len(dates)))
-            ax.set_xticklabels([str(d) for d in dates], rotation=45, ha='right')
-        else:
-            ax.plot(dates, consumption, marker='o', linewidth=2, markersize=6, label='Расход')
-            plt.xticks(rotation=45)
+        fig = Figure(figsize=(10, 6))
+        draw_multi_consumption_chart(fig, pivot, chart_type, title='Потребление по счетчикам объекта')
+        return fig
+    
+    def create_city_consumption_chart(self, start_date: date, end_date: date,
+                                      chart_type: str = 'line', bucket: str = 'auto',
+                                      aggregate: str = 'sum'):
+        pivot = self.calc_service.get_consumption_pivot(None, start_date, end_date, 'type',
+                                                        bucket, aggregate)
         
-        ax.set_xlabel('Дата')
-        ax.set_ylabel('Расход')
-        ax.set_title('График потребления')
-        ax.grid(True, alpha=0.3)
-        plt.tight_layout()
+        if pivot.empty:
+            return None
         
+        fig = Figure(figsize=(10, 6))
+        draw_multi_consumption_chart(fig, pivot, chart_type, title='Потребление по городу')
         return fig
     
     def create_comparison_chart(self, object_id: int, start_date: date, end_date: date):
@@ -87,27 +182,8 @@ class ReportGenerator:
         if not stats:
             return None
         
-        meter_types = list(stats.keys())
-        consumptions = [stats[mt]['consumption'] for mt in meter_types]
-        amounts = [stats[mt]['amount'] for mt in meter_types]
-        
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
-        
-        ax1.bar(meter_types, consumptions, color='steelblue', alpha=0.7)
-        ax1.set_xlabel('Тип счетчика')
-        ax1.set_ylabel('Расход')
-        ax1.set_title('Расход по типам счетчиков')
-        ax1.tick_params(axis='x', rotation=45)
-        ax1.grid(True, alpha=0.3, axis='y')
-        
-        ax2.bar(meter_types, amounts, color='coral', alpha=0.7)
-        ax2.set_xlabel('Тип счетчика')
-        ax2.set_ylabel('Сумма (руб.)')
-        ax2.set_title('Сумма к оплате по типам счетчиков')
-        ax2.tick_params(axis='x', rotation=45)
-        ax2.grid(True, alpha=0.3, axis='y')
-        
-        plt.tight_layout()
+        fig = Figure(figsize=(14, 6))
+        draw_comparison_chart(fig, stats)
         return fig
     
     def create_summary_report(self, object_id: int, 
@@ -129,14 +205,36 @@ class ChartWidget(QWidget):
         super().__init__(parent)
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
-        self.canvas = None
+        self.image_label = QLabel()
+        self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.image_label.setMinimumSize(200, 150)
+        self.image_label.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
+        self.layout.addWidget(self.image_label)
+        self.pixmap = None
     
     def set_chart(self, fig):
-        if self.canvas:
-            self.layout.removeWidget(self.canvas)
-            self.canvas.deleteLater()
-        
-        self.canvas = FigureCanvas(fig)
-        self.layout.addWidget(self.canvas)
-        self.canvas.draw()
-
+        self.set_image(figure_to_png(fig))
+    
+    def set_image(self, png: Optional[bytes]):
+        if not png:
+            self.clear()
+            return
+        pixmap = QPixmap()
+        pixmap.loadFromData(png, "PNG")
+        self.pixmap = pixmap
+        self._update_pixmap()
+    
+    def clear(self):
+        self.pixmap = None
+        self.image_label.clear()
+    
+    def _update_pixmap(self):
+        if self.pixmap is None:
+            return
+        self.image_label.setPixmap(self.pixmap.scaled(
+            self.image_label.size(), Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation))
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_pixmap()
@@ -0,0 +1,136 @@
+import re
+from typing import List, Optional
+from app.database import Database
+from app.models import ObjectRepository, MeterRepository
+from app.models.models import like_pattern
+
+class SearchService:
+    MIN_PREFIX_LENGTH = 3
+    AUDIT_COLUMNS = ('username', 'description', 'old_value', 'new_value')
+
+    def __init__(self, db: Database, cache_service=None):
+        self.db = db
+        self.object_repo = ObjectRepository(db, cache_service)
+        self.meter_repo = MeterRepository(db, cache_service)
+        self._available = None
+
+    def is_available(self) -> bool:
+        if self._available is None:
+            with self.db.connection() as conn:
+                count = conn.execute("""
+                    SELECT COUNT(*) FROM sqlite_master
+                    WHERE type = 'table' AND name IN ('ObjectsFts', 'MetersFts', 'AuditLogFts')
+                """).fetchone()[0]
+            self._available = count == 3
+        return self._available
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        return re.findall(r"\w+", text.lower())
+
+    @classmethod
+    def build_exact_query(cls, text: str) -> Optional[str]:
+        tokens = cls.tokenize(text)
+        return " ".join(f'"{token}"' for token in tokens) if tokens else None
+
+    @classmethod
+    def build_match_query(cls, text: str) -> Optional[str]:
+        tokens = cls.tokenize(text)
+        return " ".join(f'"{token}"*' for token in tokens) if tokens else None
+
+    @classmethod
+    def build_fuzzy_query(cls, text: str) -> Optional[str]:
+        # Для опечаток: длинные слова усекаются до префикса, но совпасть должны все слова
+        prefixes = []
+        for token in cls.tokenize(text):
+            if len(token) > cls.MIN_PREFIX_LENGTH:
+                token = token[:max(cls.MIN_PREFIX_LENGTH, len(token) * 2 // 3)]
+            prefixes.append(f'"{token}"*')
+        return " ".join(prefixes) if prefixes else None
+
+    @staticmethod
+    def like_condition(columns) -> str:
+        return "(" + " OR ".join(f"unicode_lower({column}) LIKE ? ESCAPE '\\'"
+                                 for column in columns) + ")"
+
+    def resolve_match_query(self, text: str, *fts_tables: str) -> Optional[str]:
+        match_query = self.build_match_query(text)
+        if not match_query:
+            return None
+        with self.db.connection() as conn:
+            for fts_table in fts_tables:
+                if conn.execute(f"SELECT 1 FROM {fts_table} WHERE {fts_table} MATCH ? LIMIT 1",
+                                (match_query,)).fetchone():
+                    return match_query
+        return None
+
+    def _match_ids(self, sql: str, text: str, limit: Optional[int], fallback) -> List[int]:
+        # Сначала совпадения слов и их начал. FTS не находит середину слова ("енина" в "Ленина"),
+        # поэтому затем поиск по подстроке, и только если ничего не нашлось - по опечаткам
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        exact_query = self.build_exact_query(text)
+        match_query = self.build_match_query(text)
+        fuzzy_query = self.build_fuzzy_query(text)
+        ids = []
+        seen = set()
+        with self.db.connection() as conn:
+            for query in (exact_query, match_query):
+                if not query or (limit and len(ids) >= limit):
+                    continue
+                for (row_id,) in conn.execute(sql, {'query': query}):
+                    if row_id not in seen:
+                        seen.add(row_id)
+                        ids.append(row_id)
+        if not ids:
+            ids = fallback(text, limit)
+        if not ids and fuzzy_query and fuzzy_query != match_query:
+            with self.db.connection() as conn:
+                ids = [row_id for (row_id,) in conn.execute(sql, {'query': fuzzy_query})]
+        return ids[:limit] if limit else ids
+
+    def search_object_ids(self, text: str, limit: Optional[int] = None) -> List[int]:
+        if not self.is_available():
+            return self.object_repo.search_ids(text, limit)
+        return self._match_ids("""
+            SELECT rowid FROM ObjectsFts
+            WHERE ObjectsFts MATCH :query
+            ORDER BY rank
+        """, text, limit, self.object_repo.search_ids)
+
+    def search_meter_ids(self, text: str, limit: Optional[int] = None) -> List[int]:
+        if not self.is_available():
+            return self.meter_repo.search_ids(text, limit)
+        return self._match_ids("""
+            SELECT id FROM (
+                SELECT rowid AS id, bm25(MetersFts) AS rank FROM MetersFts
+                WHERE MetersFts MATCH :query
+                UNION ALL
+                SELECT m.id, bm25(ObjectsFts) AS rank FROM ObjectsFts
+                JOIN Meters m ON m.object_id = ObjectsFts.rowid
+                WHERE ObjectsFts MATCH :query
+            )
+            GROUP BY id
+            ORDER BY MIN(rank), id
+        """, text, limit, self.meter_repo.search_ids)
+
+    def search_audit_ids(self, text: str, limit: Optional[int] = None) -> List[int]:
+        if not self.is_available():
+            return self.search_audit_ids_like(text, limit)
+        return self._match_ids("""
+            SELECT rowid FROM AuditLogFts
+            WHERE AuditLogFts MATCH :query
+            ORDER BY rank
+        """, text, limit, self.search_audit_ids_like)
+
+    def search_audit_ids_like(self, text: str, limit: Optional[int] = None) -> List[int]:
+        with self.db.connection() as conn:
+            return [row[0] for row in conn.execute(f"""
+                SELECT id FROM AuditLog
+                WHERE {self.like_condition(self.AUDIT_COLUMNS)}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            """, [like_pattern(text)] * len(self.AUDIT_COLUMNS) + [-1 if limit is None else limit])]
+
+    def search_objects(self, text: str, limit: int = 20):
+        return self.object_repo.get_by_ids(self.search_object_ids(text, limit))
@@ -12,9 +12,10 @@ class BatchReadingDialog(QDialog):
         super().__init__(parent)
         self.object_id = object_id
         self.db = db
-        self.meter_repo = MeterRepository(db)
-        self.reading_repo = ReadingRepository(db)
-        self.calc_service = CalculationService(db)
+        cache_service = getattr(parent, 'cache_service', None)
+        self.meter_repo = MeterRepository(db, cache_service)
+        self.reading_repo = ReadingRepository(db, cache_service)
+        self.calc_service = CalculationService(db, cache_service)
         self.setWindowTitle("Пакетный ввод показаний")
         self.setModal(True)
         self.resize(700, 500)
@@ -4,15 +4,20 @@ from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QLineEdit, QDateEdit, QDoubleSpinBox, QComboBox,
                              QFileDialog, QGroupBox, QFormLayout, QTextEdit,
                              QHeaderView, QMenu, QAbstractItemView, QStatusBar,
-                             QCheckBox, QToolTip, QToolBar)
-from PyQt6.QtCore import Qt, QDate, pyqtSignal, QPointF
+                             QCheckBox, QToolTip, QToolBar, QProgressDialog,
+                             QTableView, QInputDialog)
+from PyQt6.QtCore import Qt, QDate, pyqtSignal, QPointF, QThreadPool, QTimer
 from PyQt6.QtGui import QPixmap, QPainter, QPen, QColor, QAction, QContextMenuEvent, QDragEnterEvent, QDropEvent, QIcon
 from datetime import date, datetime, timedelta
 import os
+import threading
+from app.config import Config
 from app.database import Database
 from app.models import Object, Meter, Reading, ObjectRepository, MeterRepository, ReadingRepository, UserRepository
-from app.services import CalculationService, ReportGenerator, ChartWidget, NotificationService, ReceiptGenerator, ImportService, AuditService, AuthService
+from app.services import CalculationService, ReportGenerator, ChartWidget, NotificationService, ReceiptGenerator, ImportService, AuditService, AuthService, DashboardService, SearchService, ChartService
 from app.ui.batch_reading_dialog import BatchReadingDialog
+from app.ui.workers import ImportWorker, TaskWorker
+from app.ui.table_models import LazyTableModel, IdFilterProxyModel, id_page_fetcher
 from app.utils.settings import Settings
 
 class LoginDialog(QDialog):
@@ -76,14 +81,11 @@ class LoginDialog(QDialog):
             self.password_edit.setFocus()
             return
         
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, role, password FROM Users 
-            WHERE username = ?
-        """, (username,))
-        result = cursor.fetchone()
-        conn.close()
+        with self.db.connection() as conn:
+            result = conn.execute("""
+                SELECT id, role, password FROM Users 
+                WHERE username = ?
+            """, (username,)).fetchone()
         
         if result:
             user_id, user_role, stored_password = result
@@ -111,10 +113,10 @@ class CityMapWidget(QWidget):
     building_clicked = pyqtSignal(int)
     building_moved = pyqtSignal(int, int, int)
     
-    def __init__(self, db: Database, parent=None):
+    def __init__(self, db: Database, parent=None, cache_service=None):
         super().__init__(parent)
         self.db = db
-        self.object_repo = ObjectRepository(db)
+        self.object_repo = ObjectRepository(db, cache_service)
         self.buildings = []
         # Используем только две карты из папки img: дневную и ночную
         self.map_image_paths = [
@@ -615,6 +617,7 @@ class ReadingDialog(QDialog):
         super().__init__(parent)
         self.meter_id = meter_id
         self.db = parent.db if hasattr(parent, 'db') else None
+        self.cache_service = getattr(parent, 'cache_service', None)
         self.setWindowTitle("Ввод показаний")
         self.setModal(True)
         self.resize(400, 300)
@@ -624,9 +627,9 @@ class ReadingDialog(QDialog):
         self.last_reading = None
         meter_info = None
         if self.db:
-            meter_repo = MeterRepository(self.db)
+            meter_repo = MeterRepository(self.db, self.cache_service)
             meter_info = meter_repo.get_by_id(meter_id)
-            reading_repo = ReadingRepository(self.db)
+            reading_repo = ReadingRepository(self.db, self.cache_service)
             self.last_reading = reading_repo.get_last_reading(meter_id)
         
         if meter_info:
@@ -729,7 +732,7 @@ class ReadingDialog(QDialog):
                         return
         
         if self.db:
-            reading_repo = ReadingRepository(self.db)
+            reading_repo = ReadingRepository(self.db, self.cache_service)
             existing_readings = reading_repo.get_by_meter_id(self.meter_id)
             for existing in existing_readings:
                 if existing.reading_date == reading_date and abs(existing.value - value) < 0.01:
@@ -797,11 +800,12 @@ class BuildingUsersDialog(QDialog):
         super().__init__(parent)
         self.object_id = object_id
         self.db = db
-        self.object_repo = ObjectRepository(db)
-        self.meter_repo = MeterRepository(db)
-        self.reading_repo = ReadingRepository(db)
-        self.calc_service = CalculationService(db)
-        self.user_repo = UserRepository(db)
+        self.cache_service = getattr(parent, 'cache_service', None)
+        self.object_repo = ObjectRepository(db, self.cache_service)
+        self.meter_repo = MeterRepository(db, self.cache_service)
+        self.reading_repo = ReadingRepository(db, self.cache_service)
+        self.calc_service = CalculationService(db, self.cache_service)
+        self.user_repo = UserRepository(db, self.cache_service)
         self.setWindowTitle("Информация об объекте")
         self.setModal(True)
         self.resize(800, 600)
@@ -906,6 +910,8 @@ class BuildingUsersDialog(QDialog):
         if dialog.exec():
             updated_meter = dialog.get_meter()
             self.meter_repo.update(updated_meter)
+            if updated_meter.tariff != meter.tariff:
+                self.calc_service.recalculate(meter_ids=[meter_id])
             self.close()
             BuildingUsersDialog(self.object_id, self.db, self.parent()).exec()
     
@@ -926,11 +932,11 @@ class BuildingUsersDialog(QDialog):
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM Meters WHERE id = ?", (meter_id,))
-            conn.commit()
-            conn.close()
+            try:
+                self.meter_repo.delete(meter_id)
+            except Exception as e:
+                QMessageBox.critical(self, "Ошибка", f"Не удалось удалить счетчик: {str(e)}")
+                return
             self.close()
             BuildingUsersDialog(self.object_id, self.db, self.parent()).exec()
     
@@ -947,11 +953,13 @@ class BuildingUsersDialog(QDialog):
         for meter in meters:
             readings = self.reading_repo.get_by_meter_id(meter.id)
             for reading in readings:
-                calc = self.calc_service.process_reading(reading.id)
-                all_readings.append((reading, meter, calc))
+                all_readings.append((reading, meter))
+        
+        calculations = self.calc_service.get_calculations([reading.id for reading, _ in all_readings])
         
         table.setRowCount(len(all_readings))
-        for i, (reading, meter, calc) in enumerate(all_readings):
+        for i, (reading, meter) in enumerate(all_readings):
+            calc = calculations.get(reading.id)
             table.setItem(i, 0, QTableWidgetItem(str(reading.id)))
             table.setItem(i, 1, QTableWidgetItem(meter.type))
             table.setItem(i, 2, QTableWidgetItem(str(reading.reading_date)))
@@ -1031,7 +1039,6 @@ class BuildingUsersDialog(QDialog):
         if dialog.exec():
             user_id = user_combo.currentData()
             self.user_repo.assign_object_to_user(user_id, self.object_id)
-            self.parent().cache_service.clear()
             user = self.user_repo.get_by_id(user_id)
             self.parent().audit_service.log_action(
                 self.parent().user_id, self.parent().username,
@@ -1076,7 +1083,6 @@ class BuildingUsersDialog(QDialog):
             user_id = user_combo.currentData()
             user = self.user_repo.get_by_id(user_id)
             self.user_repo.unassign_object_from_user(user_id, self.object_id)
-            self.parent().cache_service.clear()
             self.parent().audit_service.log_action(
                 self.parent().user_id, self.parent().username,
                 'UPDATE', 'UserObject', user_id,
@@ -1169,7 +1175,6 @@ class BuildingUsersDialog(QDialog):
                     obj.building_height = None
                 
                 self.object_repo.update(obj)
-                self.parent().cache_service.clear()
                 
                 new_obj_values = {
                     'building_x': obj.building_x, 'building_y': obj.building_y,
@@ -1270,25 +1275,37 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.settings = Settings()
         self.db = Database()
-        self.object_repo = ObjectRepository(self.db)
-        self.meter_repo = MeterRepository(self.db)
-        self.reading_repo = ReadingRepository(self.db)
-        self.calc_service = CalculationService(self.db)
-        self.report_generator = ReportGenerator(self.db)
-        self.notification_service = NotificationService(self.db)
-        self.receipt_generator = ReceiptGenerator(self.db)
-        self.import_service = ImportService(self.db)
-        self.user_repo = UserRepository(self.db)
-        self.audit_service = AuditService(self.db)
         from app.services.cache_service import CacheService
-        self.cache_service = CacheService(default_ttl_seconds=300)
+        self.cache_service = CacheService()
+        self.object_repo = ObjectRepository(self.db, self.cache_service)
+        self.meter_repo = MeterRepository(self.db, self.cache_service)
+        self.reading_repo = ReadingRepository(self.db, self.cache_service)
+        self.calc_service = CalculationService(self.db, self.cache_service)
+        self.report_generator = ReportGenerator(self.db, self.cache_service)
+        self.notification_service = NotificationService(self.db, self.cache_service)
+        self.receipt_generator = ReceiptGenerator(self.db, self.cache_service)
+        self.import_service = ImportService(self.db, self.cache_service)
+        self.import_worker = None
+        self.import_progress = None
+        self.receipt_worker = None
+        self.receipt_progress = None
+        self.receipt_cancel_event = None
+        self.export_worker = None
+        self.export_progress = None
+        self.export_cancel_event = None
+        self.dashboard_service = DashboardService(self.db)
+        self.chart_service = ChartService(self.db, self.cache_service)
+        self.chart_workers = set()
+        self.chart_request = 0
+        self.search_service = SearchService(self.db, self.cache_service)
+        self.user_repo = UserRepository(self.db, self.cache_service)
+        self.audit_service = AuditService(self.db)
         from app.services.backup_service import BackupService
-        self.backup_service = BackupService(self.db)
+        self.backup_service = BackupService(self.db, audit_service=self.audit_service)
         self.user_id = None
         self.user_role = None
         self.username = None
-        self.readings_current_page = 1
-        self.readings_page_size = 50
+        self.readings_total = 0
         self.current_theme = self.settings.get('theme', 'day')
         self.icon_base_path = os.path.join("app", "img")
         
@@ -1307,6 +1324,17 @@ class MainWindow(QMainWindow):
         geometry = self.geometry()
         self.settings.set_window_geometry(geometry.x(), geometry.y(),
                                           geometry.width(), geometry.height())
+        if self.import_worker is not None:
+            self.import_worker.cancel()
+        if self.receipt_cancel_event is not None:
+            self.receipt_cancel_event.set()
+        if self.export_cancel_event is not None:
+            self.export_cancel_event.set()
+        QThreadPool.globalInstance().waitForDone()
+        self.backup_service.stop_auto_backup()
+        self.audit_service.shutdown()
+        self.cache_service.shutdown()
+        self.db.close()
         event.accept()
 
     def init_menu_and_status_bar(self):
@@ -1453,7 +1481,7 @@ class MainWindow(QMainWindow):
         notifications_widget = self.create_notifications_widget()
         layout.addWidget(notifications_widget)
         
-        self.city_map = CityMapWidget(self.db)
+        self.city_map = CityMapWidget(self.db, cache_service=self.cache_service)
         self.city_map.building_clicked.connect(self.on_building_clicked)
         self.city_map.building_moved.connect(self.on_building_moved)
         layout.addWidget(self.city_map)
@@ -1545,6 +1573,24 @@ class MainWindow(QMainWindow):
         self.audit_action_filter.addItem("DELETE", "DELETE")
         self.audit_action_filter.addItem("LOGIN", "LOGIN")
         
+        self.audit_period_check = QCheckBox("Период:")
+        self.audit_date_from = QDateEdit()
+        self.audit_date_from.setCalendarPopup(True)
+        self.audit_date_from.setDate(QDate.currentDate().addMonths(-1))
+        self.audit_date_to = QDateEdit()
+        self.audit_date_to.setCalendarPopup(True)
+        self.audit_date_to.setDate(QDate.currentDate())
+        self.audit_archive_check = QCheckBox("Включая архив")
+        
+        search_label = QLabel("Поиск:")
+        self.audit_search_edit = QLineEdit()
+        self.audit_search_edit.setPlaceholderText("Описание, пользователь, значения...")
+        self.audit_search_timer = QTimer(self)
+        self.audit_search_timer.setSingleShot(True)
+        self.audit_search_timer.setInterval(250)
+        self.audit_search_timer.timeout.connect(self.load_audit_logs)
+        self.audit_search_edit.textChanged.connect(lambda text: self.audit_search_timer.start())
+        
         filter_btn = QPushButton("Применить")
         filter_btn.clicked.connect(self.load_audit_logs)
         export_btn = QPushButton("Экспорт")
@@ -1556,18 +1602,26 @@ class MainWindow(QMainWindow):
         filter_layout.addWidget(self.audit_entity_filter)
         filter_layout.addWidget(action_filter_label)
         filter_layout.addWidget(self.audit_action_filter)
+        filter_layout.addWidget(self.audit_period_check)
+        filter_layout.addWidget(self.audit_date_from)
+        filter_layout.addWidget(self.audit_date_to)
+        filter_layout.addWidget(self.audit_archive_check)
+        filter_layout.addWidget(search_label)
+        filter_layout.addWidget(self.audit_search_edit)
         filter_layout.addWidget(filter_btn)
         filter_layout.addWidget(export_btn)
         filter_layout.addStretch()
         filter_group.setLayout(filter_layout)
         layout.addWidget(filter_group)
         
-        self.audit_table = QTableWidget()
-        self.audit_table.setColumnCount(7)
-        self.audit_table.setHorizontalHeaderLabels(["Дата", "Пользователь", "Действие", "Тип", "ID", "Описание", "Изменения"])
+        self.audit_model = LazyTableModel(
+            ["Дата", "Пользователь", "Действие", "Тип", "ID", "Описание", "Изменения"],
+            lambda cursor, limit: ([], None))
+        self.audit_table = QTableView()
+        self.audit_table.setModel(self.audit_model)
         self.audit_table.horizontalHeader().setStretchLastSection(True)
-        self.audit_table.setSortingEnabled(True)
         self.audit_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.audit_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         
         layout.addWidget(self.audit_table)
         
@@ -1576,43 +1630,44 @@ class MainWindow(QMainWindow):
         widget.setLayout(layout)
         return widget
     
+    def get_audit_filters(self) -> dict:
+        filters = {
+            'user_id': self.audit_user_filter.currentData(),
+            'entity_type': self.audit_entity_filter.currentData(),
+            'action_type': self.audit_action_filter.currentData(),
+            'search': self.audit_search_edit.text().strip() or None,
+            'include_archived': self.audit_archive_check.isChecked()
+        }
+        if self.audit_period_check.isChecked():
+            filters['start_date'] = self.audit_date_from.date().toPyDate()
+            filters['end_date'] = self.audit_date_to.date().toPyDate()
+        return filters
+    
     def load_audit_logs(self):
-        user_id = self.audit_user_filter.currentData() if hasattr(self, 'audit_user_filter') else None
-        entity_type = self.audit_entity_filter.currentData() if hasattr(self, 'audit_entity_filter') else None
-        action_type = self.audit_action_filter.currentData() if hasattr(self, 'audit_action_filter') else None
-        
-        logs = self.audit_service.get_logs(user_id=user_id, entity_type=entity_type, limit=500)
-        
-        if action_type:
-            logs = [log for log in logs if log.get('action_type') == action_type]
-        
-        self.audit_table.setRowCount(len(logs))
-        for i, log in enumerate(logs):
-            created_at = log.get('created_at', '')
-            if isinstance(created_at, str):
-                date_str = created_at
-            else:
-                date_str = str(created_at)
-            
-            username = log.get('username', 'N/A')
-            action = log.get('action_type', '')
-            entity = log.get('entity_type', '')
-            entity_id = str(log.get('entity_id', '')) if log.get('entity_id') else ''
-            description = log.get('description', '')
-            
+        filters = self.get_audit_filters()
+        self.audit_model.reload(lambda cursor, limit: self.fetch_audit_page(filters, cursor, limit))
+    
+    def fetch_audit_page(self, filters, cursor, limit):
+        logs = self.audit_service.get_logs(limit=limit, cursor=cursor, **filters)
+        rows = []
+        for log in logs:
             changes = ""
             if log.get('old_value'):
                 changes += f"Было: {log['old_value']}\n"
             if log.get('new_value'):
                 changes += f"Стало: {log['new_value']}"
-            
-            self.audit_table.setItem(i, 0, QTableWidgetItem(date_str))
-            self.audit_table.setItem(i, 1, QTableWidgetItem(username))
-            self.audit_table.setItem(i, 2, QTableWidgetItem(action))
-            self.audit_table.setItem(i, 3, QTableWidgetItem(entity))
-            self.audit_table.setItem(i, 4, QTableWidgetItem(entity_id))
-            self.audit_table.setItem(i, 5, QTableWidgetItem(description))
-            self.audit_table.setItem(i, 6, QTableWidgetItem(changes))
+            rows.append((
+                str(log.get('created_at', '')),
+                log.get('username', 'N/A'),
+                log.get('action_type', ''),
+                log.get('entity_type', ''),
+                str(log.get('entity_id', '')) if log.get('entity_id') else '',
+                log.get('description', ''),
+                changes
+            ))
+        
+        next_cursor = (logs[-1]['created_at'], logs[-1]['id']) if len(logs) == limit else None
+        return rows, next_cursor
     
     def export_audit_logs(self):
         filename, _ = QFileDialog.getSaveFileName(
@@ -1623,24 +1678,9 @@ class MainWindow(QMainWindow):
             return
         
         try:
-            import pandas as pd
-            
-            user_id = self.audit_user_filter.currentData() if hasattr(self, 'audit_user_filter') else None
-            entity_type = self.audit_entity_filter.currentData() if hasattr(self, 'audit_entity_filter') else None
-            action_type = self.audit_action_filter.currentData() if hasattr(self, 'audit_action_filter') else None
-            
-            logs = self.audit_service.get_logs(user_id=user_id, entity_type=entity_type, limit=10000)
-            
-            if action_type:
-                logs = [log for log in logs if log.get('action_type') == action_type]
-            
-            df = pd.DataFrame(logs)
-            if not df.empty:
-                if filename.endswith('.xlsx'):
-                    df.to_excel(filename, index=False)
-                else:
-                    df.to_csv(filename, index=False, encoding='utf-8-sig')
-                QMessageBox.information(self, "Успех", f"Логи экспортированы: {filename}")
+            count = self.audit_service.export_logs(filename, **self.get_audit_filters())
+            if count:
+                QMessageBox.information(self, "Успех", f"Логи экспортированы ({count} записей): {filename}")
             else:
                 QMessageBox.warning(self, "Предупреждение", "Нет данных для экспорта")
         except Exception as e:
@@ -1687,32 +1727,12 @@ class MainWindow(QMainWindow):
         stats_group = QGroupBox("Статистика")
         stats_layout = QHBoxLayout()
         
-        objects = self.object_repo.get_all()
-        total_meters = 0
-        total_readings = 0
-        total_amount = 0.0
+        summary = self.dashboard_service.get_summary()
         
-        today = date.today()
-        month_start = date(today.year, today.month, 1)
-        
-        for obj in objects:
-            meters = self.meter_repo.get_by_object_id(obj.id)
-            total_meters += len(meters)
-            
-            for meter in meters:
-                readings = self.reading_repo.get_by_meter_id(meter.id)
-                month_readings = [r for r in readings if r.reading_date >= month_start]
-                total_readings += len(month_readings)
-                
-                for reading in month_readings:
-                    calc = self.calc_service.process_reading(reading.id)
-                    if calc:
-                        total_amount += calc.get('amount', 0)
-        
-        stats_layout.addWidget(QLabel(f"<b>Объектов:</b> {len(objects)}"))
-        stats_layout.addWidget(QLabel(f"<b>Счетчиков:</b> {total_meters}"))
-        stats_layout.addWidget(QLabel(f"<b>Показаний за месяц:</b> {total_readings}"))
-        stats_layout.addWidget(QLabel(f"<b>К оплате за месяц:</b> {total_amount:.2f} руб."))
+        stats_layout.addWidget(QLabel(f"<b>Объектов:</b> {summary['objects']}"))
+        stats_layout.addWidget(QLabel(f"<b>Счетчиков:</b> {summary['meters']}"))
+        stats_layout.addWidget(QLabel(f"<b>Показаний за месяц:</b> {summary['month_readings']}"))
+        stats_layout.addWidget(QLabel(f"<b>К оплате за месяц:</b> {summary['month_amount']:.2f} руб."))
         stats_layout.addStretch()
         stats_group.setLayout(stats_layout)
         layout.addWidget(stats_group)
@@ -1742,25 +1762,15 @@ class MainWindow(QMainWindow):
         recent_table.setHorizontalHeaderLabels(["Дата", "Объект", "Счетчик", "Показание", "Расход"])
         recent_table.horizontalHeader().setStretchLastSection(True)
         
-        all_recent_readings = []
-        for obj in objects:
-            meters = self.meter_repo.get_by_object_id(obj.id)
-            for meter in meters:
-                readings = self.reading_repo.get_by_meter_id(meter.id)
-                for reading in readings[:3]:
-                    calc = self.calc_service.process_reading(reading.id)
-                    all_recent_readings.append((reading, meter, obj, calc))
-        
-        all_recent_readings.sort(key=lambda x: x[0].reading_date, reverse=True)
-        all_recent_readings = all_recent_readings[:10]
-        
-        recent_table.setRowCount(len(all_recent_readings))
-        for i, (reading, meter, obj, calc) in enumerate(all_recent_readings):
-            recent_table.setItem(i, 0, QTableWidgetItem(str(reading.reading_date)))
-            recent_table.setItem(i, 1, QTableWidgetItem(obj.address))
-            recent_table.setItem(i, 2, QTableWidgetItem(meter.type))
-            recent_table.setItem(i, 3, QTableWidgetItem(str(reading.value)))
-            recent_table.setItem(i, 4, QTableWidgetItem(str(calc.get('consumption', 0)) if calc else "0"))
+        recent_readings = self.dashboard_service.get_recent_readings(10)
+        
+        recent_table.setRowCount(len(recent_readings))
+        for i, reading in enumerate(recent_readings):
+            recent_table.setItem(i, 0, QTableWidgetItem(str(reading['reading_date'])))
+            recent_table.setItem(i, 1, QTableWidgetItem(reading['address']))
+            recent_table.setItem(i, 2, QTableWidgetItem(reading['meter_type']))
+            recent_table.setItem(i, 3, QTableWidgetItem(str(reading['value'])))
+            recent_table.setItem(i, 4, QTableWidgetItem(str(reading['consumption'])))
         
         recent_layout.addWidget(recent_table)
         recent_readings_group.setLayout(recent_layout)
@@ -1775,11 +1785,15 @@ class MainWindow(QMainWindow):
         
         search_layout = QHBoxLayout()
         search_label = QLabel("Поиск:")
-        search_edit = QLineEdit()
-        search_edit.setPlaceholderText("Введите адрес для поиска...")
-        search_edit.textChanged.connect(lambda text: self.filter_objects_table(text))
+        self.objects_search_edit = QLineEdit()
+        self.objects_search_edit.setPlaceholderText("Введите адрес для поиска...")
+        self.objects_search_timer = QTimer(self)
+        self.objects_search_timer.setSingleShot(True)
+        self.objects_search_timer.setInterval(250)
+        self.objects_search_timer.timeout.connect(self.load_objects_table)
+        self.objects_search_edit.textChanged.connect(lambda text: self.objects_search_timer.start())
         search_layout.addWidget(search_label)
-        search_layout.addWidget(search_edit)
+        search_layout.addWidget(self.objects_search_edit)
         layout.addLayout(search_layout)
         
         buttons_layout = QHBoxLayout()
@@ -1789,20 +1803,22 @@ class MainWindow(QMainWindow):
         buttons_layout.addStretch()
         layout.addLayout(buttons_layout)
         
-        self.objects_table = QTableWidget()
-        self.objects_table.setColumnCount(4)
-        self.objects_table.setHorizontalHeaderLabels(["ID", "Адрес", "Площадь", "Жильцов"])
+        self.objects_model = LazyTableModel(["ID", "Адрес", "Площадь", "Жильцов"], self.fetch_objects_page)
+        self.objects_table = QTableView()
+        self.objects_proxy = IdFilterProxyModel(self)
+        self.objects_proxy.setSourceModel(self.objects_model)
+        self.objects_table.setModel(self.objects_proxy)
         self.objects_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         self.objects_table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.objects_table.customContextMenuRequested.connect(self.show_objects_context_menu)
         self.objects_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         self.objects_table.setAlternatingRowColors(True)
         self.objects_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 alternate-background-color: #f0f0f0;
                 gridline-color: #d0d0d0;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #4a90e2;
                 color: white;
             }
@@ -1819,31 +1835,32 @@ class MainWindow(QMainWindow):
         widget.setLayout(layout)
         return widget
     
+    def object_rows(self, objects):
+        return [(obj.id, obj.address, obj.area or "", obj.residents or "") for obj in objects]
+    
+    def fetch_objects_page(self, cursor, limit):
+        objects, next_cursor = self.object_repo.get_page(cursor, limit)
+        return self.object_rows(objects), next_cursor
+    
     def load_objects_table(self):
-        self.objects_table.setUpdatesEnabled(False)
-        try:
-            objects = self.object_repo.get_all()
-            self.objects_table.setRowCount(len(objects))
-            for i, obj in enumerate(objects):
-                self.objects_table.setItem(i, 0, QTableWidgetItem(str(obj.id)))
-                self.objects_table.setItem(i, 1, QTableWidgetItem(obj.address))
-                self.objects_table.setItem(i, 2, QTableWidgetItem(str(obj.area) if obj.area else ""))
-                self.objects_table.setItem(i, 3, QTableWidgetItem(str(obj.residents) if obj.residents else ""))
-        finally:
-            self.objects_table.setUpdatesEnabled(True)
-    
-    def filter_objects_table(self, text):
-        for i in range(self.objects_table.rowCount()):
-            match = False
-            for j in range(self.objects_table.columnCount()):
-                item = self.objects_table.item(i, j)
-                if item and text.lower() in item.text().lower():
-                    match = True
-                    break
-            self.objects_table.setRowHidden(i, not match)
+        text = self.objects_search_edit.text().strip()
+        if text:
+            ids = self.search_service.search_object_ids(text, Config.SEARCH_MAX_RESULTS)
+            self.show_search_limit(ids)
+            self.objects_proxy.set_ids(ids)
+            self.objects_model.reload(id_page_fetcher(
+                ids, lambda page_ids: self.object_rows(self.object_repo.get_by_ids(page_ids))))
+        else:
+            self.objects_proxy.set_ids(None)
+            self.objects_model.reload(self.fetch_objects_page)
+    
+    def show_search_limit(self, ids):
+        if len(ids) >= Config.SEARCH_MAX_RESULTS and self.statusBar():
+            self.statusBar().showMessage(
+                f"Показаны первые {Config.SEARCH_MAX_RESULTS} результатов, уточните запрос", 5000)
     
     def show_objects_context_menu(self, position):
-        if self.objects_table.itemAt(position) is None:
+        if not self.objects_table.indexAt(position).isValid():
             return
         
         menu = QMenu(self)
@@ -1868,12 +1885,11 @@ class MainWindow(QMainWindow):
                 QMessageBox.critical(self, "Ошибка", f"Не удалось добавить объект: {str(e)}")
     
     def edit_object_from_table(self):
-        row = self.objects_table.currentRow()
-        if row < 0:
+        obj_id = self.objects_proxy.row_id(self.objects_table.currentIndex().row())
+        if obj_id is None:
             return
         
         try:
-            obj_id = int(self.objects_table.item(row, 0).text())
             obj = self.object_repo.get_by_id(obj_id)
             if not obj:
                 return
@@ -1883,7 +1899,6 @@ class MainWindow(QMainWindow):
             if dialog.exec():
                 updated_obj = dialog.get_object()
                 self.object_repo.update(updated_obj)
-                self.cache_service.clear()
                 self.audit_service.log_action(
                     self.user_id, self.username,
                     'UPDATE', 'Object', obj_id,
@@ -1897,12 +1912,11 @@ class MainWindow(QMainWindow):
             QMessageBox.critical(self, "Ошибка", f"Не удалось обновить объект: {str(e)}")
     
     def delete_object_from_table(self):
-        row = self.objects_table.currentRow()
-        if row < 0:
+        obj_id = self.objects_proxy.row_id(self.objects_table.currentIndex().row())
+        if obj_id is None:
             return
         
         try:
-            obj_id = int(self.objects_table.item(row, 0).text())
             obj = self.object_repo.get_by_id(obj_id)
             if not obj:
                 return
@@ -1916,7 +1930,6 @@ class MainWindow(QMainWindow):
             if reply == QMessageBox.StandardButton.Yes:
                 old_address = obj.address
                 self.object_repo.delete(obj_id)
-                self.cache_service.clear()
                 self.audit_service.log_action(
                     self.user_id, self.username,
                     'DELETE', 'Object', obj_id,
@@ -1934,11 +1947,15 @@ class MainWindow(QMainWindow):
         
         search_layout = QHBoxLayout()
         search_label = QLabel("Поиск:")
-        search_edit = QLineEdit()
-        search_edit.setPlaceholderText("Введите тип или серийный номер...")
-        search_edit.textChanged.connect(lambda text: self.filter_meters_table(text))
+        self.meters_search_edit = QLineEdit()
+        self.meters_search_edit.setPlaceholderText("Введите тип или серийный номер...")
+        self.meters_search_timer = QTimer(self)
+        self.meters_search_timer.setSingleShot(True)
+        self.meters_search_timer.setInterval(250)
+        self.meters_search_timer.timeout.connect(self.load_meters_table)
+        self.meters_search_edit.textChanged.connect(lambda text: self.meters_search_timer.start())
         search_layout.addWidget(search_label)
-        search_layout.addWidget(search_edit)
+        search_layout.addWidget(self.meters_search_edit)
         layout.addLayout(search_layout)
         
         buttons_layout = QHBoxLayout()
@@ -1948,20 +1965,22 @@ class MainWindow(QMainWindow):
         buttons_layout.addStretch()
         layout.addLayout(buttons_layout)
         
-        self.meters_table = QTableWidget()
-        self.meters_table.setColumnCount(5)
-        self.meters_table.setHorizontalHeaderLabels(["ID", "Тип", "Серийный номер", "Тариф", "Объект"])
+        self.meters_model = LazyTableModel(["ID", "Тип", "Серийный номер", "Тариф", "Объект"], self.fetch_meters_page)
+        self.meters_table = QTableView()
+        self.meters_proxy = IdFilterProxyModel(self)
+        self.meters_proxy.setSourceModel(self.meters_model)
+        self.meters_table.setModel(self.meters_proxy)
         self.meters_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         self.meters_table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.meters_table.customContextMenuRequested.connect(self.show_meters_context_menu)
         self.meters_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         self.meters_table.setAlternatingRowColors(True)
         self.meters_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 alternate-background-color: #f0f0f0;
                 gridline-color: #d0d0d0;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #4a90e2;
                 color: white;
             }
@@ -1978,37 +1997,28 @@ class MainWindow(QMainWindow):
         widget.setLayout(layout)
         return widget
     
+    def meter_rows(self, meters):
+        return [(meter.id, meter.type, meter.serial_number or "", meter.tariff, address)
+                for meter, address in meters]
+    
+    def fetch_meters_page(self, cursor, limit):
+        meters, next_cursor = self.meter_repo.get_page(cursor, limit)
+        return self.meter_rows(meters), next_cursor
+    
     def load_meters_table(self):
-        self.meters_table.setUpdatesEnabled(False)
-        try:
-            objects = self.object_repo.get_all()
-            all_meters = []
-            for obj in objects:
-                meters = self.meter_repo.get_by_object_id(obj.id)
-                all_meters.extend([(m, obj) for m in meters])
-            
-            self.meters_table.setRowCount(len(all_meters))
-            for i, (meter, obj) in enumerate(all_meters):
-                self.meters_table.setItem(i, 0, QTableWidgetItem(str(meter.id)))
-                self.meters_table.setItem(i, 1, QTableWidgetItem(meter.type))
-                self.meters_table.setItem(i, 2, QTableWidgetItem(meter.serial_number or ""))
-                self.meters_table.setItem(i, 3, QTableWidgetItem(str(meter.tariff)))
-                self.meters_table.setItem(i, 4, QTableWidgetItem(obj.address))
-        finally:
-            self.meters_table.setUpdatesEnabled(True)
-    
-    def filter_meters_table(self, text):
-        for i in range(self.meters_table.rowCount()):
-            match = False
-            for j in range(self.meters_table.columnCount()):
-                item = self.meters_table.item(i, j)
-                if item and text.lower() in item.text().lower():
-                    match = True
-                    break
-            self.meters_table.setRowHidden(i, not match)
+        text = self.meters_search_edit.text().strip()
+        if text:
+            ids = self.search_service.search_meter_ids(text, Config.SEARCH_MAX_RESULTS)
+            self.show_search_limit(ids)
+            self.meters_proxy.set_ids(ids)
+            self.meters_model.reload(id_page_fetcher(
+                ids, lambda page_ids: self.meter_rows(self.meter_repo.get_by_ids_with_addresses(page_ids))))
+        else:
+            self.meters_proxy.set_ids(None)
+            self.meters_model.reload(self.fetch_meters_page)
     
     def show_meters_context_menu(self, position):
-        if self.meters_table.itemAt(position) is None:
+        if not self.meters_table.indexAt(position).isValid():
             return
         
         menu = QMenu(self)
@@ -2077,12 +2087,11 @@ class MainWindow(QMainWindow):
                 QMessageBox.critical(self, "Ошибка", f"Не удалось добавить счетчик: {str(e)}")
     
     def edit_meter_from_table(self):
-        row = self.meters_table.currentRow()
-        if row < 0:
+        meter_id = self.meters_proxy.row_id(self.meters_table.currentIndex().row())
+        if meter_id is None:
             return
         
         try:
-            meter_id = int(self.meters_table.item(row, 0).text())
             meter = self.meter_repo.get_by_id(meter_id)
             if not meter:
                 return
@@ -2095,6 +2104,8 @@ class MainWindow(QMainWindow):
             if dialog.exec():
                 updated_meter = dialog.get_meter()
                 self.meter_repo.update(updated_meter)
+                if updated_meter.tariff != meter.tariff:
+                    self.calc_service.recalculate(meter_ids=[meter_id])
                 obj = self.object_repo.get_by_id(updated_meter.object_id)
                 new_meter_values = {
                     'type': updated_meter.type, 'serial_number': updated_meter.serial_number,
@@ -2112,12 +2123,11 @@ class MainWindow(QMainWindow):
             QMessageBox.critical(self, "Ошибка", f"Не удалось обновить счетчик: {str(e)}")
     
     def delete_meter_from_table(self):
-        row = self.meters_table.currentRow()
-        if row < 0:
+        meter_id = self.meters_proxy.row_id(self.meters_table.currentIndex().row())
+        if meter_id is None:
             return
         
         try:
-            meter_id = int(self.meters_table.item(row, 0).text())
             meter = self.meter_repo.get_by_id(meter_id)
             if not meter:
                 return
@@ -2134,11 +2144,7 @@ class MainWindow(QMainWindow):
                     'tariff': meter.tariff
                 }
                 obj = self.object_repo.get_by_id(meter.object_id)
-                conn = self.db.get_connection()
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM Meters WHERE id = ?", (meter_id,))
-                conn.commit()
-                conn.close()
+                self.meter_repo.delete(meter_id)
                 self.audit_service.log_action(
                     self.user_id, self.username,
                     'DELETE', 'Meter', meter_id,
@@ -2210,31 +2216,21 @@ class MainWindow(QMainWindow):
         buttons.addStretch()
         layout.addLayout(buttons)
         
-        self.readings_table = QTableWidget()
-        self.readings_table.setColumnCount(7)
-        self.readings_table.setHorizontalHeaderLabels(["ID", "Объект", "Счетчик", "Дата", "Показание", "Расход", "Сумма"])
+        self.readings_model = LazyTableModel(
+            ["ID", "Объект", "Счетчик", "Дата", "Показание", "Расход", "Сумма"],
+            lambda cursor, limit: ([], None))
+        self.readings_table = QTableView()
+        self.readings_table.setModel(self.readings_model)
         self.readings_table.horizontalHeader().setStretchLastSection(True)
-        self.readings_table.setSortingEnabled(True)
         self.readings_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.readings_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         
-        pagination_layout = QHBoxLayout()
-        self.readings_page_label = QLabel("Страница: 1")
-        prev_btn = QPushButton("◄ Предыдущая")
-        prev_btn.clicked.connect(self.prev_readings_page)
-        next_btn = QPushButton("Следующая ►")
-        next_btn.clicked.connect(self.next_readings_page)
-        self.readings_current_page = 1
-        self.readings_page_size = 50
-        
-        pagination_layout.addWidget(self.readings_page_label)
-        pagination_layout.addWidget(prev_btn)
-        pagination_layout.addWidget(next_btn)
-        pagination_layout.addStretch()
+        self.readings_total_label = QLabel("Всего: 0")
         
         self.load_readings_table()
         
         layout.addWidget(self.readings_table)
-        layout.addLayout(pagination_layout)
+        layout.addWidget(self.readings_total_label)
         widget.setLayout(layout)
         return widget
     
@@ -2248,66 +2244,27 @@ class MainWindow(QMainWindow):
             self.readings_object_filter.currentIndexChanged.connect(self.update_meter_filter)
             self._meter_filter_connected = True
         
-        objects = self.object_repo.get_all()
-        if object_id:
-            objects = [obj for obj in objects if obj.id == object_id]
+        filters = {
+            'object_id': object_id, 'meter_id': meter_id,
+            'date_from': date_from, 'date_to': date_to
+        }
+        self.readings_total = self.reading_repo.count(**filters)
+        if hasattr(self, 'readings_total_label'):
+            self.readings_total_label.setText(f"Всего: {self.readings_total}")
         
-        all_readings = []
-        for obj in objects:
-            meters = self.meter_repo.get_by_object_id(obj.id)
-            if meter_id:
-                meters = [m for m in meters if m.id == meter_id]
-            for meter in meters:
-                readings = self.reading_repo.get_by_meter_id(meter.id)
-                for reading in readings:
-                    if date_from and reading.reading_date < date_from:
-                        continue
-                    if date_to and reading.reading_date > date_to:
-                        continue
-                    calc = self.calc_service.process_reading(reading.id)
-                    all_readings.append((reading, meter, obj, calc))
-        
-        all_readings.sort(key=lambda x: x[0].reading_date, reverse=True)
-        
-        total_pages = (len(all_readings) + self.readings_page_size - 1) // self.readings_page_size if all_readings else 1
-        if self.readings_current_page > total_pages:
-            self.readings_current_page = max(1, total_pages)
-        start_idx = (self.readings_current_page - 1) * self.readings_page_size
-        end_idx = start_idx + self.readings_page_size
-        page_readings = all_readings[start_idx:end_idx]
-        
-        if hasattr(self, 'readings_page_label'):
-            self.readings_page_label.setText(f"Страница: {self.readings_current_page} из {total_pages} (Всего: {len(all_readings)})")
-        
-        self.readings_table.setUpdatesEnabled(False)
-        try:
-            self.readings_table.setRowCount(len(page_readings))
-            for i, (reading, meter, obj, calc) in enumerate(page_readings):
-                self.readings_table.setItem(i, 0, QTableWidgetItem(str(reading.id)))
-                self.readings_table.setItem(i, 1, QTableWidgetItem(obj.address))
-                self.readings_table.setItem(i, 2, QTableWidgetItem(meter.type))
-                self.readings_table.setItem(i, 3, QTableWidgetItem(str(reading.reading_date)))
-                self.readings_table.setItem(i, 4, QTableWidgetItem(str(reading.value)))
-                self.readings_table.setItem(i, 5, QTableWidgetItem(str(calc.get('consumption', 0)) if calc else "0"))
-                self.readings_table.setItem(i, 6, QTableWidgetItem(str(calc.get('amount', 0)) if calc else "0"))
-        finally:
-            self.readings_table.setUpdatesEnabled(True)
-    
-    def prev_readings_page(self):
-        if self.readings_current_page > 1:
-            self.readings_current_page -= 1
-            self.load_readings_table()
+        self.readings_model.reload(lambda cursor, limit: self.fetch_readings_page(filters, cursor, limit))
     
-    def next_readings_page(self):
-        self.readings_current_page += 1
-        self.load_readings_table()
+    def fetch_readings_page(self, filters, cursor, limit):
+        result = self.reading_repo.query(cursor=cursor, limit=limit, with_total=False, **filters)
+        rows = [(reading.id, obj.address, meter.type, reading.reading_date, reading.value,
+                 calc.get('consumption', 0), calc.get('amount', 0))
+                for reading, meter, obj, calc in result['items']]
+        return rows, result['next_cursor']
     
     def filter_readings_table(self):
-        self.readings_current_page = 1
         self.load_readings_table()
     
     def reset_readings_filter(self):
-        self.readings_current_page = 1
         if hasattr(self, 'readings_date_from'):
             self.readings_date_from.setDate(QDate.currentDate().addMonths(-1))
         if hasattr(self, 'readings_date_to'):
@@ -2437,26 +2394,70 @@ class MainWindow(QMainWindow):
         if not filename:
             return
         
-        try:
-            if filename.endswith('.csv'):
-                result = self.import_service.import_from_csv(filename)
-            else:
-                result = self.import_service.import_from_excel(filename)
-            
-            message = f"Импорт завершен:\nУспешно: {result['success']}\nОшибок: {result['errors']}"
-            if result['errors'] > 0 and result.get('error_messages'):
-                error_text = "\n".join(result['error_messages'][:10])
-                if len(result['error_messages']) > 10:
-                    error_text += f"\n... и еще {len(result['error_messages']) - 10} ошибок"
-                message += f"\n\nОшибки:\n{error_text}"
-            
-            if result['success'] > 0:
-                QMessageBox.information(self, "Импорт завершен", message)
-                self.setup_ui_for_role()
-            else:
-                QMessageBox.warning(self, "Импорт завершен", message)
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка импорта", f"Не удалось импортировать данные: {str(e)}")
+        if self.import_worker is not None:
+            QMessageBox.information(self, "Импорт", "Импорт уже выполняется")
+            return
+        
+        self.import_progress = QProgressDialog("Импорт показаний...", "Отмена", 0, 0, self)
+        self.import_progress.setWindowTitle("Импорт показаний")
+        self.import_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.import_progress.setMinimumDuration(0)
+        self.import_progress.setAutoClose(False)
+        self.import_progress.setAutoReset(False)
+        
+        self.import_worker = ImportWorker(self.import_service, filename)
+        self.import_worker.signals.progress.connect(self.on_import_progress)
+        self.import_worker.signals.finished.connect(self.on_import_finished)
+        self.import_worker.signals.error.connect(self.on_import_error)
+        self.import_progress.canceled.connect(self.cancel_import)
+        
+        self.import_progress.show()
+        QThreadPool.globalInstance().start(self.import_worker)
+    
+    def cancel_import(self):
+        if self.import_worker is not None:
+            self.import_worker.cancel()
+            self.import_progress.show()
+            self.import_progress.setLabelText("Отмена импорта, откат текущей порции...")
+    
+    def on_import_progress(self, processed: int, success: int, errors: int, rows_per_second: float):
+        if self.import_worker is None or self.import_worker.is_cancelled():
+            return
+        self.import_progress.setLabelText(
+            f"Обработано строк: {processed} ({rows_per_second:.0f} строк/с)\n"
+            f"Загружено: {success}, ошибок: {errors}")
+    
+    def finish_import(self):
+        self.import_worker = None
+        if self.import_progress is not None:
+            self.import_progress.canceled.disconnect(self.cancel_import)
+            self.import_progress.close()
+            self.import_progress = None
+    
+    def on_import_finished(self, result: dict):
+        self.finish_import()
+        
+        title = "Импорт отменен" if result.get('cancelled') else "Импорт завершен"
+        message = (f"{title}:\nУспешно: {result['success']}\nОшибок: {result['errors']}\n"
+                   f"Время: {result.get('elapsed', 0):.1f} с")
+        if result['errors'] > 0 and result.get('error_messages'):
+            error_text = "\n".join(result['error_messages'][:10])
+            if result['errors'] > 10:
+                error_text += f"\n... и еще {result['errors'] - 10} ошибок"
+            message += f"\n\nОшибки:\n{error_text}"
+        
+        if result['success'] > 0:
+            if hasattr(self, 'readings_table'):
+                self.load_readings_table()
+            QMessageBox.information(self, title, message)
+        else:
+            QMessageBox.warning(self, title, message)
+    
+    def on_import_error(self, error: str):
+        self.finish_import()
+        if hasattr(self, 'readings_table'):
+            self.load_readings_table()
+        QMessageBox.critical(self, "Ошибка импорта", f"Не удалось импортировать данные: {error}")
     
     def create_reports_tab(self):
         widget = QWidget()
@@ -2505,10 +2506,13 @@ class MainWindow(QMainWindow):
         export_pdf_btn.clicked.connect(self.export_report_pdf)
         print_receipt_btn = QPushButton("Печать квитанции")
         print_receipt_btn.clicked.connect(self.print_receipt)
+        print_all_receipts_btn = QPushButton("Квитанции для всех объектов")
+        print_all_receipts_btn.clicked.connect(self.print_all_receipts)
         buttons_layout.addWidget(generate_btn)
         buttons_layout.addWidget(export_excel_btn)
         buttons_layout.addWidget(export_pdf_btn)
         buttons_layout.addWidget(print_receipt_btn)
+        buttons_layout.addWidget(print_all_receipts_btn)
         layout.addLayout(buttons_layout)
         
         chart_group = QGroupBox("Графики")
@@ -2518,9 +2522,28 @@ class MainWindow(QMainWindow):
         self.chart_type_combo.addItems(["Линейный", "Столбчатый", "Областной"])
         self.chart_type_combo.currentIndexChanged.connect(
             lambda: self.update_chart_in_reports(self.chart_type_combo.currentText()))
+        self.chart_timer = QTimer(self)
+        self.chart_timer.setSingleShot(True)
+        self.chart_timer.setInterval(250)
+        self.chart_timer.timeout.connect(self.update_chart_in_reports)
         chart_layout.addWidget(QLabel("Тип графика:"))
         chart_layout.addWidget(self.chart_type_combo)
         
+        self.chart_bucket_combo = QComboBox()
+        for label, bucket in [("Авто", "auto"), ("День", "day"), ("Неделя", "week"),
+                              ("Месяц", "month"), ("Квартал", "quarter")]:
+            self.chart_bucket_combo.addItem(label, bucket)
+        self.chart_bucket_combo.currentIndexChanged.connect(self.update_report_chart)
+        self.chart_aggregate_combo = QComboBox()
+        for label, aggregate in [("Сумма", "sum"), ("Среднее", "avg"),
+                                 ("Минимум", "min"), ("Максимум", "max")]:
+            self.chart_aggregate_combo.addItem(label, aggregate)
+        self.chart_aggregate_combo.currentIndexChanged.connect(self.update_report_chart)
+        chart_layout.addWidget(QLabel("Группировка:"))
+        chart_layout.addWidget(self.chart_bucket_combo)
+        chart_layout.addWidget(QLabel("Агрегация:"))
+        chart_layout.addWidget(self.chart_aggregate_combo)
+        
         self.report_chart_widget = ChartWidget()
         chart_layout.addWidget(self.report_chart_widget)
         chart_group.setLayout(chart_layout)
@@ -2537,10 +2560,8 @@ class MainWindow(QMainWindow):
         if not hasattr(self, 'report_chart_widget') or not hasattr(self, 'chart_type_combo'):
             return
         
+        # Для объекта - все его счетчики, для "Все объекты" - потребление города по типам услуг
         object_id = self.report_object_combo.currentData()
-        if not object_id:
-            return
-        
         start_date = self.report_start_date.date().toPyDate()
         end_date = self.report_end_date.date().toPyDate()
         
@@ -2550,20 +2571,28 @@ class MainWindow(QMainWindow):
         chart_type_map = {"Линейный": "line", "Столбчатый": "bar", "Областной": "area"}
         chart_type_code = chart_type_map.get(chart_type, "line")
         
-        meters = self.meter_repo.get_by_object_id(object_id)
-        if meters:
-            months = max(1, (end_date - start_date).days // 30)
-            try:
-                fig = self.report_generator.create_consumption_chart(
-                    meters[0].id, months, chart_type_code)
-                if fig:
-                    self.report_chart_widget.set_chart(fig)
-            except Exception:
-                pass
+        # Результаты устаревших запросов отбрасываются; повторные запросы берутся из кэша
+        self.chart_request += 1
+        worker = TaskWorker(self.chart_service.render_multi_consumption_chart,
+                            object_id, start_date, end_date, chart_type_code,
+                            self.chart_bucket_combo.currentData(),
+                            self.chart_aggregate_combo.currentData())
+        request = self.chart_request
+        worker.signals.finished.connect(
+            lambda png, worker=worker: self.on_chart_rendered(worker, request, png))
+        worker.signals.error.connect(
+            lambda message, worker=worker: self.chart_workers.discard(worker))
+        self.chart_workers.add(worker)
+        QThreadPool.globalInstance().start(worker)
+    
+    def on_chart_rendered(self, worker, request: int, png):
+        self.chart_workers.discard(worker)
+        if request == self.chart_request:
+            self.report_chart_widget.set_image(png)
     
     def update_report_chart(self):
-        if hasattr(self, 'chart_type_combo'):
-            self.update_chart_in_reports()
+        if hasattr(self, 'chart_timer'):
+            self.chart_timer.start()
     
     def generate_report(self):
         start_date = self.report_start_date.date().toPyDate()
@@ -2591,12 +2620,14 @@ class MainWindow(QMainWindow):
         report_text += "=" * 80 + "\n\n"
         
         total_amount = 0.0
+        all_stats = self.calc_service.get_statistics_bulk(
+            [obj.id for obj in objects_to_report] if object_id else None, start_date, end_date)
         
         for obj in objects_to_report:
             report_text += f"Объект: {obj.address}\n"
             report_text += "-" * 80 + "\n"
             
-            stats = self.calc_service.get_statistics(obj.id, start_date, end_date)
+            stats = all_stats.get(obj.id, {})
             
             if not stats:
                 report_text += "Нет данных за указанный период\n\n"
@@ -2673,6 +2704,10 @@ class MainWindow(QMainWindow):
             QMessageBox.critical(self, "Ошибка", f"Не удалось создать резервную копию: {str(e)}")
     
     def export_report(self):
+        if self.export_worker is not None:
+            QMessageBox.information(self, "Экспорт", "Экспорт уже выполняется")
+            return
+        
         start_date = self.report_start_date.date().toPyDate()
         end_date = self.report_end_date.date().toPyDate()
         object_id = self.report_object_combo.currentData()
@@ -2681,40 +2716,85 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Дата начала не может быть больше даты окончания")
             return
         
-        filename, _ = QFileDialog.getSaveFileName(
-            self, "Сохранить отчет", "", "Excel (*.xlsx)")
-        if filename:
-            objects_to_export = []
-            if object_id:
-                obj = self.object_repo.get_by_id(object_id)
-                if obj:
-                    objects_to_export.append(obj)
-            else:
-                objects_to_export = self.object_repo.get_all()
-            
-            if not objects_to_export:
-                QMessageBox.warning(self, "Ошибка", "Нет объектов для экспорта")
-                return
-            
-            import pandas as pd
-            all_data = []
-            
-            for obj in objects_to_export:
-                df = self.report_generator.generate_consumption_report(
-                    obj.id, start_date, end_date)
-                if not df.empty:
-                    df.insert(0, 'Объект', obj.address)
-                    all_data.append(df)
-            
-            if all_data:
-                try:
-                    combined_df = pd.concat(all_data, ignore_index=True)
-                    self.report_generator.export_to_excel(combined_df, filename)
-                    QMessageBox.information(self, "Успех", "Отчет сохранен")
-                except Exception as e:
-                    QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить отчет: {str(e)}")
-            else:
-                QMessageBox.warning(self, "Ошибка", "Нет данных для экспорта")
+        formats = {name: output_format for name, output_format in
+                   (("Excel (*.xlsx)", 'xlsx'), ("CSV (*.csv)", 'csv'), ("Parquet (*.parquet)", 'parquet'))
+                   if output_format in ReportGenerator.get_export_formats()}
+        filename, selected_filter = QFileDialog.getSaveFileName(
+            self, "Сохранить отчет", "", ";;".join(formats))
+        if not filename:
+            return
+        output_format = formats.get(selected_filter, 'xlsx')
+        
+        splits = {"Без разбивки": None, "По объектам": 'object', "По типам услуг": 'type'}
+        choice, ok = QInputDialog.getItem(
+            self, "Экспорт отчета", "Разбивка на листы/файлы:", list(splits), 0, False)
+        if not ok:
+            return
+        
+        self.export_progress = QProgressDialog("Экспорт отчета...", "Отмена", 0, 0, self)
+        self.export_progress.setWindowTitle("Экспорт")
+        self.export_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.export_progress.setMinimumDuration(0)
+        self.export_progress.setAutoClose(False)
+        self.export_progress.setAutoReset(False)
+        
+        self.export_cancel_event = threading.Event()
+        self.export_worker = TaskWorker(
+            self.report_generator.export_report, filename, start_date, end_date, object_id,
+            output_format=output_format, split_by=splits[choice],
+            cancel_event=self.export_cancel_event)
+        signals = self.export_worker.signals
+        self.export_worker.kwargs['progress_callback'] = (
+            lambda done, total: signals.progress.emit(done, total or 0, 0, 0.0))
+        signals.progress.connect(self.on_export_progress)
+        signals.finished.connect(self.on_export_finished)
+        signals.error.connect(self.on_export_error)
+        self.export_progress.canceled.connect(self.cancel_export)
+        
+        self.export_progress.show()
+        QThreadPool.globalInstance().start(self.export_worker)
+    
+    def cancel_export(self):
+        if self.export_cancel_event is not None:
+            self.export_cancel_event.set()
+            self.export_progress.show()
+            self.export_progress.setLabelText("Отмена экспорта...")
+    
+    def on_export_progress(self, done: int, total: int, _errors: int, _rate: float):
+        if self.export_progress is None or self.export_cancel_event.is_set():
+            return
+        # Общее число строк не считается заранее, поэтому индикатор без шкалы
+        if total:
+            self.export_progress.setMaximum(total)
+            self.export_progress.setValue(done)
+            self.export_progress.setLabelText(f"Выгружено строк: {done} из {total}")
+        else:
+            self.export_progress.setLabelText(f"Выгружено строк: {done}")
+    
+    def finish_export(self):
+        self.export_worker = None
+        self.export_cancel_event = None
+        if self.export_progress is not None:
+            self.export_progress.canceled.disconnect(self.cancel_export)
+            self.export_progress.close()
+            self.export_progress = None
+    
+    def on_export_finished(self, result: dict):
+        self.finish_export()
+        if result['cancelled']:
+            QMessageBox.information(self, "Экспорт", "Экспорт отменен")
+        elif not result['rows']:
+            QMessageBox.warning(self, "Ошибка", "Нет данных для экспорта")
+        else:
+            QMessageBox.information(
+                self, "Успех",
+                f"Отчет сохранен\n"
+                f"Строк: {result['rows']}, время: {result['elapsed']:.1f} с\n"
+                f"Файлы: {', '.join(result['files'])}")
+    
+    def on_export_error(self, message: str):
+        self.finish_export()
+        QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить отчет: {message}")
     
     def export_report_pdf(self):
         start_date = self.report_start_date.date().toPyDate()
@@ -2759,4 +2839,94 @@ class MainWindow(QMainWindow):
                     f"Квитанция сохранена: {filename}\nМожно открыть для печати")
             except Exception as e:
                 QMessageBox.critical(self, "Ошибка", f"Не удалось создать квитанцию: {str(e)}")
+    
+    def print_all_receipts(self):
+        if self.receipt_worker is not None:
+            QMessageBox.information(self, "Квитанции", "Пакетная печать уже выполняется")
+            return
+        
+        start_date = self.report_start_date.date().toPyDate()
+        end_date = self.report_end_date.date().toPyDate()
+        
+        if start_date > end_date:
+            QMessageBox.warning(self, "Ошибка", "Дата начала не может быть больше даты окончания")
+            return
+        
+        formats = {
+            "Отдельные PDF в папку": 'files',
+            "Один PDF со всеми квитанциями": 'pdf',
+            "ZIP-архив": 'zip'
+        }
+        choice, ok = QInputDialog.getItem(
+            self, "Квитанции для всех объектов", "Формат:", list(formats), 0, False)
+        if not ok:
+            return
+        output_format = formats[choice]
+        
+        if output_format == 'files':
+            output_path = QFileDialog.getExistingDirectory(self, "Папка для квитанций")
+        elif output_format == 'pdf':
+            output_path, _ = QFileDialog.getSaveFileName(
+                self, "Сохранить квитанции", "receipts.pdf", "PDF (*.pdf)")
+        else:
+            output_path, _ = QFileDialog.getSaveFileName(
+                self, "Сохранить квитанции", "receipts.zip", "ZIP (*.zip)")
+        if not output_path:
+            return
+        
+        self.receipt_progress = QProgressDialog("Формирование квитанций...", "Отмена", 0, 0, self)
+        self.receipt_progress.setWindowTitle("Квитанции")
+        self.receipt_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.receipt_progress.setMinimumDuration(0)
+        self.receipt_progress.setAutoClose(False)
+        self.receipt_progress.setAutoReset(False)
+        
+        self.receipt_cancel_event = threading.Event()
+        self.receipt_worker = TaskWorker(
+            self.receipt_generator.generate_batch, start_date, end_date, output_path,
+            output_format=output_format, cancel_event=self.receipt_cancel_event)
+        signals = self.receipt_worker.signals
+        self.receipt_worker.kwargs['progress_callback'] = (
+            lambda done, total: signals.progress.emit(done, total or 0, 0, 0.0))
+        signals.progress.connect(self.on_receipts_progress)
+        signals.finished.connect(self.on_receipts_finished)
+        signals.error.connect(self.on_receipts_error)
+        self.receipt_progress.canceled.connect(self.cancel_receipts)
+        
+        self.receipt_progress.show()
+        QThreadPool.globalInstance().start(self.receipt_worker)
+    
+    def cancel_receipts(self):
+        if self.receipt_cancel_event is not None:
+            self.receipt_cancel_event.set()
+            self.receipt_progress.show()
+            self.receipt_progress.setLabelText("Отмена, завершается текущая порция квитанций...")
+    
+    def on_receipts_progress(self, done: int, total: int, _errors: int, _rate: float):
+        if self.receipt_progress is None or self.receipt_cancel_event.is_set():
+            return
+        self.receipt_progress.setMaximum(total)
+        self.receipt_progress.setValue(done)
+        self.receipt_progress.setLabelText(f"Сформировано квитанций: {done} из {total}")
+    
+    def finish_receipts(self):
+        self.receipt_worker = None
+        self.receipt_cancel_event = None
+        if self.receipt_progress is not None:
+            self.receipt_progress.canceled.disconnect(self.cancel_receipts)
+            self.receipt_progress.close()
+            self.receipt_progress = None
+    
+    def on_receipts_finished(self, result: dict):
+        self.finish_receipts()
+        title = "Печать отменена" if result['cancelled'] else "Квитанции сформированы"
+        QMessageBox.information(
+            self, title,
+            f"Квитанций: {result['count']} из {result['total']}\n"
+            f"Время: {result['elapsed']:.1f} с ({result['receipts_per_second']:.1f} квитанций/с)\n"
+            f"Результат: {result['output'] or 'не сохранен'}")
+    
+    def on_receipts_error(self, message: str):
+        self.finish_receipts()
+        QMessageBox.critical(self, "Ошибка", f"Не удалось сформировать квитанции: {message}")
 
@@ -0,0 +1,96 @@
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel
+
+PageFetcher = Callable[[Any, int], Tuple[List[tuple], Any]]
+
+def id_page_fetcher(ids: List[int], load_rows: Callable[[List[int]], List[tuple]]) -> PageFetcher:
+    def fetch_page(cursor, limit):
+        start = cursor or 0
+        end = start + limit
+        next_cursor = end if end < len(ids) else None
+        return load_rows(ids[start:end]), next_cursor
+    return fetch_page
+
+class LazyTableModel(QAbstractTableModel):
+    def __init__(self, headers: Sequence[str], fetch_page: PageFetcher,
+                 page_size: int = 200, parent=None):
+        super().__init__(parent)
+        self.headers = list(headers)
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.rows: List[tuple] = []
+        self.cursor = None
+        self.exhausted = False
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        value = self.rows[index.row()][index.column()]
+        return "" if value is None else str(value)
+
+    def headerData(self, section: int, orientation: Qt.Orientation,
+                   role: int = Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.headers[section]
+        return str(section + 1)
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        rows, next_cursor = self.fetch_page(self.cursor, self.page_size)
+        self.cursor = next_cursor
+        self.exhausted = next_cursor is None or not rows
+        if rows:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+            self.rows.extend(rows)
+            self.endInsertRows()
+
+    def reload(self, fetch_page: Optional[PageFetcher] = None):
+        self.beginResetModel()
+        if fetch_page is not None:
+            self.fetch_page = fetch_page
+        self.rows = []
+        self.cursor = None
+        self.exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def row(self, row: int) -> Optional[tuple]:
+        if 0 <= row < len(self.rows):
+            return self.rows[row]
+        return None
+
+    def row_id(self, row: int) -> Optional[int]:
+        values = self.row(row)
+        return values[0] if values else None
+
+class IdFilterProxyModel(QSortFilterProxyModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.ids = None
+
+    def set_ids(self, ids: Optional[Iterable[int]]):
+        self.ids = set(ids) if ids is not None else None
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        if self.ids is None:
+            return True
+        return self.sourceModel().row_id(source_row) in self.ids
+
+    def row_id(self, row: int) -> Optional[int]:
+        if row < 0:
+            return None
+        source_index = self.mapToSource(self.index(row, 0))
+        return self.sourceModel().row_id(source_index.row())
@@ -0,0 +1,66 @@
+import threading
+import time
+import traceback
+from typing import Callable, Any
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+from app.services import ImportService
+
+class WorkerSignals(QObject):
+    progress = pyqtSignal(int, int, int, float)
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+class TaskWorker(QRunnable):
+    def __init__(self, task: Callable[..., Any], *args, **kwargs):
+        super().__init__()
+        self.task = task
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self.setAutoDelete(False)
+
+    def run(self):
+        try:
+            result = self.task(*self.args, **self.kwargs)
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+class ImportWorker(QRunnable):
+    def __init__(self, import_service: ImportService, file_path: str):
+        super().__init__()
+        self.import_service = import_service
+        self.file_path = file_path
+        self.cancel_event = threading.Event()
+        self.signals = WorkerSignals()
+        self.started_at = None
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def _report_progress(self, processed: int, success: int, errors: int):
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        self.signals.progress.emit(processed, success, errors, processed / elapsed)
+
+    def run(self):
+        self.started_at = time.monotonic()
+        try:
+            if self.file_path.lower().endswith('.csv'):
+                result = self.import_service.import_from_csv(
+                    self.file_path, progress_callback=self._report_progress,
+                    cancel_event=self.cancel_event)
+            else:
+                result = self.import_service.import_from_excel(
+                    self.file_path, progress_callback=self._report_progress,
+                    cancel_event=self.cancel_event)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            result['elapsed'] = time.monotonic() - self.started_at
+            self.signals.finished.emit(result)
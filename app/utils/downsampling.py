@@ -0,0 +1,39 @@
+from typing import Sequence
+import numpy as np
+
+def lttb_indices(x: Sequence[float], y: Sequence[float], threshold: int) -> np.ndarray:
+    # Largest-Triangle-Three-Buckets: из каждой корзины берется точка, образующая
+    # наибольший треугольник с уже выбранной точкой и средним следующей корзины.
+    # Первая и последняя точки сохраняются всегда
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype='int64')
+    indices[0] = 0
+    selected = 0
+
+    for i in range(threshold - 2):
+        avg_start = int(np.floor((i + 1) * every)) + 1
+        avg_end = min(int(np.floor((i + 2) * every)) + 1, n)
+        avg_x = x[avg_start:avg_end].mean()
+        avg_y = y[avg_start:avg_end].mean()
+
+        range_start = int(np.floor(i * every)) + 1
+        range_end = int(np.floor((i + 1) * every)) + 1
+        areas = np.abs(
+            (x[selected] - avg_x) * (y[range_start:range_end] - y[selected])
+            - (x[selected] - x[range_start:range_end]) * (avg_y - y[selected])
+        )
+        selected = range_start + int(np.argmax(areas))
+        indices[i + 1] = selected
+
+    indices[-1] = n - 1
+    return indices
+
+def lttb(x: Sequence[float], y: Sequence[float], threshold: int):
+    indices = lttb_indices(x, y, threshold)
+    return np.asarray(x)[indices], np.asarray(y)[indices]
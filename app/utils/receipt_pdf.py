@@ -0,0 +1,128 @@
+from datetime import date
+from io import BytesIO
+import os
+from typing import Dict, List, Tuple
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_CENTER
+
+# Функции модуля выполняются в дочерних процессах пакетной печати,
+# поэтому принимают только простые данные (dict, date) и не обращаются к базе
+
+_styles = None
+
+def _get_styles() -> Dict[str, ParagraphStyle]:
+    global _styles
+    if _styles is None:
+        styles = getSampleStyleSheet()
+        _styles = {
+            'title': ParagraphStyle(
+                'CustomTitle',
+                parent=styles['Heading1'],
+                fontSize=16,
+                textColor=colors.HexColor('#1a1a1a'),
+                spaceAfter=30,
+                alignment=TA_CENTER
+            ),
+            'info': ParagraphStyle(
+                'Info',
+                parent=styles['Normal'],
+                fontSize=10,
+                leftIndent=0
+            )
+        }
+    return _styles
+
+def receipt_filename(receipt: Dict) -> str:
+    return f"receipt_{receipt['object_id']}.pdf"
+
+def build_receipt_story(receipt: Dict, period_start: date, period_end: date) -> list:
+    styles = _get_styles()
+    title_style = styles['title']
+    info_style = styles['info']
+    story = []
+
+    story.append(Paragraph("КВИТАНЦИЯ НА ОПЛАТУ", title_style))
+    story.append(Spacer(1, 12))
+
+    story.append(Paragraph(f"<b>Объект:</b> {receipt['address']}", info_style))
+    if receipt['area']:
+        story.append(Paragraph(f"<b>Площадь:</b> {receipt['area']} м²", info_style))
+    if receipt['residents']:
+        story.append(Paragraph(f"<b>Жильцов:</b> {receipt['residents']}", info_style))
+    story.append(Paragraph(f"<b>Период:</b> {period_start} - {period_end}", info_style))
+    story.append(Spacer(1, 20))
+
+    if not receipt['items']:
+        story.append(Paragraph("Нет данных за указанный период", info_style))
+        return story
+
+    data = [['Услуга', 'Расход', 'Тариф', 'Сумма к оплате']]
+    total = 0.0
+
+    for item in receipt['items']:
+        amount = item['amount']
+        total += amount
+        data.append([
+            item['type'],
+            f"{item['consumption']:.2f}",
+            f"{item['tariff']:.4f}",
+            f"{amount:.2f} руб."
+        ])
+
+    data.append(['<b>ИТОГО</b>', '', '', f"<b>{total:.2f} руб.</b>"])
+
+    table = Table(data, colWidths=[80*mm, 30*mm, 30*mm, 40*mm])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, -1), (-1, -1), 12),
+    ]))
+
+    story.append(table)
+    story.append(Spacer(1, 30))
+    story.append(Paragraph(f"<b>К оплате: {total:.2f} руб.</b>", title_style))
+    return story
+
+def render_receipts(receipts: List[Dict], period_start: date, period_end: date, target):
+    doc = SimpleDocTemplate(target, pagesize=A4)
+    story = []
+    for index, receipt in enumerate(receipts):
+        if index:
+            story.append(PageBreak())
+        story.extend(build_receipt_story(receipt, period_start, period_end))
+    doc.build(story)
+    return target
+
+def render_receipt_files(receipts: List[Dict], period_start: date, period_end: date,
+                         output_dir: str) -> List[str]:
+    paths = []
+    for receipt in receipts:
+        path = os.path.join(output_dir, receipt_filename(receipt))
+        render_receipts([receipt], period_start, period_end, path)
+        paths.append(path)
+    return paths
+
+def render_receipt_bytes(receipts: List[Dict], period_start: date,
+                         period_end: date) -> List[Tuple[str, bytes]]:
+    documents = []
+    for receipt in receipts:
+        buffer = BytesIO()
+        render_receipts([receipt], period_start, period_end, buffer)
+        documents.append((receipt_filename(receipt), buffer.getvalue()))
+    return documents
+
+def render_merged_bytes(receipts: List[Dict], period_start: date, period_end: date) -> bytes:
+    buffer = BytesIO()
+    render_receipts(receipts, period_start, period_end, buffer)
+    return buffer.getvalue()
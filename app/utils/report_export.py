@@ -0,0 +1,167 @@
+import csv
+import os
+import re
+from typing import Dict, List, Sequence, Set
+from openpyxl import Workbook
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Писатели получают строки порциями и не держат в памяти весь отчет. Строки одной группы
+# (объекта или типа услуги) уходят на отдельный лист или в отдельный файл; close_group
+# освобождает группу, когда ее строки закончились
+
+EXCEL_MAX_ROWS = 1048576
+EXCEL_TITLE_LENGTH = 31
+FILENAME_SUFFIX_LENGTH = 100
+
+def unique_name(name: str, used: Set[str], max_length: int) -> str:
+    name = re.sub(r'[\[\]:*?/\\]+', '_', str(name)).strip() or 'Отчет'
+    candidate = name[:max_length]
+    index = 2
+    while candidate.lower() in used:
+        suffix = f" ({index})"
+        candidate = name[:max_length - len(suffix)] + suffix
+        index += 1
+    used.add(candidate.lower())
+    return candidate
+
+def group_filename(filename: str, name, used: Set[str]) -> str:
+    stem, ext = os.path.splitext(filename)
+    suffix = re.sub(r'[^\w.-]+', '_', str(name)).strip('_')
+    return f"{stem}_{unique_name(suffix, used, FILENAME_SUFFIX_LENGTH)}{ext}"
+
+class ExcelReportWriter:
+    def __init__(self, filename: str, columns: Sequence[str]):
+        self.filename = filename
+        self.columns = list(columns)
+        self.workbook = Workbook(write_only=True)
+        self.titles = set()
+        self.sheets = {}
+
+    def _create_sheet(self, name) -> Dict:
+        sheet = self.workbook.create_sheet(unique_name(name, self.titles, EXCEL_TITLE_LENGTH))
+        sheet.append(self.columns)
+        return {'sheet': sheet, 'rows': 1}
+
+    def write(self, group, name, rows: List[Sequence]):
+        state = self.sheets.get(group)
+        if state is None:
+            state = self.sheets[group] = self._create_sheet(name)
+        for row in rows:
+            # Лист Excel ограничен по числу строк, остаток переносится на следующий лист
+            if state['rows'] >= EXCEL_MAX_ROWS:
+                state['sheet'].close()
+                state = self.sheets[group] = self._create_sheet(name)
+            state['sheet'].append(row)
+            state['rows'] += 1
+
+    def close_group(self, group):
+        state = self.sheets.pop(group, None)
+        if state is not None:
+            state['sheet'].close()
+
+    def close(self) -> List[str]:
+        if not self.workbook.worksheets:
+            self._create_sheet('Отчет')
+        self.sheets.clear()
+        self.workbook.save(self.filename)
+        return [self.filename]
+
+class CsvReportWriter:
+    def __init__(self, filename: str, columns: Sequence[str], split: bool = False):
+        self.filename = filename
+        self.columns = list(columns)
+        self.split = split
+        self.files = {}
+        self.suffixes = set()
+        self.paths = []
+
+    def write(self, group, name, rows: List[Sequence]):
+        state = self.files.get(group)
+        if state is None:
+            path = (group_filename(self.filename, name, self.suffixes) if self.split
+                    else self.filename)
+            # utf-8-sig, чтобы Excel правильно открывал кириллицу
+            handle = open(path, 'w', newline='', encoding='utf-8-sig')
+            state = self.files[group] = (handle, csv.writer(handle))
+            state[1].writerow(self.columns)
+            self.paths.append(path)
+        state[1].writerows(rows)
+
+    def close_group(self, group):
+        state = self.files.pop(group, None)
+        if state is not None:
+            state[0].close()
+
+    def close(self) -> List[str]:
+        for group in list(self.files):
+            self.close_group(group)
+        if not self.paths:
+            self.write(None, 'Отчет', [])
+            self.close_group(None)
+        return self.paths
+
+class ParquetReportWriter:
+    @staticmethod
+    def is_available() -> bool:
+        return pa is not None
+
+    def __init__(self, filename: str, columns: Sequence[str], types: Sequence[str],
+                 split: bool = False, batch_size: int = 5000):
+        if pa is None:
+            raise RuntimeError("Для экспорта в Parquet требуется пакет pyarrow")
+        self.filename = filename
+        self.columns = list(columns)
+        self.schema = pa.schema([(column, getattr(pa, type_name)())
+                                 for column, type_name in zip(columns, types)])
+        self.split = split
+        self.batch_size = batch_size
+        self.writers = {}
+        self.buffers = {}
+        self.names = {}
+        self.suffixes = set()
+        self.paths = []
+
+    def _flush(self, group):
+        rows = self.buffers.get(group)
+        if not rows:
+            return
+        if group not in self.writers:
+            path = (group_filename(self.filename, self.names[group], self.suffixes) if self.split
+                    else self.filename)
+            self.writers[group] = pq.ParquetWriter(path, self.schema)
+            self.paths.append(path)
+        columns = list(zip(*rows))
+        self.writers[group].write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, self.schema)],
+            schema=self.schema))
+        self.buffers[group] = []
+
+    def write(self, group, name, rows: List[Sequence]):
+        # Строки копятся по группам, чтобы row group в файле не получались мелкими
+        self.names.setdefault(group, name)
+        buffer = self.buffers.setdefault(group, [])
+        buffer.extend(rows)
+        if len(buffer) >= self.batch_size:
+            self._flush(group)
+
+    def close_group(self, group):
+        self._flush(group)
+        self.buffers.pop(group, None)
+        self.names.pop(group, None)
+        writer = self.writers.pop(group, None)
+        if writer is not None:
+            writer.close()
+
+    def close(self) -> List[str]:
+        for group in list(self.buffers):
+            self.close_group(group)
+        if not self.paths:
+            pq.write_table(self.schema.empty_table(), self.filename)
+            self.paths.append(self.filename)
+        return self.paths
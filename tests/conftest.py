@@ -0,0 +1,8 @@
+import pytest
+from app.database import Database
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "test.db"))
+    yield database
+    database.close()
@@ -0,0 +1,14 @@
+from datetime import date, timedelta
+
+def add_meter(conn, address: str, meter_type: str = 'Газ', serial_number: str = None,
+              tariff: float = 5.0, object_id: int = None) -> int:
+    if object_id is None:
+        object_id = conn.execute("INSERT INTO Objects (address) VALUES (?)", (address,)).lastrowid
+    return conn.execute("""
+        INSERT INTO Meters (object_id, type, serial_number, tariff) VALUES (?, ?, ?, ?)
+    """, (object_id, meter_type, serial_number, tariff)).lastrowid
+
+def add_readings(conn, meter_id: int, values, start: date = date(2026, 1, 1), step_days: int = 1):
+    conn.executemany("INSERT INTO Readings (meter_id, value, reading_date) VALUES (?, ?, ?)",
+                     [(meter_id, value, (start + timedelta(days=i * step_days)).isoformat())
+                      for i, value in enumerate(values)])
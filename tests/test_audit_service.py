@@ -0,0 +1,18 @@
+import time
+from app.services import AuditService
+
+def test_full_queue_keeps_every_record(db, monkeypatch):
+    audit = AuditService(db, batch_size=5, queue_size=2)
+    write_batch = audit._write_batch
+
+    def slow_write_batch(records):
+        time.sleep(0.02)
+        write_batch(records)
+
+    monkeypatch.setattr(audit, '_write_batch', slow_write_batch)
+    for entity_id in range(40):
+        audit.log_action(1, 'admin', 'CREATE', 'Object', entity_id, description=f"Объект {entity_id}")
+    audit.shutdown()
+
+    logs = audit.get_logs(limit=100)
+    assert sorted(log['entity_id'] for log in logs) == list(range(40))
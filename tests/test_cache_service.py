@@ -0,0 +1,58 @@
+import time
+import pytest
+from app.models import ObjectRepository
+from app.services import CacheService
+
+@pytest.fixture
+def cache():
+    service = CacheService(default_ttl_seconds=60, max_entries=3)
+    yield service
+    service.shutdown()
+
+def test_entry_expires_after_ttl(cache):
+    cache.set("short", 1, ttl_seconds=0.05)
+    cache.set("long", 2)
+    assert cache.get("short") == 1
+    time.sleep(0.1)
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+    assert cache.get_stats()['expirations'] == 1
+
+def test_cleanup_removes_expired_entries(cache):
+    cache.set("a", 1, ttl_seconds=0.05)
+    cache.set("b", 2, ttl_seconds=0.05)
+    time.sleep(0.1)
+    assert cache.cleanup_expired() == 2
+    assert cache.get_stats()['entries'] == 0
+
+def test_invalidate_tags_removes_only_tagged_entries(cache):
+    cache.set("object:1", "a", tags=["object:1", "table:Objects"])
+    cache.set("object:2", "b", tags=["object:2", "table:Objects"])
+    cache.set("meter:1", "c", tags=["meter:1"])
+
+    assert cache.invalidate_tags("object:1") == 1
+    assert cache.get("object:1") is None
+    assert cache.get("object:2") == "b"
+    assert cache.invalidate_tags("table:Objects") == 1
+    assert cache.get("meter:1") == "c"
+
+def test_least_recently_used_entry_is_evicted(cache):
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    cache.get("a")
+    cache.set("d", "d")
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in ("a", "c", "d")] == ["a", "c", "d"]
+
+def test_repository_cache_by_keyword_and_invalidation(db, cache):
+    with db.transaction() as conn:
+        conn.execute("INSERT INTO Objects (address) VALUES ('ул. Ленина, 1')")
+    repo = ObjectRepository(db, cache)
+
+    obj = repo.get_by_id(1)
+    assert repo.get_by_id(obj_id=1) == obj
+    assert cache.get_stats()['hits'] == 1
+
+    obj.address = 'ул. Мира, 2'
+    repo.update(obj)
+    assert repo.get_by_id(1).address == 'ул. Мира, 2'
@@ -0,0 +1,43 @@
+from datetime import date
+from app.services import CalculationService
+from tests.helpers import add_meter, add_readings
+
+def calculations(db):
+    with db.connection() as conn:
+        return conn.execute("""
+            SELECT reading_id, consumption, amount, tariff FROM Calculations ORDER BY reading_id
+        """).fetchall()
+
+def test_recalculate_since_matches_full_recalculation(db):
+    with db.transaction() as conn:
+        first = add_meter(conn, 'ул. Ленина, 1', tariff=2.5)
+        second = add_meter(conn, 'ул. Мира, 2', tariff=4.0)
+        add_readings(conn, first, [10, 12, 20, 20, 35])
+        add_readings(conn, second, [100, 90, 130])
+    service = CalculationService(db)
+    service.recalculate()
+
+    with db.transaction() as conn:
+        conn.execute("UPDATE Readings SET value = 25 WHERE meter_id = ? AND reading_date = '2026-01-04'",
+                     (first,))
+        conn.execute("DELETE FROM Calculations")
+    # Пересчет с даты изменения опирается на последнее показание до нее
+    assert service.recalculate([first], since=date(2026, 1, 4)) == 2
+    assert [row[0] for row in calculations(db)] == [4, 5]
+
+    service.recalculate()
+    expected = {row[0]: row for row in calculations(db)}
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM Calculations")
+    service.recalculate([first, second], since=date(2026, 1, 2))
+    since_rows = {row[0]: row for row in calculations(db)}
+    assert since_rows == {reading_id: row for reading_id, row in expected.items() if reading_id not in (1, 6)}
+    assert expected[4][1:3] == (5.0, 12.5)
+    assert expected[7][1] == 0.0
+
+def test_recalculate_without_previous_reading_gives_zero(db):
+    with db.transaction() as conn:
+        meter_id = add_meter(conn, 'ул. Ленина, 1')
+        add_readings(conn, meter_id, [10, 15])
+    CalculationService(db).recalculate([meter_id], since=date(2025, 1, 1))
+    assert [row[1] for row in calculations(db)] == [0.0, 5.0]
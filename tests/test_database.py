@@ -0,0 +1,74 @@
+import threading
+import pytest
+from app.database import Database
+
+def count_objects(db):
+    with db.connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM Objects").fetchone()[0]
+
+def test_checkout_depth_returns_to_zero(db):
+    with db.connection() as outer:
+        with db.connection() as inner:
+            assert inner is outer
+            assert db.pool._local.depth == 2
+        assert db.pool._local.depth == 1
+    assert db.pool._local.depth == 0
+
+def test_transaction_rolls_back_on_exception(db):
+    with pytest.raises(RuntimeError):
+        with db.transaction() as conn:
+            conn.execute("INSERT INTO Objects (address) VALUES ('a')")
+            raise RuntimeError("boom")
+    assert count_objects(db) == 0
+    assert db.pool._local.tx_depth == 0
+
+def test_nested_transaction_rolls_back_only_savepoint(db):
+    with db.transaction() as conn:
+        conn.execute("INSERT INTO Objects (address) VALUES ('outer')")
+        with pytest.raises(RuntimeError):
+            with db.transaction() as inner:
+                inner.execute("INSERT INTO Objects (address) VALUES ('inner')")
+                raise RuntimeError("boom")
+    with db.connection() as conn:
+        assert conn.execute("SELECT address FROM Objects").fetchall() == [('outer',)]
+
+def test_release_rolls_back_uncommitted_checkout(db):
+    conn = db.get_connection()
+    conn.execute("INSERT INTO Objects (address) VALUES ('leaked')")
+    conn.close()
+    # Незафиксированная запись не должна уйти с чужим commit()
+    with db.transaction() as conn:
+        conn.execute("INSERT INTO Objects (address) VALUES ('committed')")
+    with db.connection() as conn:
+        assert conn.execute("SELECT address FROM Objects").fetchall() == [('committed',)]
+
+def test_release_rolls_back_when_depth_drifted(db):
+    conn = db.get_connection()
+    db.get_connection()
+    conn.execute("INSERT INTO Objects (address) VALUES ('leaked')")
+    conn.close()
+    assert not conn.in_transaction
+    conn.close()
+
+def test_same_path_with_other_pragmas_raises(db):
+    with pytest.raises(ValueError):
+        Database(db.db_path, profile='default')
+
+def test_close_keeps_other_thread_connection(db):
+    started = threading.Event()
+    proceed = threading.Event()
+    result = []
+
+    def worker():
+        with db.connection() as conn:
+            started.set()
+            proceed.wait(5)
+            result.append(conn.execute("SELECT COUNT(*) FROM Objects").fetchone()[0])
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    started.wait(5)
+    db.close()
+    proceed.set()
+    thread.join(5)
+    assert result == [0]
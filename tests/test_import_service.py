@@ -0,0 +1,70 @@
+import threading
+from app.services import CacheService, ImportService
+from tests.helpers import add_meter, add_readings
+
+def write_csv(path, rows):
+    path.write_text("meter_id,value,reading_date\n" + "".join(f"{row}\n" for row in rows),
+                    encoding='utf-8')
+    return str(path)
+
+def test_import_rejects_invalid_rows(db, tmp_path):
+    with db.transaction() as conn:
+        meter_id = add_meter(conn, 'ул. Ленина, 1')
+        add_readings(conn, meter_id, [100])
+    file_path = write_csv(tmp_path / "readings.csv", [
+        f"{meter_id},110,2026-01-02",
+        "abc,1,2026-01-02",
+        f"{meter_id},x,2026-01-03",
+        f"{meter_id},120,not a date",
+        "999,1,2026-01-02",
+        f"{meter_id},111,2026-01-02",
+        f"{meter_id},90,2026-01-05",
+        f"{meter_id},130,2026-01-01",
+        f"{meter_id},140,2026-01-06",
+    ])
+
+    result = ImportService(db).import_from_csv(file_path)
+
+    assert result['success'] == 2
+    assert result['errors'] == 7
+    assert not result['cancelled']
+    messages = "\n".join(result['error_messages'])
+    for text in ["Строка 3: неверный ID счетчика", "Строка 4: неверное значение показания",
+                 "Строка 5: неверная дата показания", "Строка 6: счетчик с ID 999 не найден",
+                 "Строка 7: показание счетчика", "Строка 8: показание (90.0) меньше предыдущего",
+                 "Строка 9: показание счетчика"]:
+        assert text in messages
+    with db.connection() as conn:
+        assert conn.execute("""
+            SELECT r.value, c.consumption FROM Readings r
+            LEFT JOIN Calculations c ON c.reading_id = r.id
+            ORDER BY r.reading_date
+        """).fetchall() == [(100.0, None), (110.0, 10.0), (140.0, 30.0)]
+
+def test_import_invalidates_cache_after_commit(db, tmp_path):
+    with db.transaction() as conn:
+        meter_id = add_meter(conn, 'ул. Ленина, 1')
+    cache = CacheService()
+    try:
+        cache.set("readings", [], tags=[f"meter_readings:{meter_id}"])
+        ImportService(db, cache).import_from_csv(
+            write_csv(tmp_path / "readings.csv", [f"{meter_id},1,2026-01-01"]))
+        assert cache.get("readings") is None
+    finally:
+        cache.shutdown()
+
+def test_import_cancel_keeps_committed_chunks(db, tmp_path):
+    with db.transaction() as conn:
+        meter_id = add_meter(conn, 'ул. Ленина, 1')
+    file_path = write_csv(tmp_path / "readings.csv",
+                          [f"{meter_id},{day},2026-01-{day:02d}" for day in range(1, 11)])
+    cancel_event = threading.Event()
+
+    result = ImportService(db).import_from_csv(
+        file_path, chunk_size=3, cancel_event=cancel_event,
+        progress_callback=lambda processed, success, errors: cancel_event.set())
+
+    assert result['cancelled']
+    assert result['success'] == 3
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM Readings").fetchone()[0] == 3
@@ -0,0 +1,59 @@
+import sqlite3
+from app.database import Database
+from app.database.migrations import LATEST_SCHEMA_VERSION, backfill_calculations, create_base_schema
+from app.models import ObjectRepository
+from tests.helpers import add_meter, add_readings
+
+def test_deleting_object_cascades_notifications(db):
+    with db.transaction() as conn:
+        add_meter(conn, 'ул. Ленина, 1')
+        conn.execute("INSERT INTO Notifications (user_id, object_id, type, message) VALUES (1, 1, 't', 'm')")
+    ObjectRepository(db).delete(1)
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM Notifications").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM Meters").fetchone()[0] == 0
+
+def test_migrates_version_1_database_to_latest(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    create_base_schema(conn)
+    conn.execute("""
+        CREATE TABLE schema_version (
+            version INTEGER PRIMARY KEY, description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("INSERT INTO schema_version (version, description) VALUES (1, 'Базовая схема')")
+    conn.execute("INSERT INTO Users (username, password, role) VALUES ('old', 'plain', 'user')")
+    conn.execute("INSERT INTO Objects (address) VALUES ('ул. Ленина, 1')")
+    conn.execute("INSERT INTO Meters (object_id, type, tariff) VALUES (1, 'Газ', 2)")
+    conn.execute("INSERT INTO Readings (meter_id, value, reading_date) VALUES (1, 10, '2026-01-01')")
+    conn.execute("INSERT INTO Calculations (reading_id, consumption, amount, tariff) VALUES (1, 0, 0, 2)")
+    conn.execute("INSERT INTO Calculations (reading_id, consumption, amount, tariff) VALUES (1, 0, 0, 2)")
+    conn.execute("INSERT INTO Notifications (user_id, object_id, type, message) VALUES (1, 1, 't', 'm')")
+    conn.commit()
+    conn.close()
+
+    db = Database(path)
+    try:
+        assert db.get_schema_version() == LATEST_SCHEMA_VERSION
+        with db.connection() as conn:
+            assert conn.execute("SELECT password FROM Users WHERE username = 'old'").fetchone()[0] != 'plain'
+            assert conn.execute("SELECT COUNT(*) FROM Users WHERE username = 'admin'").fetchone()[0] == 1
+            assert conn.execute("SELECT COUNT(*) FROM Calculations WHERE reading_id = 1").fetchone()[0] == 1
+            assert conn.execute("SELECT rowid FROM ObjectsFts WHERE ObjectsFts MATCH 'ленина'").fetchall() == [(1,)]
+            assert conn.execute("SELECT COUNT(*) FROM Notifications").fetchone()[0] == 1
+    finally:
+        db.close()
+
+def test_backfill_adds_only_missing_calculations(db):
+    with db.transaction() as conn:
+        meter_id = add_meter(conn, 'ул. Ленина, 1', tariff=2.0)
+        add_readings(conn, meter_id, [10, 15, 14, 20])
+        conn.execute("INSERT INTO Calculations (reading_id, consumption, amount, tariff) VALUES (2, 99, 99, 2)")
+    with db.transaction() as conn:
+        backfill_calculations(conn)
+    with db.connection() as conn:
+        assert conn.execute("""
+            SELECT reading_id, consumption, amount FROM Calculations ORDER BY reading_id
+        """).fetchall() == [(1, 0.0, 0.0), (2, 99.0, 99.0), (3, 0.0, 0.0), (4, 6.0, 12.0)]
@@ -0,0 +1,70 @@
+from datetime import date
+from app.models import ObjectRepository, MeterRepository, ReadingRepository
+from tests.helpers import add_meter, add_readings
+
+def test_reading_query_keyset_pages_cover_all_rows(db):
+    with db.transaction() as conn:
+        first = add_meter(conn, 'ул. Ленина, 1')
+        second = add_meter(conn, 'ул. Мира, 2')
+        add_readings(conn, first, range(0, 70, 2))
+        # Одинаковые даты у разных счетчиков: порядок страниц решает id
+        add_readings(conn, second, range(0, 50, 5))
+    repo = ReadingRepository(db)
+
+    seen = []
+    cursor = None
+    while True:
+        page = repo.query(cursor=cursor, limit=7, with_total=cursor is None)
+        seen.extend(reading.id for reading, meter, obj, calc in page['items'])
+        if cursor is None:
+            assert page['total'] == 45
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert len(seen) == len(set(seen)) == 45
+    with db.connection() as conn:
+        expected = [row[0] for row in conn.execute(
+            "SELECT id FROM Readings ORDER BY reading_date DESC, id DESC")]
+    assert seen == expected
+
+def test_reading_query_filters_by_meter_and_dates(db):
+    with db.transaction() as conn:
+        meter_id = add_meter(conn, 'ул. Ленина, 1')
+        other_id = add_meter(conn, 'ул. Мира, 2')
+        add_readings(conn, meter_id, [1, 2, 3, 4])
+        add_readings(conn, other_id, [5, 6])
+    page = ReadingRepository(db).query(meter_id=meter_id, date_from=date(2026, 1, 2),
+                                       date_to=date(2026, 1, 3))
+    assert [reading.value for reading, meter, obj, calc in page['items']] == [3, 2]
+    assert page['total'] == 2
+
+def test_reading_query_shows_reading_without_calculation(db):
+    with db.transaction() as conn:
+        meter_id = add_meter(conn, 'ул. Ленина, 1', tariff=2.0)
+        add_readings(conn, meter_id, [10, 15])
+        conn.execute("INSERT INTO Calculations (reading_id, consumption, amount, tariff) VALUES (2, 5, 10, 2)")
+    items = ReadingRepository(db).query(meter_id=meter_id)['items']
+    assert [(reading.value, calc.get('amount')) for reading, meter, obj, calc in items] == [(15, 10), (10, None)]
+
+def test_object_get_page_is_keyset_by_address(db):
+    with db.transaction() as conn:
+        for address in ['в', 'а', 'б', 'а', 'г']:
+            conn.execute("INSERT INTO Objects (address) VALUES (?)", (address,))
+    repo = ObjectRepository(db)
+    pages = []
+    cursor = None
+    while True:
+        objects, cursor = repo.get_page(cursor, limit=2)
+        pages.append([(obj.address, obj.id) for obj in objects])
+        if cursor is None:
+            break
+    assert pages == [[('а', 2), ('а', 4)], [('б', 3), ('в', 1)], [('г', 5)]]
+
+def test_get_by_ids_keeps_requested_order(db):
+    with db.transaction() as conn:
+        for address in ['а', 'б', 'в']:
+            add_meter(conn, address)
+    assert [obj.id for obj in ObjectRepository(db).get_by_ids([3, 1, 2])] == [3, 1, 2]
+    assert [meter.id for meter, address in
+            MeterRepository(db).get_by_ids_with_addresses([2, 3, 1])] == [2, 3, 1]
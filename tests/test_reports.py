@@ -0,0 +1,88 @@
+import csv
+import os
+import threading
+from datetime import date
+import pytest
+from openpyxl import load_workbook
+from app.config import Config
+from app.services import ReportGenerator
+from tests.helpers import add_meter, add_readings
+
+START, END = date(2026, 1, 1), date(2026, 12, 31)
+
+@pytest.fixture
+def generator(db):
+    with db.transaction() as conn:
+        for address in ('ул. Ленина, 1', 'пр. Мира, 2'):
+            gas = add_meter(conn, address, 'Газ')
+            object_id = conn.execute("SELECT object_id FROM Meters WHERE id = ?", (gas,)).fetchone()[0]
+            water = add_meter(conn, address, 'Холодная вода', object_id=object_id)
+            add_readings(conn, gas, range(10))
+            add_readings(conn, water, range(5))
+        # Показание вне периода в отчет не попадает
+        add_readings(conn, gas, [100], start=date(2025, 12, 31))
+    return ReportGenerator(db)
+
+def csv_rows(path):
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        return list(csv.reader(f))[1:]
+
+def xlsx_rows(path):
+    workbook = load_workbook(path, read_only=True)
+    try:
+        return {sheet.title: sum(1 for _ in sheet.iter_rows(min_row=2)) for sheet in workbook.worksheets}
+    finally:
+        workbook.close()
+
+@pytest.mark.parametrize("split_by, expected", [
+    (None, [30]),
+    ('object', [15, 15]),
+    ('type', [20, 10]),
+])
+def test_csv_export_row_counts(generator, tmp_path, split_by, expected):
+    result = generator.export_report(str(tmp_path / "report"), START, END, output_format='csv',
+                                     split_by=split_by)
+    assert result['rows'] == 30
+    assert result['total'] is None
+    assert [len(csv_rows(path)) for path in result['files']] == expected
+
+@pytest.mark.parametrize("split_by, expected", [
+    (None, {'Отчет': 30}),
+    ('object', {'ул. Ленина, 1': 15, 'пр. Мира, 2': 15}),
+    ('type', {'Газ': 20, 'Холодная вода': 10}),
+])
+def test_xlsx_export_row_counts(generator, tmp_path, split_by, expected):
+    result = generator.export_report(str(tmp_path / "report"), START, END, output_format='xlsx',
+                                     split_by=split_by, with_total=True)
+    assert result['rows'] == result['total'] == 30
+    assert result['files'] == [str(tmp_path / "report.xlsx")]
+    assert xlsx_rows(result['files'][0]) == expected
+
+@pytest.mark.parametrize("split_by, expected", [(None, [30]), ('type', [20, 10])])
+def test_parquet_export_row_counts(generator, tmp_path, split_by, expected):
+    pq = pytest.importorskip("pyarrow.parquet")
+    result = generator.export_report(str(tmp_path / "report"), START, END,
+                                     output_format='parquet', split_by=split_by)
+    assert [pq.read_table(path).num_rows for path in result['files']] == expected
+
+def test_export_for_one_object(generator, tmp_path):
+    result = generator.export_report(str(tmp_path / "report"), START, END, object_id=1,
+                                     output_format='csv')
+    rows = csv_rows(result['files'][0])
+    assert len(rows) == 15
+    assert {row[0] for row in rows} == {'ул. Ленина, 1'}
+
+def test_cancelled_export_removes_files(generator, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'EXPORT_BATCH_SIZE', 4)
+    cancel_event = threading.Event()
+    result = generator.export_report(str(tmp_path / "report"), START, END, output_format='csv',
+                                     split_by='object', cancel_event=cancel_event,
+                                     progress_callback=lambda done, total: cancel_event.set())
+    assert result['cancelled']
+    assert result['rows'] == 4
+    assert result['files'] == []
+    assert [name for name in os.listdir(tmp_path) if name.startswith('report')] == []
+
+def test_unknown_format_is_rejected(generator, tmp_path):
+    with pytest.raises(ValueError):
+        generator.export_report(str(tmp_path / "report"), START, END, output_format='ods')
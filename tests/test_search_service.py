@@ -0,0 +1,61 @@
+import pytest
+from app.services import AuditService, SearchService
+from tests.helpers import add_meter
+
+@pytest.fixture
+def search(db):
+    with db.transaction() as conn:
+        add_meter(conn, 'ул. Ленина, 10', 'Газ', 'AB123456')
+        add_meter(conn, 'пр. Мира, 5', 'Электричество', 'CD777000')
+        add_meter(conn, 'ул. Ленинградская, 7', 'Холодная вода', 'EF000123')
+    service = SearchService(db)
+    assert service.is_available()
+    return service
+
+def test_word_and_prefix_match(search):
+    assert search.search_object_ids('Ленина') == [1]
+    assert search.search_object_ids('лен') == [1, 3]
+    assert search.search_meter_ids('газ') == [1]
+
+def test_infix_query_falls_back_to_substring(search):
+    assert search.search_object_ids('енина') == [1]
+    assert search.search_meter_ids('777') == [2]
+    assert search.search_meter_ids('0012') == [3]
+
+def test_typo_requires_every_word(search):
+    assert search.search_object_ids('Ленинаа') == [1, 3]
+    assert search.search_object_ids('ул мира') == []
+
+def test_limit_and_fallback_without_fts(search, monkeypatch):
+    assert search.search_object_ids('ул', limit=1) == [1]
+    monkeypatch.setattr(search, 'is_available', lambda: False)
+    assert search.search_object_ids('енина') == [1]
+    assert search.search_meter_ids('мира') == [2]
+    assert search.search_object_ids('ул', limit=1) == [1]
+
+def test_audit_search_checks_every_indexed_column(db):
+    audit = AuditService(db)
+    try:
+        audit.log_action(1, 'petrov', 'UPDATE', 'Meter', 1, old_value='старый SN-1',
+                         new_value='новый ZX998877', description='Изменен счетчик')
+        audit.flush()
+        for text in ('petrov', 'etro', 'ZX998', '998877', 'старый', 'изменен'):
+            assert len(audit.get_logs(search=text)) == 1, text
+        assert audit.get_logs(search='нет такого') == []
+    finally:
+        audit.shutdown()
+
+def test_archived_audit_search_uses_same_columns(db):
+    with db.transaction() as conn:
+        conn.execute("""
+            INSERT INTO AuditLog (username, action_type, entity_type, new_value, description, created_at)
+            VALUES ('ivanov', 'CREATE', 'Object', 'ул. Ленина, 10', 'Создан объект', '2020-01-15 10:00:00')
+        """)
+    audit = AuditService(db)
+    try:
+        assert audit.archive_old_logs(retention_days=30, compact=False) == 1
+        for text in ('ivanov', 'енина', 'создан'):
+            logs = audit.get_logs(search=text, include_archived=True)
+            assert [log['username'] for log in logs] == ['ivanov'], text
+    finally:
+        audit.shutdown()